@@ -0,0 +1,322 @@
+"""
+PvP 前 N 名查詢 API
+取代 old/ 中每個請求都啟動新瀏覽器、依序爬三個聯盟的 Flask 伺服器：查詢直接由記憶體中的
+前 N 名索引回答（由 data/pvpoke_*.csv 建立，格式見 top_n_index.py），只需幾毫秒
+
+快取策略為 stale-while-revalidate：
+  資料未超過 API_CACHE_TTL 秒時直接回傳
+  超過時仍立即回傳舊資料（標記 stale），同時在背景更新
+  同一時間只會有一次更新，更新期間的其他觸發全部合併到這一次，瀏覽器數量不會隨請求數增加
+CSV 被其他程序（例如 daemon.py 或 scheduler.py）更新時，下一個請求會自動重新載入
+
+端點 (預設 http://127.0.0.1:5000)：
+  GET  /run_scraper?numRankings=50           與舊版相同的回應：{"xl_pokemon": "A, B", "non_xl_pokemon": "C, D"}
+  GET  /top_n?1500=50&2500=50&10000=30       各聯盟不同的 N，回傳名稱清單與資料時間
+  POST /refresh                              要求背景更新（與進行中的更新合併）
+  GET  /health                               快取狀態
+回應標頭 X-Cache 為 fresh / stale，Age 為資料的秒數
+
+環境變數：
+  API_HOST / API_PORT            預設 127.0.0.1 / 5000
+  API_CACHE_TTL                  資料視為新鮮的秒數，預設 3600
+  API_REFRESH_MIN_INTERVAL       兩次更新之間至少間隔的秒數，預設 60
+  API_CRAWL=0                    不在本程序中爬取，只重新載入 CSV（與 daemon.py 一起執行時使用）
+
+使用方式：python api_server.py
+"""
+import time
+IMPORT_START = time.time()
+
+import json
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from publish_artifacts import PVP_LEAGUES, load_pvp_rows, publish_artifacts
+from top_n_index import build_top_n_index, query_top_n
+from startup_report import report_startup
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "5000"))
+API_CACHE_TTL = float(os.environ.get("API_CACHE_TTL", "3600"))
+API_REFRESH_MIN_INTERVAL = float(os.environ.get("API_REFRESH_MIN_INTERVAL", "60"))
+API_CRAWL = os.environ.get("API_CRAWL", "1") != "0"
+
+# 舊版 /run_scraper 的預設數量
+DEFAULT_NUM_RANKINGS = 50
+
+
+def source_paths():
+    return [os.path.join("data", f"pvpoke_{league}.csv") for league in PVP_LEAGUES]
+
+
+def crawl_pvp():
+    """在本程序中更新三個聯盟的排名；瀏覽器池在更新之間保持開啟，數量上限為 BROWSER_POOL_SIZE"""
+    import change_detection
+    import crawler
+    import telemetry
+    from hedging import latency_history
+
+    start_time = time.time()
+    # gamemaster 與來源的變更檢查每次更新都重新進行
+    crawler.gamemaster_data = None
+    change_detection.detector.start_run()
+    if crawler.CRAWLER_ENGINE == "cdp":
+        results = crawler.run_with_cdp_engine(crawler.CRAWLER_TASKS)
+    else:
+        with ThreadPoolExecutor(max_workers=crawler.BROWSER_POOL_SIZE, thread_name_prefix="API-Crawler") as executor:
+            successes = list(executor.map(crawler.run_crawler, crawler.CRAWLER_TASKS))
+        results = {task["crawler_id"]: success for task, success in zip(crawler.CRAWLER_TASKS, successes)}
+
+    with telemetry.span("publish", crawler="pvp"):
+        publish_artifacts()
+    telemetry.write_metrics("api", results, start_time)
+    latency_history.save()
+    return results
+
+
+class RankingCache:
+    """記憶體中的前 N 名索引，過期時在背景更新並繼續提供舊資料"""
+
+    def __init__(self, ttl=API_CACHE_TTL, crawl=API_CRAWL, min_interval=API_REFRESH_MIN_INTERVAL):
+        self.ttl = ttl
+        self.crawl = crawl
+        self.min_interval = min_interval
+        self.index = None
+        self.loaded_mtime = None
+        self.refreshed_at = None
+        self.last_attempt = None
+        self.refresh_count = 0
+        self.coalesced_count = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refresh_thread = None
+
+    def source_mtime(self):
+        mtimes = [os.path.getmtime(path) for path in source_paths() if os.path.exists(path)]
+        return max(mtimes) if mtimes else None
+
+    def reload_if_changed(self):
+        """CSV 有變動時重新建立索引（包含其他程序寫入的更新）"""
+        mtime = self.source_mtime()
+        if mtime is None or mtime == self.loaded_mtime:
+            return False
+        with self._load_lock:
+            if mtime == self.loaded_mtime:
+                return False
+            league_rows = {}
+            for league in PVP_LEAGUES:
+                pokemon = load_pvp_rows(league)
+                if pokemon is not None:
+                    league_rows[league] = pokemon
+            self.index = build_top_n_index(league_rows)
+            self.loaded_mtime = mtime
+        print(f"📄 已載入排名資料 ({datetime.fromtimestamp(mtime).isoformat(timespec='seconds')})")
+        return True
+
+    def age(self):
+        """資料的秒數：以檔案更新時間與最近一次更新完成的時間中較新者計算
+        （來源沒有變動時 CSV 不會重寫，只看檔案時間會一直判定為過期）"""
+        fresh_at = max(self.loaded_mtime or 0, self.refreshed_at or 0)
+        return time.time() - fresh_at if fresh_at else None
+
+    def get(self):
+        """回傳 (索引, 資料秒數, 是否過期)；過期或沒有資料時觸發背景更新"""
+        try:
+            self.reload_if_changed()
+        except Exception as e:
+            print(f"⚠️  重新載入排名資料失敗，繼續使用快取: {e}")
+        age = self.age()
+        stale = self.index is None or age is None or age > self.ttl
+        if stale:
+            self.refresh()
+        return self.index, age, stale
+
+    def refresh(self, force=False):
+        """
+        觸發背景更新，回傳是否啟動了新的更新
+        已有更新進行中時合併到該次更新；距離上次更新未滿 min_interval 秒時略過（force 除外）
+        """
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                self.coalesced_count += 1
+                return False
+            if not force and self.last_attempt and time.time() - self.last_attempt < self.min_interval:
+                return False
+            self.last_attempt = time.time()
+            self._refresh_thread = threading.Thread(target=self._run_refresh, daemon=True, name="API-Refresh")
+            self._refresh_thread.start()
+            return True
+
+    def _run_refresh(self):
+        start_time = time.time()
+        print("🔄 背景更新排名資料...")
+        try:
+            if self.crawl:
+                results = crawl_pvp()
+                success_count = sum(1 for success in results.values() if success)
+                print(f"🎉 更新完成: {success_count}/{len(results)} 個聯盟成功，耗時 {time.time() - start_time:.1f} 秒")
+                if success_count:
+                    self.refreshed_at = time.time()
+            self.reload_if_changed()
+        except Exception as e:
+            print(f"❌ 更新排名資料時發生錯誤: {e}")
+        finally:
+            with self._lock:
+                self.refresh_count += 1
+
+    def wait(self, timeout=None):
+        """等待進行中的更新結束"""
+        with self._lock:
+            thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def is_refreshing(self):
+        with self._lock:
+            return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def status(self):
+        age = self.age()
+        return {
+            "loaded": self.index is not None,
+            "data_time": datetime.fromtimestamp(self.loaded_mtime).isoformat(timespec="seconds")
+                         if self.loaded_mtime else None,
+            "age_s": round(age) if age is not None else None,
+            "ttl_s": self.ttl,
+            "stale": age is None or age > self.ttl,
+            "refreshing": self.is_refreshing(),
+            "refresh_count": self.refresh_count,
+            "coalesced_count": self.coalesced_count,
+            "crawl": self.crawl,
+        }
+
+
+cache = RankingCache()
+
+
+def parse_limit(value):
+    limit = int(value)
+    if limit < 0:
+        raise ValueError("數量不能小於 0")
+    return limit
+
+
+def make_handler(ranking_cache):
+    class APIHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            # 與舊版的 flask_cors 相同，允許前端跨域呼叫
+            self.send_header("Access-Control-Allow-Origin", "*")
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def query(self, limits):
+            """以快取回答查詢，沒有任何資料時回傳 503 並要求稍後重試"""
+            index, age, stale = ranking_cache.get()
+            if index is None:
+                self.send_json(503, {"error": "排名資料準備中，請稍後再試"}, {"Retry-After": "30"})
+                return None
+            headers = {"X-Cache": "stale" if stale else "fresh", "Age": str(max(0, round(age or 0)))}
+            return query_top_n(index, limits), headers
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.end_headers()
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            path = url.path.rstrip("/")
+
+            if path == "/health":
+                return self.send_json(200, ranking_cache.status())
+
+            try:
+                if path == "/run_scraper":
+                    limit = parse_limit(params.get("numRankings", DEFAULT_NUM_RANKINGS))
+                    limits = {league: limit for league in PVP_LEAGUES}
+                elif path == "/top_n":
+                    limits = {league: parse_limit(params.get(league, DEFAULT_NUM_RANKINGS)) for league in PVP_LEAGUES}
+                else:
+                    return self.send_error(404)
+            except ValueError:
+                return self.send_json(400, {"error": "數量必須是非負整數"})
+
+            answered = self.query(limits)
+            if answered is None:
+                return
+            (xl_names, non_xl_names), headers = answered
+            if path == "/run_scraper":
+                payload = {"xl_pokemon": ", ".join(xl_names), "non_xl_pokemon": ", ".join(non_xl_names)}
+            else:
+                payload = {
+                    "limits": limits,
+                    "xl_pokemon": xl_names,
+                    "non_xl_pokemon": non_xl_names,
+                    "stale": headers["X-Cache"] == "stale",
+                    "age_s": int(headers["Age"]),
+                }
+            self.send_json(200, payload, headers)
+
+        def do_POST(self):
+            if urlsplit(self.path).path.rstrip("/") == "/refresh":
+                started = ranking_cache.refresh(force=True)
+                return self.send_json(202, {"started": started, "refreshing": ranking_cache.is_refreshing()})
+            self.send_error(404)
+
+    return APIHandler
+
+
+class APIServer(ThreadingHTTPServer):
+    # 預設的連線佇列只有 5，大量同時請求時連線會被拒絕並在 1 秒後重試
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def shutdown(server):
+    server.shutdown()
+    if API_CRAWL and "crawler" in sys.modules:
+        # 只有本程序曾經爬取時才需要關閉瀏覽器
+        crawler = sys.modules["crawler"]
+        crawler.close_browser_pool()
+        crawler.kill_chrome_processes()
+
+
+def main():
+    """主程式 - 啟動查詢 API"""
+    report_startup(IMPORT_START)
+    cache.get()
+
+    server = APIServer((API_HOST, API_PORT), make_handler(cache))
+
+    def signal_handler(sig, frame):
+        print("\n收到中斷信號，正在關閉 API...")
+        threading.Thread(target=shutdown, args=(server,), daemon=True).start()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    status = cache.status()
+    print(f"✅ 查詢 API: http://{API_HOST}:{server.server_address[1]}/run_scraper?numRankings=50 "
+          f"(資料 {status['data_time']}，TTL {API_CACHE_TTL:.0f} 秒，{'會' if API_CRAWL else '不會'}在本程序中爬取)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
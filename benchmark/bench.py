@@ -0,0 +1,268 @@
+"""
+離線端對端基準測試
+啟動本機的測試伺服器 (fixture_server.py)，讓 crawler.run_crawler 與 pve_crawler.run_crawler
+對它執行數次，統計每個階段的耗時與程序（含 Chrome 子進程）的最高記憶體用量，
+不需要連網，調整等待邏輯或瀏覽器參數前後可以取得可重現的數據
+
+輸出寫在臨時資料夾，不會動到 data/ 與 pve/
+
+使用方式：
+  python benchmark/bench.py --runs 3                        直接抓取 (PvP) + 瀏覽器 (PvE)
+  python benchmark/bench.py --mode browser --pvp-only       PvP 也使用瀏覽器
+  python benchmark/bench.py --mode cdp --latency-ms 100 --render-ms 1500
+  python benchmark/bench.py --json bench_result.json        另外輸出 JSON
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from fixture_server import start_server
+
+# 要計時的函式：(模組名稱, 函式名稱, 階段名稱)
+PHASES = [
+    ("crawler", "setup_driver", "launch"),
+    ("crawler", "run_direct_fetch", "direct_fetch"),
+    ("crawler", "load_page", "load"),
+    ("crawler", "wait_for_pokemon_data", "wait"),
+    ("crawler", "extract_pokemon_data", "extract"),
+    ("crawler", "save_ranking_csv", "write"),
+    ("pve_crawler", "setup_driver", "launch"),
+    ("pve_crawler", "load_page", "load"),
+    ("pve_crawler", "wait_until_ready", "wait"),
+    ("pve_crawler", "extract_pve_names", "extract"),
+    ("pve_crawler", "save_type_csv", "write"),
+]
+
+
+class PhaseRecorder:
+    """以包裝函式的方式記錄每個階段的耗時"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, key, seconds):
+        with self._lock:
+            self.samples.setdefault(key, []).append(seconds)
+
+    def wrap(self, module, name, phase):
+        original = getattr(module, name)
+        key = f"{module.__name__}.{phase}"
+
+        if asyncio.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.add(key, time.perf_counter() - start)
+            setattr(module, name, timed_async)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.add(key, time.perf_counter() - start)
+            setattr(module, name, timed)
+
+
+class MemorySampler:
+    """背景取樣本程序與所有子進程 (Chrome / chromedriver) 的 RSS"""
+
+    def __init__(self, interval=0.2):
+        import psutil
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        total = 0
+        for proc in [self.process] + self.process.children(recursive=True):
+            try:
+                total += proc.memory_info().rss
+            except Exception:
+                pass
+        self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.peak = 0
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def configure_environment(base_url, mode):
+    """在匯入爬蟲模組之前設定環境變數，讓任務網址指向測試伺服器"""
+    os.environ["PVPOKE_BASE_URL"] = base_url
+    os.environ["POKEMONGOHUB_BASE_URL"] = base_url
+    os.environ["PVPOKE_DIRECT_FETCH"] = "1" if mode == "direct" else "0"
+    os.environ["CRAWLER_ENGINE"] = "cdp" if mode == "cdp" else "selenium"
+    # 每次都要完整執行，不使用變更偵測，也不寫入排名歷史
+    os.environ["CRAWLER_CHANGE_DETECTION"] = "0"
+    os.environ["CRAWLER_HISTORY"] = "0"
+
+
+def reset_state(crawler, pve_crawler):
+    """清除上一輪的快取，讓每一輪都從冷啟動開始"""
+    crawler.close_browser_pool()
+    pve_crawler.close_browser_pool()
+    crawler.gamemaster_data = None
+    with pve_crawler.merge_lock:
+        pve_crawler.merged_results.clear()
+
+
+def run_module(module, recorder, cdp):
+    """執行模組的所有任務，回傳 {任務: 是否成功}"""
+    if cdp:
+        return module.run_with_cdp_engine(module.CRAWLER_TASKS)
+
+    def timed_task(task):
+        start = time.perf_counter()
+        try:
+            return module.run_crawler(task)
+        finally:
+            recorder.add(f"{module.__name__}.task", time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=module.BROWSER_POOL_SIZE) as executor:
+        results = list(executor.map(timed_task, module.CRAWLER_TASKS))
+    return {task["crawler_id"]: success for task, success in zip(module.CRAWLER_TASKS, results)}
+
+
+def summarize(samples):
+    """每個階段的次數與耗時統計 (毫秒)"""
+    summary = {}
+    for key, values in sorted(samples.items()):
+        values_ms = sorted(value * 1000 for value in values)
+        summary[key] = {
+            "count": len(values_ms),
+            "mean_ms": round(statistics.mean(values_ms), 1),
+            "p50_ms": round(statistics.median(values_ms), 1),
+            "p90_ms": round(values_ms[min(len(values_ms) - 1, int(len(values_ms) * 0.9))], 1),
+            "max_ms": round(values_ms[-1], 1),
+        }
+    return summary
+
+
+def print_report(args, runs, phases):
+    print("\n" + "=" * 80)
+    print(f"基準測試結果 (模式 {args.mode}，{args.runs} 輪，延遲 {args.latency_ms} ms，渲染 {args.render_ms} ms)")
+    print("=" * 80)
+    for i, run in enumerate(runs, start=1):
+        print(f"  第 {i} 輪: {run['wall_s']:.2f} 秒，成功 {run['succeeded']}/{run['tasks']}，"
+              f"最高 RSS {run['peak_rss_mb']:.0f} MB")
+
+    wall = [run["wall_s"] for run in runs]
+    print(f"  總耗時中位數 {statistics.median(wall):.2f} 秒 (最快 {min(wall):.2f}，最慢 {max(wall):.2f})")
+
+    print(f"\n  {'階段':<32}{'次數':>6}{'平均':>10}{'p50':>10}{'p90':>10}{'最大':>10}  (ms)")
+    for key, stats in phases.items():
+        print(f"  {key:<34}{stats['count']:>6}{stats['mean_ms']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p90_ms']:>10}{stats['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線端對端基準測試")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--mode", choices=["direct", "browser", "cdp"], default="direct",
+                        help="direct: PvP 直接抓取 JSON；browser: 全部使用 Selenium；cdp: 使用 CDP 引擎")
+    parser.add_argument("--latency-ms", type=int, default=50, help="測試伺服器每個回應的延遲")
+    parser.add_argument("--render-ms", type=int, default=500, help="頁面內容由 JS 渲染前的延遲")
+    parser.add_argument("--pvp-only", action="store_true")
+    parser.add_argument("--pve-only", action="store_true")
+    parser.add_argument("--json", help="另外將結果寫成 JSON 檔")
+    args = parser.parse_args()
+
+    server, base_url = start_server(0, args.latency_ms, args.render_ms)
+    print(f"✅ 測試伺服器: {base_url}")
+    configure_environment(base_url, args.mode)
+
+    # 輸出寫到臨時資料夾
+    work_dir = tempfile.mkdtemp(prefix="pvpoke_bench_")
+    os.chdir(work_dir)
+
+    import crawler
+    import pve_crawler
+
+    recorder = PhaseRecorder()
+    for module_name, name, phase in PHASES:
+        recorder.wrap(sys.modules[module_name], name, phase)
+    for module in (crawler, pve_crawler):
+        recorder.wrap(module, "crawl_page_cdp", "page")
+
+    modules = []
+    if not args.pve_only:
+        modules.append(crawler)
+    if not args.pvp_only:
+        modules.append(pve_crawler)
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            print(f"\n▶️  第 {i + 1}/{args.runs} 輪")
+            reset_state(crawler, pve_crawler)
+            results = {}
+            with MemorySampler() as memory:
+                start = time.perf_counter()
+                for module in modules:
+                    results.update(run_module(module, recorder, args.mode == "cdp"))
+                    module.close_browser_pool()
+                wall = time.perf_counter() - start
+            runs.append({
+                "wall_s": round(wall, 3),
+                "tasks": len(results),
+                "succeeded": sum(1 for success in results.values() if success),
+                "peak_rss_mb": round(memory.peak / (1024 * 1024), 1),
+            })
+    finally:
+        reset_state(crawler, pve_crawler)
+        crawler.kill_chrome_processes()
+        server.shutdown()
+
+    phases = summarize(recorder.samples)
+    print_report(args, runs, phases)
+
+    if args.json:
+        result = {
+            "mode": args.mode,
+            "latency_ms": args.latency_ms,
+            "render_ms": args.render_ms,
+            "runs": runs,
+            "phases": phases,
+        }
+        output_path = os.path.join(REPO_DIR, args.json) if not os.path.isabs(args.json) else args.json
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 結果已寫入 {output_path}")
+
+
+if __name__ == "__main__":
+    main()
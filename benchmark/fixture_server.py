@@ -0,0 +1,221 @@
+"""
+基準測試用的本機 HTTP 伺服器
+以 data/ 中現有的 CSV 產生與真實網站結構相同的頁面與 JSON，不需要連網：
+  /rankings/all/<聯盟>/overall/                    PvPoke 排名頁（.name 元素由 JS 延遲渲染）
+  /data/gamemaster.min.json                         直接抓取模式使用的 gamemaster
+  /data/rankings/all/overall/rankings-<聯盟>.json   直接抓取模式使用的排名 JSON
+  /pokemon-list/best-per-type/<屬性>                Pokemon GO Hub 屬性排名頁（含 __NEXT_DATA__）
+
+若 benchmark/snapshots/ 中有與網址路徑相同的檔案（例如手動存下的真實排名 JSON），
+會優先使用該檔案
+
+每個回應都帶有 ETag，請求的 If-None-Match 相同時回傳 304，與真實網站一樣可測試變更偵測；
+測試中修改 CSV 後呼叫 server.fixtures.load() 即可讓之後的回應使用新的內容
+
+使用方式：python benchmark/fixture_server.py --port 8765 --latency-ms 100 --render-ms 800
+"""
+import argparse
+import csv
+import hashlib
+import html
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_DIR, "data")
+SNAPSHOT_DIR = os.path.join(REPO_DIR, "benchmark", "snapshots")
+
+LEAGUES = ["1500", "2500", "10000"]
+
+RANKING_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>PvPoke Rankings {league}</title></head>
+<body>
+<div class="rankings-container"></div>
+<script>
+var rows = {rows};
+setTimeout(function () {{
+    var container = document.querySelector(".rankings-container");
+    var html = [];
+    for (var i = 0; i < rows.length; i++) {{
+        html.push('<div class="rank"><span class="name">' + rows[i][0] +
+            (rows[i][1] ? ' <span class="xl-info-icon">XL</span>' : '') + '</span></div>');
+    }}
+    container.innerHTML = html.join("");
+}}, {render_ms});
+</script>
+</body></html>
+"""
+
+PVE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Best {ptype} Pokemon</title></head>
+<body>
+<div class="layout_layout__fixture">
+<main>
+<button onclick="this.remove()">Accept</button>
+<div class="PokemonCounters_results__fixture"></div>
+</main>
+</div>
+<script id="__NEXT_DATA__" type="application/json">{next_data}</script>
+<script>
+var names = {names};
+setTimeout(function () {{
+    var html = [];
+    for (var i = 0; i < names.length; i++) {{
+        html.push('<a href="/pokemon/' + (i + 1) + '">' + names[i] + '</a>');
+    }}
+    document.querySelector('[class*="PokemonCounters_results__"]').innerHTML = html.join("");
+}}, {render_ms});
+</script>
+</body></html>
+"""
+
+
+def read_rows(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        return columns, list(reader)
+
+
+class FixtureData:
+    """由 data/ 的 CSV 產生所有回應內容"""
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.load()
+
+    def load(self):
+        """重新讀取 CSV"""
+        data_dir = self.data_dir
+        self._gamemaster_body = None
+        self.leagues = {}
+        for league in LEAGUES:
+            path = os.path.join(data_dir, f"pvpoke_{league}.csv")
+            if os.path.exists(path):
+                columns, rows = read_rows(path)
+                name_index, xl_index = columns.index("Pokemon"), columns.index("XL")
+                self.leagues[league] = [(row[name_index], row[xl_index] in ("1", "True")) for row in rows]
+
+        self.pve = {}
+        path = os.path.join(data_dir, "pve.csv")
+        if os.path.exists(path):
+            columns, rows = read_rows(path)
+            type_index, name_index = columns.index("type"), columns.index("name")
+            for row in rows:
+                self.pve.setdefault(row[type_index], []).append(row[name_index])
+
+    def gamemaster(self):
+        """每個聯盟的每一列使用獨立的 speciesId，defaultIVs 的等級決定 XL"""
+        pokemon = []
+        for league, rows in self.leagues.items():
+            for i, (name, xl) in enumerate(rows):
+                pokemon.append({
+                    "speciesId": f"fixture_{league}_{i}",
+                    "speciesName": name,
+                    "defaultIVs": {f"cp{league}": [41 if xl else 20, 15, 15, 15]},
+                })
+        return {"pokemon": pokemon}
+
+    def gamemaster_body(self):
+        """gamemaster 的內容較大，編碼一次後重複使用"""
+        if self._gamemaster_body is None:
+            self._gamemaster_body = json.dumps(self.gamemaster(), ensure_ascii=False).encode("utf-8")
+        return self._gamemaster_body
+
+    def rankings(self, league):
+        return [{"speciesId": f"fixture_{league}_{i}", "speciesName": name}
+                for i, (name, _) in enumerate(self.leagues.get(league, []))]
+
+
+def make_handler(fixtures, latency_ms, render_ms):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, body, content_type):
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+
+            path = self.path.split("?")[0]
+            parts = [part for part in path.split("/") if part and part != ".."]
+
+            snapshot = os.path.join(SNAPSHOT_DIR, *parts)
+            if os.path.isdir(snapshot):
+                snapshot = os.path.join(snapshot, "index.html")
+            if parts and os.path.isfile(snapshot):
+                with open(snapshot, "rb") as f:
+                    body = f.read()
+                content_type = "application/json" if snapshot.endswith(".json") else "text/html; charset=utf-8"
+                return self.send_body(body, content_type)
+
+            if path == "/data/gamemaster.min.json":
+                return self.send_body(fixtures.gamemaster_body(), "application/json")
+
+            if len(parts) == 5 and parts[:4] == ["data", "rankings", "all", "overall"]:
+                league = parts[4].replace("rankings-", "").replace(".json", "")
+                if league in fixtures.leagues:
+                    body = json.dumps(fixtures.rankings(league), ensure_ascii=False).encode("utf-8")
+                    return self.send_body(body, "application/json")
+
+            if len(parts) == 4 and parts[0] == "rankings" and parts[2] in fixtures.leagues:
+                rows = [[html.escape(name), int(xl)] for name, xl in fixtures.leagues[parts[2]]]
+                body = RANKING_PAGE.format(league=parts[2], rows=json.dumps(rows, ensure_ascii=False),
+                                           render_ms=render_ms)
+                return self.send_body(body.encode("utf-8"), "text/html; charset=utf-8")
+
+            if len(parts) == 3 and parts[:2] == ["pokemon-list", "best-per-type"] and parts[2] in fixtures.pve:
+                names = [html.escape(name) for name in fixtures.pve[parts[2]]]
+                next_data = json.dumps({"props": {"pageProps": {"type": parts[2], "pokemon": names}},
+                                        "buildId": "fixture"})
+                body = PVE_PAGE.format(ptype=parts[2], names=json.dumps(names, ensure_ascii=False),
+                                       next_data=next_data, render_ms=render_ms)
+                return self.send_body(body.encode("utf-8"), "text/html; charset=utf-8")
+
+            self.send_error(404)
+
+    return FixtureHandler
+
+
+def start_server(port=0, latency_ms=0, render_ms=500, data_dir=DATA_DIR):
+    """在背景線程啟動伺服器，回傳 (server, base_url)；server.fixtures 為回應使用的資料"""
+    fixtures = FixtureData(data_dir)
+    handler = make_handler(fixtures, latency_ms, render_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.fixtures = fixtures
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基準測試用的本機 HTTP 伺服器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=0, help="每個回應前的延遲")
+    parser.add_argument("--render-ms", type=int, default=500, help="頁面內容由 JS 渲染前的延遲")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.latency_ms, args.render_ms)
+    print(f"✅ 測試伺服器已啟動: {base_url} (延遲 {args.latency_ms} ms，渲染 {args.render_ms} ms)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
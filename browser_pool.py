@@ -0,0 +1,207 @@
+"""
+可重複使用的瀏覽器池
+維持少量長時間存活的 Chrome 實例，每個任務使用一個新分頁，
+使用次數達上限或瀏覽器崩潰時自動重新啟動，供 crawler.py 與 pve_crawler.py 共用
+
+等待閒置瀏覽器時會定期檢查取消與關閉，對沖嘗試不會在池滿時無限期等待；
+關閉時先等使用中的分頁歸還（例如對沖中落後的一方），不會關掉仍在使用的瀏覽器
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from retry_policy import TaskCancelled
+
+# 等待閒置瀏覽器時檢查取消與關閉的間隔 (秒)
+ACQUIRE_POLL_INTERVAL = 0.5
+# 關閉時等待使用中分頁歸還的上限 (秒)
+CLOSE_TIMEOUT = 60
+
+
+class PooledBrowser:
+    """瀏覽器池中的單一瀏覽器欄位"""
+
+    def __init__(self, browser_id, debug_port):
+        self.browser_id = browser_id
+        self.debug_port = debug_port
+        self.driver = None
+        self.user_data_dir = None
+        self.base_handle = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """有上限的瀏覽器池，以分頁的方式分配給爬蟲任務"""
+
+    def __init__(self, setup_driver, cleanup_resources, size=3, max_uses=10,
+                 base_port=None, name="Browser"):
+        """
+        setup_driver(browser_id, debug_port) 需回傳 (driver, user_data_dir)
+        base_port 為 None 時 debug_port 傳入 None，由 setup_driver 動態分配
+        cleanup_resources(driver, user_data_dir, browser_id) 負責關閉瀏覽器並清理目錄
+        """
+        self.setup_driver = setup_driver
+        self.cleanup_resources = cleanup_resources
+        self.size = size
+        self.max_uses = max_uses
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._closed = False
+        self._slots = [
+            PooledBrowser(f"{name}-{i + 1}", base_port + i if base_port is not None else None)
+            for i in range(size)
+        ]
+        self._idle = queue.Queue()
+        for slot in self._slots:
+            self._idle.put(slot)
+
+        self.launch_count = 0
+        # 每個 crawler_id 取得的分頁數，排程器用來判斷任務是否實際使用了瀏覽器
+        self._tab_counts = {}
+
+    def tabs_opened(self, crawler_id):
+        with self._lock:
+            return self._tab_counts.get(crawler_id, 0)
+
+    def _launch(self, slot):
+        """啟動欄位中的瀏覽器"""
+        slot.driver, slot.user_data_dir = self.setup_driver(slot.browser_id, slot.debug_port)
+        slot.base_handle = slot.driver.current_window_handle
+        slot.uses = 0
+        with self._lock:
+            self.launch_count += 1
+
+    def _retire(self, slot, reason):
+        """關閉欄位中的瀏覽器，下次使用時會重新啟動"""
+        if slot.driver is None and slot.user_data_dir is None:
+            return
+        print(f"[{slot.browser_id}] 回收瀏覽器 ({reason})")
+        self.cleanup_resources(slot.driver, slot.user_data_dir, slot.browser_id)
+        slot.driver = None
+        slot.user_data_dir = None
+        slot.base_handle = None
+        slot.uses = 0
+
+    @staticmethod
+    def _is_alive(slot):
+        """檢查瀏覽器是否仍可操作"""
+        try:
+            slot.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _open_tab(self, slot):
+        """開啟新分頁並清除 cookie，讓每個任務有乾淨的狀態"""
+        driver = slot.driver
+        driver.switch_to.window(slot.base_handle)
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            pass
+        driver.switch_to.new_window("tab")
+        return driver.current_window_handle
+
+    def _close_tab(self, slot, handle):
+        """關閉任務分頁並回到基底分頁"""
+        driver = slot.driver
+        if handle and handle != slot.base_handle and handle in driver.window_handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(slot.base_handle)
+
+    def _acquire(self, cancel=None, timeout=None):
+        """
+        取得閒置的瀏覽器欄位
+        等待期間 cancel 被設定時拋出 TaskCancelled，瀏覽器池關閉時拋出 RuntimeError，逾時拋出 TimeoutError
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if self._closed:
+                raise RuntimeError(f"{self.name} 瀏覽器池已關閉")
+            if cancel is not None and cancel.is_set():
+                raise TaskCancelled()
+            wait = ACQUIRE_POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"{self.name} 在 {timeout} 秒內沒有閒置的瀏覽器")
+                wait = min(wait, remaining)
+            try:
+                slot = self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+            # 等待期間瀏覽器池可能已關閉，不能再啟動新的 Chrome
+            if self._closed:
+                self._idle.put(slot)
+                raise RuntimeError(f"{self.name} 瀏覽器池已關閉")
+            return slot
+
+    @contextmanager
+    def tab(self, crawler_id, cancel=None, timeout=None):
+        """
+        取得一個瀏覽器分頁，離開時歸還瀏覽器
+        cancel: threading.Event，等待閒置瀏覽器期間被設定時放棄（對沖嘗試中另一方已完成）
+        timeout: 等待閒置瀏覽器的上限 (秒)，None 表示一直等待
+        """
+        slot = self._acquire(cancel, timeout)
+        handle = None
+        failed = False
+        try:
+            if slot.driver is None or not self._is_alive(slot):
+                self._retire(slot, "瀏覽器無回應")
+                self._launch(slot)
+            handle = self._open_tab(slot)
+            slot.uses += 1
+            with self._lock:
+                self._tab_counts[crawler_id] = self._tab_counts.get(crawler_id, 0) + 1
+            print(f"[{crawler_id}] 使用 {slot.browser_id} 的新分頁 (第 {slot.uses}/{self.max_uses} 次)")
+            yield slot.driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            try:
+                if slot.driver is not None:
+                    if failed and not self._is_alive(slot):
+                        self._retire(slot, "瀏覽器崩潰")
+                    else:
+                        self._close_tab(slot, handle)
+                        if slot.uses >= self.max_uses:
+                            self._retire(slot, "達到使用次數上限")
+            except Exception as e:
+                print(f"[{slot.browser_id}] 歸還分頁時發生錯誤: {e}")
+                self._retire(slot, "分頁狀態異常")
+            finally:
+                self._idle.put(slot)
+
+    def status(self):
+        """目前的瀏覽器狀態，供常駐模式的狀態頁使用（不會呼叫 driver）"""
+        return {
+            "name": self.name,
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "warm": sum(1 for slot in self._slots if slot.driver is not None),
+            "launch_count": self.launch_count,
+            "uses": {slot.browser_id: slot.uses for slot in self._slots},
+            "closed": self._closed,
+        }
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """關閉池中所有瀏覽器；先等待使用中的分頁歸還，超過 timeout 秒仍未歸還時強制關閉"""
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        returned = 0
+        while returned < self.size:
+            try:
+                self._idle.get(timeout=max(0, deadline - time.monotonic()))
+                returned += 1
+            except queue.Empty:
+                break
+        if returned < self.size:
+            print(f"⚠️  {self.name} 仍有 {self.size - returned} 個分頁使用中，強制關閉")
+        for slot in self._slots:
+            self._retire(slot, "瀏覽器池關閉")
+        print(f"{self.name} 瀏覽器池已關閉，共啟動過 {self.launch_count} 次瀏覽器")
@@ -0,0 +1,324 @@
+"""
+asyncio + Chrome DevTools protocol 爬蟲引擎
+不經過 chromedriver，直接以 WebSocket 與 Chrome 溝通，
+在同一個事件迴圈中同時驅動多個分頁，取代每個任務佔用一個線程的 Selenium 模式
+
+使用方式：設定環境變數 CRAWLER_ENGINE=cdp 後執行 crawler.py 或 pve_crawler.py
+任務格式與 CRAWLER_TASKS 相同，每個爬蟲提供 crawl_page_cdp(page, task) 負責單一頁面
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import request_filter
+import telemetry
+from retry_policy import backoff_delay
+from page_ready import READY_SCRIPT
+from process_registry import registry
+
+# 選擇爬蟲引擎：selenium（預設）或 cdp
+CRAWLER_ENGINE = os.environ.get("CRAWLER_ENGINE", "selenium").lower()
+
+# 與 setup_driver 相同的逾時設定
+PAGE_LOAD_TIMEOUT = 60
+COMMAND_TIMEOUT = 30
+BROWSER_START_TIMEOUT = 30
+
+CHROME_CANDIDATES = [
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome",
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
+CHROME_ARGS = [
+    "--headless=new",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-features=TranslateUI",
+    "--disable-default-apps",
+    "--no-first-run",
+    "--disable-sync",
+    "--window-size=1920,1080",
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+]
+
+
+class CDPError(Exception):
+    """DevTools protocol 指令回傳錯誤"""
+
+
+def find_chrome_binary():
+    """尋找 Chrome 執行檔，可用 CHROME_BINARY 環境變數指定"""
+    configured = os.environ.get("CHROME_BINARY")
+    if configured:
+        return configured
+    for candidate in CHROME_CANDIDATES:
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    raise FileNotFoundError("找不到 Chrome 執行檔，請設定 CHROME_BINARY")
+
+
+def wrap_async_script(script, *args):
+    """把 execute_async_script 格式的腳本包成可在 Runtime.evaluate 等待的 Promise"""
+    return ("new Promise(function (resolve) { (function () {" + script + "}).apply(null, "
+            + json.dumps(list(args)) + ".concat([resolve])); })")
+
+
+def wrap_script(script, *args):
+    """把 execute_script 格式（使用 return）的腳本包成立即執行的函式"""
+    return "(function () {" + script + "}).apply(null, " + json.dumps(list(args)) + ")"
+
+
+class CDPBrowser:
+    """單一 Chrome 程序與其 WebSocket 連線，所有分頁共用同一條連線"""
+
+    def __init__(self, name="CDP-Browser"):
+        self.name = name
+        self.process = None
+        self.user_data_dir = None
+        self.websocket = None
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = {}
+        self._reader = None
+
+    async def start(self):
+        """啟動 Chrome 並連上 DevTools"""
+        import websockets
+
+        self.user_data_dir = os.path.join(tempfile.gettempdir(), f"chrome_profile_{self.name}_{uuid.uuid4().hex[:8]}")
+        os.makedirs(self.user_data_dir, exist_ok=True)
+
+        # 使用端口 0 讓 Chrome 自行挑選空閒端口，再從 DevToolsActivePort 檔案讀取
+        args = [find_chrome_binary(), *CHROME_ARGS, "--remote-debugging-port=0",
+                f"--user-data-dir={self.user_data_dir}", "about:blank"]
+        self.process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+
+        registry.register(self.name, self.process.pid)
+
+        ws_url = await self._read_ws_url()
+        self.websocket = await websockets.connect(ws_url, max_size=None)
+        self._reader = asyncio.create_task(self._read_loop())
+        print(f"[{self.name}] Chrome 已啟動 (PID: {self.process.pid})")
+
+    async def _read_ws_url(self):
+        """等待 Chrome 寫出 DevToolsActivePort 檔案"""
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + BROWSER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.returncode is not None:
+                raise RuntimeError(f"Chrome 啟動失敗 (結束代碼 {self.process.returncode})")
+            try:
+                with open(port_file, encoding="utf-8") as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    return f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+            except FileNotFoundError:
+                pass
+            await asyncio.sleep(0.05)
+        raise TimeoutError("等待 Chrome DevTools 端口逾時")
+
+    async def _read_loop(self):
+        """接收 WebSocket 訊息，分派指令回應與事件"""
+        try:
+            async for raw in self.websocket:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(CDPError(message["error"].get("message")))
+                        else:
+                            future.set_result(message.get("result", {}))
+                else:
+                    for listener in list(self._listeners.get(message.get("sessionId"), [])):
+                        listener(message.get("method"), message.get("params", {}))
+        except Exception:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError("DevTools 連線已中斷"))
+            self._pending.clear()
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        """送出 DevTools 指令並等待回應"""
+        self._next_id += 1
+        message = {"id": self._next_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        message_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self.websocket.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # 逾時或送出失敗時回應不會再來，不移除會一直留在等待清單中
+            self._pending.pop(message_id, None)
+
+    def add_listener(self, session_id, listener):
+        self._listeners.setdefault(session_id, []).append(listener)
+
+    def remove_listeners(self, session_id):
+        self._listeners.pop(session_id, None)
+
+    async def new_page(self, crawler_id):
+        """開啟新分頁並以 flatten 模式附加 session"""
+        target = await self.send("Target.createTarget", {"url": "about:blank"})
+        attached = await self.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        page = CDPPage(self, target["targetId"], attached["sessionId"], crawler_id)
+        await page.enable()
+        return page
+
+    async def close(self):
+        """關閉連線與 Chrome 程序並清理臨時目錄"""
+        try:
+            if self.websocket:
+                await self.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        if self.websocket:
+            await self.websocket.close()
+        if self._reader:
+            self._reader.cancel()
+        if self.process and self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self.process:
+            # 連同 Chrome 的子進程 (renderer / GPU) 一起清理
+            registry.release(self.process.pid)
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+        print(f"[{self.name}] Chrome 已關閉")
+
+
+class CDPPage:
+    """單一分頁，提供載入頁面、執行腳本與網路統計"""
+
+    def __init__(self, browser, target_id, session_id, crawler_id):
+        self.browser = browser
+        self.target_id = target_id
+        self.session_id = session_id
+        self.crawler_id = crawler_id
+        self.stats = request_filter.new_stats()
+        self._load_event = asyncio.Event()
+        browser.add_listener(session_id, self._on_event)
+
+    def _on_event(self, method, params):
+        if method == "Page.loadEventFired":
+            self._load_event.set()
+        else:
+            request_filter.add_network_event(self.stats, method, params)
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.browser.send(method, params, self.session_id, timeout)
+
+    async def enable(self):
+        await self.send("Page.enable")
+        await self.send("Network.enable")
+
+    async def apply_request_filter(self, url):
+        """套用與 Selenium 模式相同的網站過濾設定"""
+        preset = request_filter.get_preset(url)
+        if request_filter.FILTER_ENABLED and preset:
+            patterns = request_filter.build_blocked_patterns(preset)
+            await self.send("Network.setBlockedURLs", {"urls": patterns})
+
+    async def goto(self, url, timeout=PAGE_LOAD_TIMEOUT):
+        """載入頁面並等待 load 事件"""
+        start = time.monotonic()
+        self._load_event.clear()
+        result = await self.send("Page.navigate", {"url": url}, timeout=timeout)
+        if result.get("errorText"):
+            raise CDPError(f"載入頁面失敗: {result['errorText']}")
+        await asyncio.wait_for(self._load_event.wait(), timeout)
+        self.stats["load_ms"] = round((time.monotonic() - start) * 1000)
+
+    async def evaluate(self, expression, timeout=COMMAND_TIMEOUT):
+        """執行 JavaScript 並回傳結果（會等待 Promise）"""
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression, "awaitPromise": True, "returnByValue": True
+        }, timeout=timeout)
+        if result.get("exceptionDetails"):
+            raise CDPError(result["exceptionDetails"].get("text", "腳本執行錯誤"))
+        return result.get("result", {}).get("value")
+
+    async def wait_until_ready(self, selector, min_count, timeout=30, quiet_ms=500,
+                               settle_ms=3000, scroll=False):
+        """與 page_ready.wait_until_ready 相同的就緒偵測"""
+        expression = wrap_async_script(READY_SCRIPT, selector, min_count, quiet_ms,
+                                       settle_ms, int(timeout * 1000), scroll)
+        return await self.evaluate(expression, timeout=timeout + 5)
+
+    async def close(self):
+        self.browser.remove_listeners(self.session_id)
+        try:
+            await self.browser.send("Target.closeTarget", {"targetId": self.target_id}, timeout=5)
+        except Exception:
+            pass
+
+
+async def _run_task(browser, semaphore, task, crawl_page, max_retries):
+    """在獨立分頁中執行單一任務，失敗時重試"""
+    crawler_id = task["crawler_id"]
+    async with semaphore:
+        for attempt in range(max_retries):
+            page = None
+            try:
+                with telemetry.span("attempt", **telemetry.task_labels(task, attempt + 1), mode="cdp") as attempt_span:
+                    print(f"[{crawler_id}] 開始爬取 (CDP，嘗試 {attempt + 1}/{max_retries})")
+                    page = await browser.new_page(crawler_id)
+                    await page.apply_request_filter(task["url"])
+                    result = await crawl_page(page, task)
+                    request_filter.report_stats(crawler_id, task["url"], page.stats)
+                    if not result:
+                        attempt_span.set(outcome="empty")
+                if result:
+                    return result
+                print(f"[{crawler_id}] 警告: 沒有找到任何資料")
+            except Exception as e:
+                print(f"[{crawler_id}] ❌ 爬取時發生錯誤 (嘗試 {attempt + 1}/{max_retries}): {e}")
+            finally:
+                if page:
+                    await page.close()
+            if attempt < max_retries - 1:
+                # 每次重試都使用新的分頁，以指數退避加上隨機抖動等待，避免所有分頁同時重試
+                await asyncio.sleep(backoff_delay("load", attempt))
+    return None
+
+
+async def run_tasks_async(tasks, crawl_page, concurrency=None, max_retries=3):
+    """以單一 Chrome 同時爬取所有任務，回傳 {crawler_id: 結果或 None}"""
+    browser = CDPBrowser()
+    with telemetry.span("launch", browser=browser.name):
+        await browser.start()
+    semaphore = asyncio.Semaphore(concurrency or len(tasks) or 1)
+    try:
+        results = await asyncio.gather(*[
+            _run_task(browser, semaphore, task, crawl_page, max_retries) for task in tasks
+        ])
+    finally:
+        await browser.close()
+    return {task["crawler_id"]: result for task, result in zip(tasks, results)}
+
+
+def run_tasks(tasks, crawl_page, concurrency=None, max_retries=3):
+    """同步介面，供爬蟲的 main 呼叫"""
+    return asyncio.run(run_tasks_async(tasks, crawl_page, concurrency, max_retries))
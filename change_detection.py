@@ -0,0 +1,149 @@
+"""
+來源變更偵測
+在啟動瀏覽器之前，先以 HTTP 驗證器 (ETag / Last-Modified) 發出條件式請求，
+或比對資料內容的指紋，確認來源沒有變動時直接跳過該任務
+
+狀態存放在 state/crawl_state.json（本機狀態，不進版本控制），只有在任務成功儲存後才會更新，
+設定 CRAWLER_CHANGE_DETECTION=0 可停用（每次都重新爬取）
+
+來源有變更時條件式請求已經下載了完整內容，keep_body=True 會保留到本次執行結束，
+爬蟲以 cached_body() 取用，不必再下載一次
+"""
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+CHANGE_DETECTION_ENABLED = os.environ.get("CRAWLER_CHANGE_DETECTION", "1") != "0"
+STATE_PATH = os.path.join("state", "crawl_state.json")
+PROBE_TIMEOUT = 15
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+def fingerprint(payload):
+    """計算內容指紋"""
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ChangeDetector:
+    """記錄每個任務來源的驗證器，判斷來源是否變動"""
+
+    def __init__(self, state_path=STATE_PATH):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._state = None
+        self._pending = {}
+        self._probe_cache = {}
+        # 本次執行檢查時下載的回應內容 {網址: bytes}，start_run() 時清除
+        self._bodies = {}
+
+    def _load(self):
+        if self._state is None:
+            try:
+                with open(self.state_path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _probe_url(self, url, previous, extract=None, keep_body=False):
+        """對單一網址發出條件式請求，回傳 (是否未變更, 新的驗證器)"""
+        # 同一次執行中，相同網址與相同舊驗證器的檢查只做一次（例如共用的 gamemaster），start_run() 時清除
+        cache_key = (url, json.dumps(previous, sort_keys=True))
+        cached = self._probe_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        headers = {"User-Agent": USER_AGENT}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=PROBE_TIMEOUT) as response:
+                body = response.read()
+                if keep_body:
+                    with self._lock:
+                        self._bodies[url] = body
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fingerprint": fingerprint(extract(body) if extract else body),
+                }
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                result = (True, previous)
+                self._probe_cache[cache_key] = result
+                return result
+            raise
+
+        unchanged = bool(previous) and previous.get("fingerprint") == validators["fingerprint"]
+        result = (unchanged, validators)
+        self._probe_cache[cache_key] = result
+        return result
+
+    def start_run(self):
+        """
+        開始新的一次執行，清除上一次的檢查結果
+        常駐程序（daemon.py、api_server.py）每次更新前都要呼叫，否則會沿用第一次的檢查結果，永遠判定為未變更
+        """
+        with self._lock:
+            self._probe_cache.clear()
+            self._bodies.clear()
+
+    def cached_body(self, url):
+        """取得本次執行檢查時下載的回應內容，沒有時回傳 None"""
+        with self._lock:
+            return self._bodies.get(url)
+
+    def is_unchanged(self, key, urls, output_paths, extract=None, keep_body=False):
+        """
+        檢查任務的所有來源網址是否都未變更，且輸出檔案都存在
+        新的驗證器會暫存起來，等任務成功後再以 commit() 寫入
+        keep_body=True 時保留下載的內容供 cached_body() 取用
+        """
+        if not CHANGE_DETECTION_ENABLED:
+            return False
+
+        with self._lock:
+            previous = self._load().get(key, {}).get("urls", {})
+
+        all_unchanged = True
+        new_validators = {}
+        for url in urls:
+            try:
+                unchanged, validators = self._probe_url(url, previous.get(url, {}), extract, keep_body)
+            except Exception as e:
+                print(f"[{key}] 變更檢查失敗，改為重新爬取: {e}")
+                return False
+            new_validators[url] = validators
+            all_unchanged = all_unchanged and unchanged
+
+        with self._lock:
+            self._pending[key] = new_validators
+
+        outputs_exist = all(os.path.exists(path) for path in output_paths)
+        return all_unchanged and outputs_exist
+
+    def commit(self, key):
+        """任務成功儲存後，寫入本次檢查取得的驗證器"""
+        with self._lock:
+            validators = self._pending.pop(key, None)
+            if validators is None:
+                return
+            state = self._load()
+            state[key] = {"urls": validators}
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_path)
+
+
+# 兩個爬蟲共用同一份狀態
+detector = ChangeDetector()
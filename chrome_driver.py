@@ -0,0 +1,147 @@
+"""
+Selenium Chrome 的啟動與清理
+crawler.py 與 pve_crawler.py 共用同一組 Chrome 參數（兩個爬蟲所需參數的聯集），
+scheduler.py / daemon.py 的共用瀏覽器池同時執行兩種任務，任何一個瀏覽器都要能處理兩個網站
+
+單獨執行 crawler.py 或 pve_crawler.py 時各自建立自己的瀏覽器池，只有排程器與常駐模式會共用
+"""
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import telemetry
+from driver_cache import invalidate_cached_driver, resolve_driver_path
+from process_registry import registry
+from request_filter import enable_network_logging
+
+CHROME_ARGS = [
+    # 基本選項
+    "--headless=new",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    # 性能優化選項 - 保留 JavaScript（網站需要）
+    # 圖片、字型與廣告改由 request_filter 依網站設定阻擋，不使用 --disable-images
+    "--disable-extensions",
+    "--disable-plugins",
+    "--disable-web-security",
+    "--disable-ipc-flooding-protection",
+    # --disable-features 只有最後一個會生效，需合併成一個參數
+    "--disable-features=VizDisplayCompositor,TranslateUI",
+    # 視窗大小 - 確保頁面正常渲染
+    "--window-size=1920,1080",
+    # 記憶體優化，PvE 頁面需要較大的 JS heap
+    "--memory-pressure-off",
+    "--max_old_space_size=4096",
+    # 穩定性選項
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-default-apps",
+    "--no-first-run",
+    "--disable-sync",
+    # User Agent - 模擬正常瀏覽器
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+]
+PAGE_LOAD_TIMEOUT = 60
+IMPLICIT_WAIT = 10
+
+
+def get_driver_path():
+    """線程安全地獲取 ChromeDriver 路徑（使用已驗證的本機快取，損壞時才重新下載）"""
+    return resolve_driver_path()
+
+
+def create_unique_user_data_dir(crawler_id):
+    """為每個爬蟲創建獨立的用戶資料目錄"""
+    temp_dir = tempfile.gettempdir()
+    unique_dir = os.path.join(temp_dir, f"chrome_profile_{crawler_id}_{uuid.uuid4().hex[:8]}")
+    os.makedirs(unique_dir, exist_ok=True)
+    return unique_dir
+
+
+def setup_driver(crawler_id, debug_port=None):
+    """為指定的爬蟲設定 Selenium WebDriver，回傳 (driver, user_data_dir)"""
+    # selenium 只在需要啟動瀏覽器時才載入
+    from selenium import webdriver
+    from selenium.common.exceptions import SessionNotCreatedException
+    from selenium.webdriver.chrome.service import Service
+
+    print(f"[{crawler_id}] 正在初始化 WebDriver...")
+
+    # 動態分配空閒的調試端口，避免多個爬蟲工作互相衝突
+    if debug_port is None:
+        debug_port = registry.allocate_port()
+
+    # 創建獨立的用戶資料目錄
+    user_data_dir = create_unique_user_data_dir(crawler_id)
+
+    options = webdriver.ChromeOptions()
+    for arg in CHROME_ARGS:
+        options.add_argument(arg)
+    # 為每個爬蟲指定獨立資源
+    options.add_argument(f"--user-data-dir={user_data_dir}")
+    options.add_argument(f"--remote-debugging-port={debug_port}")
+
+    # 記錄網路事件，用於統計每個任務的傳輸量
+    enable_network_logging(options)
+
+    # 獲取 ChromeDriver 路徑
+    chrome_driver_path = get_driver_path()
+    driver_resolved_at = time.time()
+
+    driver = None
+    try:
+        with telemetry.span("launch", browser=crawler_id, port=debug_port):
+            try:
+                driver = webdriver.Chrome(service=Service(chrome_driver_path), options=options)
+            except SessionNotCreatedException as e:
+                # Chrome 自動更新後快取的 ChromeDriver 可能已不相容，重新下載後再試一次
+                if not invalidate_cached_driver(driver_resolved_at):
+                    raise
+                print(f"[{crawler_id}] 無法建立瀏覽器工作階段，重新取得 ChromeDriver 後再試一次: {e.msg}")
+                driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+        # 登記 chromedriver 與 Chrome 的進程樹，清理時只處理這些進程
+        registry.register(crawler_id, driver.service.process.pid, debug_port)
+
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.implicitly_wait(IMPLICIT_WAIT)
+
+        print(f"[{crawler_id}] WebDriver 初始化成功，使用端口: {debug_port}")
+        return driver, user_data_dir
+
+    except Exception as e:
+        print(f"[{crawler_id}] WebDriver 初始化失敗: {e}")
+        if driver:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            registry.release(driver.service.process.pid)
+        registry.release_port(debug_port)
+        # 清理資源
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        raise
+
+
+def cleanup_crawler_resources(driver, user_data_dir, crawler_id):
+    """清理爬蟲相關資源"""
+    if driver:
+        root_pid = driver.service.process.pid if driver.service.process else None
+        try:
+            driver.quit()
+            print(f"[{crawler_id}] WebDriver 已關閉")
+        except Exception as e:
+            print(f"[{crawler_id}] 關閉 WebDriver 時發生錯誤: {e}")
+        # 確保沒有殘留的子進程
+        if root_pid:
+            registry.release(root_pid)
+
+    # 清理臨時目錄
+    try:
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        print(f"[{crawler_id}] 已清理臨時目錄: {user_data_dir}")
+    except Exception as e:
+        print(f"[{crawler_id}] 清理臨時目錄時發生錯誤: {e}")
@@ -0,0 +1,126 @@
+"""
+預先壓縮的靜態資料與大小預算報告
+為 data/ 中前端會下載的檔案產生 .gz 與 .br 版本（內容沒變時不重寫），
+讓支援預壓縮檔的靜態伺服器 (例如 nginx gzip_static / brotli_static) 可以直接提供，
+並列出每個檔案原始與壓縮後的大小，超過預算時提出警告
+壓縮檔是部署時的產物，不進版本控制（.gitignore），在提供網頁的主機上發佈資料後執行
+
+brotli 列在 requirements.txt；未安裝時只產生 .gz 並提出警告，--strict 時視為預算檢查失敗
+環境變數：
+  ARTIFACT_COMPRESSION=0       停用
+  ARTIFACT_SIZE_BUDGET_KB      單一檔案壓縮後的大小上限，預設 16 KB
+
+使用方式：python compress_artifacts.py [--strict]    --strict 時超過預算或缺少 brotli 會以錯誤碼結束
+"""
+import glob
+import gzip
+import importlib.util
+import os
+import sys
+
+from output_writer import atomic_write_bytes
+
+COMPRESSION_ENABLED = os.environ.get("ARTIFACT_COMPRESSION", "1") != "0"
+SIZE_BUDGET_BYTES = int(float(os.environ.get("ARTIFACT_SIZE_BUDGET_KB", "16")) * 1024)
+
+ARTIFACT_PATTERNS = [
+    "data/pvpoke_*.csv",
+    "data/pve.csv",
+    "data/update_log.json",
+    "data/shards/*.json",
+    "data/shards/*/*.json",
+]
+
+
+def list_artifacts():
+    paths = set()
+    for pattern in ARTIFACT_PATTERNS:
+        paths.update(glob.glob(pattern))
+    return sorted(path.replace(os.sep, "/") for path in paths)
+
+
+def brotli_available():
+    return importlib.util.find_spec("brotli") is not None
+
+
+def brotli_compress(data):
+    """brotli 未安裝時回傳 None"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def write_variant(path, data):
+    """壓縮檔內容不同時才寫入"""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    atomic_write_bytes(path, data)
+    return True
+
+
+def compress_artifact(path):
+    """產生單一檔案的壓縮版本，回傳各版本的大小"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # mtime=0 讓相同內容產生相同的 .gz，內容沒變時不重寫
+    gzip_data = gzip.compress(data, compresslevel=9, mtime=0)
+    write_variant(path + ".gz", gzip_data)
+    sizes = {"file": path, "raw": len(data), "gzip": len(gzip_data), "brotli": None}
+
+    brotli_data = brotli_compress(data)
+    if brotli_data is not None:
+        write_variant(path + ".br", brotli_data)
+        sizes["brotli"] = len(brotli_data)
+    return sizes
+
+
+def format_kb(size):
+    return f"{size / 1024:.1f} KB" if size is not None else "-"
+
+
+def compress_artifacts(budget=SIZE_BUDGET_BYTES):
+    """壓縮所有前端資料並印出大小報告，回傳超過預算的檔案"""
+    if not COMPRESSION_ENABLED:
+        return []
+
+    report = [compress_artifact(path) for path in list_artifacts()]
+    if not report:
+        return []
+    if report[0]["brotli"] is None:
+        print("⚠️  未安裝 brotli，只產生 .gz 檔案，.br 可能是舊的內容 (pip install -r requirements.txt)")
+
+    over_budget = []
+    width = max(len(sizes["file"]) for sizes in report)
+    print(f"\n📦 前端資料大小 (預算 {format_kb(budget)} / 檔):")
+    print(f"  {'檔案'.ljust(width - 2)}  {'原始':>8}  {'gzip':>10}  {'brotli':>10}")
+    for sizes in report:
+        compressed = min(size for size in (sizes["gzip"], sizes["brotli"]) if size is not None)
+        mark = "✅" if compressed <= budget else "⚠️"
+        if compressed > budget:
+            over_budget.append(sizes["file"])
+        print(f"  {sizes['file'].ljust(width)}  {format_kb(sizes['raw']):>10}  "
+              f"{format_kb(sizes['gzip']):>10}  {format_kb(sizes['brotli']):>10}  {mark}")
+
+    total_raw = sum(sizes["raw"] for sizes in report)
+    total_gzip = sum(sizes["gzip"] for sizes in report)
+    print(f"  總計 {len(report)} 個檔案: {format_kb(total_raw)} -> gzip {format_kb(total_gzip)}")
+    if over_budget:
+        print(f"⚠️  {len(over_budget)} 個檔案超過大小預算: {', '.join(over_budget)}")
+    return over_budget
+
+
+if __name__ == "__main__":
+    over = compress_artifacts()
+    if "--strict" in sys.argv:
+        if COMPRESSION_ENABLED and not brotli_available():
+            print("❌ 未安裝 brotli，無法產生 .br 檔案，預算檢查失敗")
+            sys.exit(1)
+        if over:
+            sys.exit(1)
@@ -1,458 +1,546 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import time
-import pandas as pd
+IMPORT_START = time.time()
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
 import os
 from datetime import datetime
-from git import Repo
-import shutil
 import threading
-import tempfile
 from pathlib import Path
-import uuid
-import psutil
+from contextlib import contextmanager
 import signal
 import sys
+import json
+import urllib.request
+from browser_pool import BrowserPool
+from page_ready import wait_until_ready
+from request_filter import apply_request_filter, report_network_stats
+import cdp_engine
+from cdp_engine import CRAWLER_ENGINE
+from change_detection import detector
+from output_writer import write_rows_if_changed
+from process_registry import kill_crawler_processes
+from chrome_driver import setup_driver, cleanup_crawler_resources, get_driver_path
+from startup_report import report_startup
+from history_store import record_ranking
+from publish_artifacts import publish_artifacts
+import telemetry
+from retry_policy import CrawlFailure, run_with_retries, RENDER, EMPTY
+from hedging import run_hedged, latency_history
+from name_normalizer import clean_text, display_name, normalize_column, register_aliases
 
-# 自動清除壞掉的 .wdm cache
-cache_dir = os.path.join(os.path.expanduser("~"), ".wdm")
-if os.path.exists(cache_dir):
-    shutil.rmtree(cache_dir)
-    print("已清除 .wdm cache，等待重新下載乾淨的 driver")
+# 可用環境變數指向本機的測試伺服器
+PVPOKE_BASE_URL = os.environ.get("PVPOKE_BASE_URL", "https://pvpoketw.com").rstrip("/")
 
 # 定義3個爬蟲任務
 CRAWLER_TASKS = [
     {
         "crawler_id": "Crawler-1500",
         "filename": "pvpoke_1500.csv",
-        "url": "https://pvpoketw.com/rankings/all/1500/overall/",
-        "debug_port": 9222
+        "url": f"{PVPOKE_BASE_URL}/rankings/all/1500/overall/",
+        "league": 1500
     },
     {
         "crawler_id": "Crawler-2500", 
         "filename": "pvpoke_2500.csv",
-        "url": "https://pvpoketw.com/rankings/all/2500/overall/",
-        "debug_port": 9223
+        "url": f"{PVPOKE_BASE_URL}/rankings/all/2500/overall/",
+        "league": 2500
     },
     {
         "crawler_id": "Crawler-10000",
         "filename": "pvpoke_10000.csv", 
-        "url": "https://pvpoketw.com/rankings/all/10000/overall/",
-        "debug_port": 9224
+        "url": f"{PVPOKE_BASE_URL}/rankings/all/10000/overall/",
+        "league": 10000
     }
 ]
 
+# 直接抓取模式：排名頁面本身是由靜態的 rankings / gamemaster JSON 渲染，
+# 直接用 HTTP 取得 JSON 即可算出相同的 Pokemon,XL 資料，不需要啟動瀏覽器
+# 可用環境變數指向本機的測試伺服器，或設定 PVPOKE_DIRECT_FETCH=0 停用
+PVPOKE_DATA_BASE_URL = os.environ.get("PVPOKE_DATA_BASE_URL", f"{PVPOKE_BASE_URL}/data").rstrip("/")
+DIRECT_FETCH_ENABLED = os.environ.get("PVPOKE_DIRECT_FETCH", "1") != "0"
+DIRECT_FETCH_TIMEOUT = 15
+# 與 wait_for_pokemon_data 的判斷標準一致：少於 50 筆視為資料不完整
+DIRECT_FETCH_MIN_ROWS = 50
+# Master League 沒有 defaultIVs 時，PvPoke 預設使用 50 等
+MASTER_LEAGUE_DEFAULT_LEVEL = 50
+
+# 頁面就緒判斷：超過 50 個有文字的 name 元素
+READY_MIN_NAMES = 51
+
+# 在頁面內一次取出所有 name 元素的文字與 XL 圖示
+EXTRACT_NAMES_SCRIPT = """
+return Array.prototype.map.call(document.getElementsByClassName("name"), function (e) {
+    return [e.innerText, e.querySelector(".xl-info-icon") !== null || e.innerHTML.indexOf("xl-info-icon") !== -1];
+});
+"""
+
 # 全域變數和鎖
-driver_lock = threading.Lock()
-driver_path = None
+gamemaster_lock = threading.Lock()
+gamemaster_data = None
+browser_pool_lock = threading.Lock()
+browser_pool = None
+
+# 瀏覽器池設定：同時存活的 Chrome 數量與每個 Chrome 可服務的任務數
+BROWSER_POOL_SIZE = 3
+BROWSER_MAX_USES = 10
 
 def signal_handler(sig, frame):
     """處理中斷信號，確保清理資源"""
     print("\n收到中斷信號，正在清理資源...")
+    close_browser_pool(wait=False)
     kill_chrome_processes()
     sys.exit(0)
 
-def get_driver_path():
-    """線程安全地獲取 ChromeDriver 路徑"""
-    global driver_path
-    with driver_lock:
-        if driver_path is None:
-            print("正在下載和安裝 ChromeDriver...")
-            driver_path = ChromeDriverManager().install()
-            print(f"ChromeDriver 安裝完成: {driver_path}")
-            
-            # 確保檔案權限正確
-            try:
-                os.chmod(driver_path, 0o755)
-            except Exception as e:
-                print(f"設定 ChromeDriver 權限時發生警告: {e}")
-        
-        return driver_path
-
-def create_unique_user_data_dir(crawler_id):
-    """為每個爬蟲創建獨立的用戶資料目錄"""
-    temp_dir = tempfile.gettempdir()
-    unique_dir = os.path.join(temp_dir, f"chrome_profile_{crawler_id}_{uuid.uuid4().hex[:8]}")
-    os.makedirs(unique_dir, exist_ok=True)
-    return unique_dir
-
-def setup_driver(crawler_id, debug_port):
-    """為指定的爬蟲設定 Selenium WebDriver"""
-    print(f"[{crawler_id}] 正在初始化 WebDriver...")
-    
-    # 創建獨立的用戶資料目錄
-    user_data_dir = create_unique_user_data_dir(crawler_id)
-    
-    options = webdriver.ChromeOptions()
-    
-    # 基本選項
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    
-    # 為每個爬蟲指定獨立資源
-    options.add_argument(f"--user-data-dir={user_data_dir}")
-    options.add_argument(f"--remote-debugging-port={debug_port}")
-    
-    # 性能優化選項 - 保留 JavaScript（網站需要）
-    options.add_argument("--disable-extensions")
-    options.add_argument("--disable-plugins")
-    # 不要禁用圖片，可能影響頁面載入判斷
-    # options.add_argument("--disable-images")
-    options.add_argument("--disable-web-security")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    options.add_argument("--disable-ipc-flooding-protection")
-    
-    # 視窗大小 - 確保頁面正常渲染
-    options.add_argument("--window-size=1920,1080")
-    
-    # 記憶體優化
-    options.add_argument("--memory-pressure-off")
-    options.add_argument("--max_old_space_size=2048")
-    
-    # 穩定性選項
-    options.add_argument("--disable-background-timer-throttling")
-    options.add_argument("--disable-backgrounding-occluded-windows")
-    options.add_argument("--disable-renderer-backgrounding")
-    options.add_argument("--disable-features=TranslateUI")
-    options.add_argument("--disable-default-apps")
-    options.add_argument("--no-first-run")
-    options.add_argument("--disable-sync")
-    
-    # User Agent - 模擬正常瀏覽器
-    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    # 獲取 ChromeDriver 路徑
-    chrome_driver_path = get_driver_path()
+def get_browser_pool():
+    """線程安全地取得共用的瀏覽器池"""
+    global browser_pool
+    with browser_pool_lock:
+        if browser_pool is None:
+            browser_pool = BrowserPool(
+                setup_driver, cleanup_crawler_resources,
+                size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES,
+                name="Crawler-Browser"
+            )
+        return browser_pool
+
+def close_browser_pool(wait=True):
+    """關閉瀏覽器池中的所有 Chrome；wait=False 時不等待使用中的分頁（中斷時使用）"""
+    global browser_pool
+    with browser_pool_lock:
+        if browser_pool is not None:
+            if wait:
+                browser_pool.close()
+            else:
+                browser_pool.close(timeout=0)
+            browser_pool = None
+
+def kill_chrome_processes():
+    """只清理爬蟲自己啟動並登記的 Chrome 進程，保留其他 Chrome"""
+    kill_crawler_processes()
+
+def wait_for_pokemon_data(driver, crawler_id, max_wait=30):
+    """等待 Pokemon 資料載入完成 - 在頁面內偵測清單已填滿且不再變動"""
+    print(f"[{crawler_id}] 等待頁面元素載入...")
     
-    driver = None
-    try:
-        service = Service(chrome_driver_path)
-        driver = webdriver.Chrome(service=service, options=options)
+    with telemetry.span("wait") as wait_span:
+        try:
+            # 超過 50 個有文字的 name 元素且 DOM 靜止時即視為載入完成
+            result = wait_until_ready(driver, ".name", READY_MIN_NAMES, timeout=max_wait, scroll=True)
+        except Exception as e:
+            print(f"[{crawler_id}] 等待時發生錯誤: {e}")
+            wait_span.set(outcome="error", error=str(e)[:200])
+            return False
         
-        # 增加超時時間
-        driver.set_page_load_timeout(60)
-        driver.implicitly_wait(10)
+        count = result.get("count", 0)
+        elapsed = result.get("elapsed_ms", 0) / 1000
+        wait_span.set(count=count, reason=result.get("reason"))
         
-        print(f"[{crawler_id}] WebDriver 初始化成功，使用端口: {debug_port}")
-        return driver, user_data_dir
+        if result.get("ready"):
+            print(f"[{crawler_id}] ✓ 頁面載入完成，找到 {count} 個有效元素 (耗時 {elapsed:.2f} 秒)")
+            return True
         
-    except Exception as e:
-        print(f"[{crawler_id}] WebDriver 初始化失敗: {e}")
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-        # 清理資源
-        try:
-            shutil.rmtree(user_data_dir, ignore_errors=True)
-        except:
-            pass
-        raise
-
-def cleanup_crawler_resources(driver, user_data_dir, crawler_id):
-    """清理爬蟲相關資源"""
-    if driver:
-        try:
-            driver.quit()
-            print(f"[{crawler_id}] WebDriver 已關閉")
-        except Exception as e:
-            print(f"[{crawler_id}] 關閉 WebDriver 時發生錯誤: {e}")
+        wait_span.set(outcome="timeout")
+        # 逾時但已有一定數量的元素，仍繼續處理
+        if count > 20:
+            print(f"[{crawler_id}] 等待超時，但找到 {count} 個元素，繼續處理")
+            return True
+        
+        print(f"[{crawler_id}] 等待超時，資料可能未完全載入")
+        return False
+
+def clean_extracted_rows(rows, crawler_id):
+    """清理頁面回傳的 [文字, 是否有 XL 圖示] 資料"""
+    clean_names = []
+    xl_list = []
     
-    # 清理臨時目錄
-    try:
-        shutil.rmtree(user_data_dir, ignore_errors=True)
-        print(f"[{crawler_id}] 已清理臨時目錄: {user_data_dir}")
-    except Exception as e:
-        print(f"[{crawler_id}] 清理臨時目錄時發生錯誤: {e}")
+    skipped_empty = 0
+    skipped_invalid = 0
 
-def kill_chrome_processes():
-    """只清理爬蟲相關的 Chrome 進程，保留正常使用的 Chrome"""
-    try:
-        killed_count = 0
-        crawler_ports = [9222, 9223, 9224]
+    for text, has_xl in rows:
+        text = (text or "").strip()
+
+        if not text:
+            skipped_empty += 1
+            continue
         
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                if 'chrome' in proc.info['name'].lower():
-                    cmdline = ' '.join(proc.info['cmdline'] or [])
-                    
-                    should_kill = False
-                    
-                    for port in crawler_ports:
-                        if f'--remote-debugging-port={port}' in cmdline:
-                            should_kill = True
-                            break
-                    
-                    if '--headless' in cmdline:
-                        should_kill = True
-                    
-                    if 'chrome_profile_Crawler' in cmdline:
-                        should_kill = True
-                    
-                    if should_kill:
-                        proc.kill()
-                        killed_count += 1
-                        print(f"已終止爬蟲 Chrome 進程 PID: {proc.info['pid']}")
-                        
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
+        # 過濾掉導航/選單項目（通常是單字且不含數字）
+        # Pokemon 名稱通常較長或包含特定模式
+        if len(text) < 2:
+            skipped_invalid += 1
+            continue
+
+        # 移除 XL 標記，型態在儲存時由 name_normalizer 拆開
+        clean_name = clean_text(text)
         
-        if killed_count > 0:
-            print(f"共終止 {killed_count} 個爬蟲相關的 Chrome 進程")
-        else:
-            print("沒有找到需要清理的爬蟲 Chrome 進程")
-            
-    except Exception as e:
-        print(f"清理爬蟲 Chrome 進程時發生錯誤: {e}")
+        if len(display_name(clean_name)) < 2:
+            skipped_invalid += 1
+            continue
+        
+        clean_names.append(clean_name)
 
-def scroll_and_wait(driver, crawler_id):
-    """滾動頁面並等待動態內容載入"""
-    print(f"[{crawler_id}] 滾動頁面以觸發動態載入...")
+        # XL 判斷
+        xl_list.append(1 if has_xl else 0)
+
+    print(f"[{crawler_id}] 成功提取 {len(clean_names)} 個寶可夢資料")
+    print(f"[{crawler_id}] (跳過 {skipped_empty} 個空元素, {skipped_invalid} 個無效元素)")
     
+    return clean_names, xl_list
+
+def extract_pokemon_data(driver, crawler_id):
+    """提取 Pokemon 資料 - 一次腳本呼叫取回所有名字與 XL 標記"""
+    with telemetry.span("extract") as extract_span:
+        try:
+            # 每個元素回傳 [文字, 是否有 XL 圖示]，避免逐一呼叫 e.text / get_attribute
+            rows = driver.execute_script(EXTRACT_NAMES_SCRIPT)
+            print(f"[{crawler_id}] 找到 {len(rows)} 個 name 元素")
+            extract_span.set(elements=len(rows))
+
+            if not rows:
+                extract_span.set(count=0, outcome="empty")
+                return [], []
+
+            names_list, xl_list = clean_extracted_rows(rows, crawler_id)
+            extract_span.set(count=len(names_list))
+            return names_list, xl_list
+
+        except Exception as e:
+            print(f"[{crawler_id}] 提取資料時發生錯誤: {e}")
+            extract_span.set(outcome="error", error=str(e)[:200])
+            return [], []
+
+
+def fetch_json(url, timeout=DIRECT_FETCH_TIMEOUT):
+    """以一般 HTTP 請求取得 JSON 資料，變更檢查時已下載過的內容直接使用"""
+    body = detector.cached_body(url)
+    if body is not None:
+        return json.loads(body.decode("utf-8"))
+    request = urllib.request.Request(url, headers={
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "application/json"
+    })
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+def get_gamemaster():
+    """線程安全地取得 gamemaster，同一次執行只下載一次"""
+    global gamemaster_data
+    with gamemaster_lock:
+        if gamemaster_data is None:
+            url = get_gamemaster_url()
+            print(f"正在下載 gamemaster: {url}")
+            data = fetch_json(url)
+            pokemon_list = data.get("pokemon", []) if isinstance(data, dict) else []
+            if not pokemon_list:
+                raise ValueError("gamemaster 中沒有 pokemon 資料")
+            gamemaster_data = {p["speciesId"]: p for p in pokemon_list if "speciesId" in p}
+            # 名稱唯一的寶可夢，比對鍵直接使用 speciesId
+            name_counts = Counter(p.get("speciesName") for p in gamemaster_data.values())
+            register_aliases({p.get("speciesName"): species_id for species_id, p in gamemaster_data.items()
+                              if name_counts[p.get("speciesName")] == 1})
+            print(f"gamemaster 載入完成，共 {len(gamemaster_data)} 種寶可夢")
+        return gamemaster_data
+
+def ensure_name_aliases(crawler_id):
+    """瀏覽器取得的是頁面上的中文名稱，先載入 gamemaster 註冊名稱 -> speciesId，比對鍵才能與 PvE 對應"""
+    if gamemaster_data is not None:
+        return
     try:
-        # 滾動到頁面底部再回到頂部，觸發所有內容載入
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
-        driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(1)
-        
-        # 再次滾動到中間位置
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
-        time.sleep(1)
-        
+        get_gamemaster()
     except Exception as e:
-        print(f"[{crawler_id}] 滾動頁面時發生錯誤: {e}")
+        print(f"[{crawler_id}] ⚠️  無法載入 gamemaster，比對鍵改由頁面名稱產生，可能無法與 PvE 資料對應: {e}")
 
-def wait_for_pokemon_data(driver, crawler_id, max_wait=30):
-    """等待 Pokemon 資料載入完成 - 改進版"""
-    print(f"[{crawler_id}] 等待頁面元素載入...")
-    
-    # 首先等待基本頁面載入
-    time.sleep(5)
-    
-    # 滾動頁面觸發動態載入
-    scroll_and_wait(driver, crawler_id)
-    
-    # 等待並檢查是否有足夠的資料
-    for i in range(max_wait):
+def get_gamemaster_url():
+    return f"{PVPOKE_DATA_BASE_URL}/gamemaster.min.json"
+
+def get_rankings_url(task):
+    """組出排名 JSON 的網址，與排名頁面使用的資料相同"""
+    cup = task.get("cup", "all")
+    category = task.get("category", "overall")
+    return f"{PVPOKE_DATA_BASE_URL}/rankings/{cup}/{category}/rankings-{task['league']}.json"
+
+def needs_xl_candy(species, league):
+    """依照 PvPoke 的規則判斷是否需要 XL 糖果（預設 IV 的等級超過 40）"""
+    default_ivs = species.get("defaultIVs", {}).get(f"cp{league}")
+    if default_ivs:
+        level = default_ivs[0]
+    elif int(league) == 10000:
+        level = MASTER_LEAGUE_DEFAULT_LEVEL
+    else:
+        return None
+    return 1 if level > 40 else 0
+
+def build_rows_from_json(rankings, gamemaster, league):
+    """由排名與 gamemaster JSON 計算出與頁面相同的 Pokemon,XL 資料"""
+    if not isinstance(rankings, list):
+        raise ValueError("排名 JSON 格式不正確")
+
+    clean_names = []
+    xl_list = []
+
+    for entry in rankings:
+        species_id = entry.get("speciesId")
+        species = gamemaster.get(species_id)
+        if species is None:
+            # 排名中出現 gamemaster 沒有的寶可夢，表示兩份資料版本不一致
+            raise ValueError(f"gamemaster 中找不到 {species_id}")
+
+        xl = needs_xl_candy(species, league)
+        if xl is None:
+            raise ValueError(f"{species_id} 沒有 cp{league} 的預設 IV")
+
+        clean_name = clean_text(species.get("speciesName") or entry.get("speciesName", ""))
+        if len(display_name(clean_name)) < 2:
+            continue
+
+        clean_names.append(clean_name)
+        xl_list.append(xl)
+
+    return clean_names, xl_list
+
+def run_direct_fetch(task):
+    """直接抓取 JSON 計算資料，失敗或驗證不通過時回傳 None"""
+    crawler_id = task["crawler_id"]
+    url = get_rankings_url(task)
+
+    with telemetry.span("fetch", url=url) as fetch_span:
         try:
-            elements = driver.find_elements(By.CLASS_NAME, "name")
-            
-            # 檢查有多少元素有實際文字內容
-            elements_with_text = [e for e in elements if e.text.strip()]
-            
-            print(f"[{crawler_id}] 第 {i+1} 秒: 找到 {len(elements)} 個 name 元素, {len(elements_with_text)} 個有文字")
-            
-            # 如果找到超過 50 個有文字的元素，認為載入完成
-            if len(elements_with_text) > 50:
-                print(f"[{crawler_id}] ✓ 頁面載入完成，找到 {len(elements_with_text)} 個有效元素")
-                return True
-            
-            # 每 5 秒滾動一次頁面
-            if i > 0 and i % 5 == 0:
-                scroll_and_wait(driver, crawler_id)
-            
-            time.sleep(1)
-            
+            print(f"[{crawler_id}] 直接抓取排名資料: {url}")
+            start_time = time.time()
+            rankings = fetch_json(url)
+            gamemaster = get_gamemaster()
+            names_list, xl_list = build_rows_from_json(rankings, gamemaster, task["league"])
         except Exception as e:
-            print(f"[{crawler_id}] 等待時發生錯誤: {e}")
-            time.sleep(1)
+            print(f"[{crawler_id}] 直接抓取失敗: {e}")
+            fetch_span.set(outcome="error", error=str(e)[:200])
+            return None
+
+        fetch_span.set(count=len(names_list))
+        if len(names_list) < DIRECT_FETCH_MIN_ROWS:
+            print(f"[{crawler_id}] 直接抓取的資料只有 {len(names_list)} 筆，驗證不通過")
+            fetch_span.set(outcome="invalid")
+            return None
+
+    print(f"[{crawler_id}] 直接抓取成功，共 {len(names_list)} 筆 (耗時 {time.time() - start_time:.2f} 秒)")
+    return names_list, xl_list
+
+def save_ranking_csv(filename, names_list, xl_list, keys):
+    """儲存排名資料到 data/ 資料夾，Key 為與 PvE 資料共用的比對鍵"""
+    path = f"data/{filename}"
+    with telemetry.span("write", file=path, count=len(names_list)) as write_span:
+        # 儲存成 CSV 檔案，內容沒變時不重寫
+        changed = write_rows_if_changed(path, ["Pokemon", "XL", "Key"], zip(names_list, xl_list, keys))
+        write_span.set(changed=changed, bytes=os.path.getsize(path) if changed else 0)
+    return changed
+
+def load_and_extract(driver, task):
+    """在已取得的分頁中載入排名頁面並提取資料"""
+    load_page(driver, task)
     
-    # 最後再檢查一次
-    try:
-        elements = driver.find_elements(By.CLASS_NAME, "name")
-        elements_with_text = [e for e in elements if e.text.strip()]
-        if len(elements_with_text) > 20:
-            print(f"[{crawler_id}] 等待超時，但找到 {len(elements_with_text)} 個元素，繼續處理")
-            return True
-    except:
-        pass
+    # 使用改進的等待策略
+    wait_for_pokemon_data(driver, task["crawler_id"])
     
-    print(f"[{crawler_id}] 等待超時，資料可能未完全載入")
-    return False
+    # 提取資料
+    return extract_pokemon_data(driver, task["crawler_id"])
 
-def extract_pokemon_data(driver, crawler_id):
-    """提取 Pokemon 資料 - 改進版"""
-    try:
-        # 再次確保頁面完全載入
-        time.sleep(2)
-        
-        name_elements = driver.find_elements(By.CLASS_NAME, "name")
-        print(f"[{crawler_id}] 找到 {len(name_elements)} 個 name 元素")
+# 以下為重試引擎使用的步驟，失敗時拋出 CrawlFailure，讓重試從對應的階段開始
+def load_page(driver, task, state=None):
+    """載入排名頁面"""
+    print(f"[{task['crawler_id']}] 正在載入頁面: {task['url']}")
+    with telemetry.span("load", url=task["url"]):
+        driver.get(task["url"])
 
-        if not name_elements:
-            return [], []
+def wait_page(driver, task, state=None):
+    """等待排名清單渲染完成"""
+    if not wait_for_pokemon_data(driver, task["crawler_id"]):
+        raise CrawlFailure(RENDER, "頁面沒有在時間內載入完成")
 
-        clean_names = []
-        xl_list = []
-        
-        skipped_empty = 0
-        skipped_invalid = 0
-
-        for e in name_elements:
-            try:
-                text = e.text.strip()
-                html = e.get_attribute("innerHTML")
-
-                if not text:
-                    skipped_empty += 1
-                    continue
-                
-                # 過濾掉導航/選單項目（通常是單字且不含數字）
-                # Pokemon 名稱通常較長或包含特定模式
-                if len(text) < 2:
-                    skipped_invalid += 1
-                    continue
-
-                # 清理名字：移除 XL 標記並取第一個詞
-                clean_name = text.replace("XL", "").strip().split(" ")[0]
-                
-                if not clean_name or len(clean_name) < 2:
-                    skipped_invalid += 1
-                    continue
-                
-                clean_names.append(clean_name)
-
-                # XL 判斷
-                xl_list.append(1 if "xl-info-icon" in html else 0)
-                
-            except Exception as e_inner:
-                print(f"[{crawler_id}] 處理單個元素時發生錯誤: {e_inner}")
-                continue
-
-        print(f"[{crawler_id}] 成功提取 {len(clean_names)} 個寶可夢資料")
-        print(f"[{crawler_id}] (跳過 {skipped_empty} 個空元素, {skipped_invalid} 個無效元素)")
-        
-        return clean_names, xl_list
+def extract_page(driver, task, state=None):
+    """提取排名資料，回傳 (名稱, XL)"""
+    names_list, xl_list = extract_pokemon_data(driver, task["crawler_id"])
+    if not names_list:
+        raise CrawlFailure(EMPTY, f"{task['filename']} 沒有找到任何資料")
+    return names_list, xl_list
 
-    except Exception as e:
-        print(f"[{crawler_id}] 提取資料時發生錯誤: {e}")
-        return [], []
+@contextmanager
+def open_task_tab(task, cancel=None):
+    """從瀏覽器池取得分頁並套用請求過濾，不再每次嘗試都啟動新的 Chrome；cancel 設定後放棄等待閒置的瀏覽器"""
+    crawler_id = task["crawler_id"]
+    with get_browser_pool().tab(crawler_id, cancel=cancel) as driver:
+        apply_request_filter(driver, task["url"], crawler_id)
+        yield driver
+        report_network_stats(driver, crawler_id, task["url"])
 
+def store_ranking(task, names_list, xl_list, source=""):
+    """正規化名稱後儲存排名資料並印出統計結果"""
+    crawler_id = task["crawler_id"]
+    filename = task["filename"]
+    names_list, keys = normalize_column(names_list)
+    save_ranking_csv(filename, names_list, xl_list, keys)
+    
+    # 統計結果
+    xl_count = sum(xl_list)
+    total_count = len(names_list)
+    suffix = f" ({source})" if source else ""
+    print(f"[{crawler_id}] ✅ {filename} 資料已成功抓取並儲存{suffix}")
+    print(f"[{crawler_id}] 總計 {total_count} 隻寶可夢，其中 {xl_count} 隻需要XL糖")
+    detector.commit(crawler_id)
+    record_ranking("pvp", str(task["league"]), names_list, xl_list, keys)
+
+def is_task_unchanged(task):
+    """排名與 gamemaster JSON 都沒有變動且 CSV 已存在時，不需要重新爬取"""
+    if "league" not in task:
+        return False
+    urls = [get_rankings_url(task), get_gamemaster_url()]
+    with telemetry.span("change_check", **telemetry.task_labels(task)) as check_span:
+        unchanged = detector.is_unchanged(task["crawler_id"], urls, [f"data/{task['filename']}"], keep_body=True)
+        check_span.set(outcome="unchanged" if unchanged else "changed")
+    if unchanged:
+        print(f"[{task['crawler_id']}] 來源資料未變更，跳過 {task['filename']}")
+        detector.commit(task["crawler_id"])
+        return True
+    return False
+
+def try_direct_fetch(task):
+    """嘗試直接抓取並儲存，成功回傳 True"""
+    if not (DIRECT_FETCH_ENABLED and "league" in task):
+        return False
+    # 直接抓取記錄為第 0 次嘗試，瀏覽器的嘗試從 1 開始
+    with telemetry.span("attempt", **telemetry.task_labels(task, 0), mode="direct") as attempt_span:
+        direct_result = run_direct_fetch(task)
+        if direct_result:
+            names_list, xl_list = direct_result
+            store_ranking(task, names_list, xl_list, "直接抓取")
+            attempt_span.set(count=len(names_list))
+            return True
+        attempt_span.set(outcome="fallback")
+    print(f"[{task['crawler_id']}] 改用瀏覽器爬取")
+    return False
+
+async def crawl_page_cdp(page, task):
+    """CDP 引擎使用的頁面爬取流程，結果格式與 load_and_extract 相同"""
+    crawler_id = task["crawler_id"]
+    
+    print(f"[{crawler_id}] 正在載入頁面: {task['url']}")
+    with telemetry.span("load", url=task["url"]):
+        await page.goto(task["url"])
+    
+    with telemetry.span("wait") as wait_span:
+        ready = await page.wait_until_ready(".name", READY_MIN_NAMES, timeout=30, scroll=True)
+        wait_span.set(count=ready.get("count", 0), reason=ready.get("reason"))
+    print(f"[{crawler_id}] 頁面就緒偵測: {ready.get('reason')}，{ready.get('count', 0)} 個有效元素")
+    
+    with telemetry.span("extract") as extract_span:
+        rows = await page.evaluate(cdp_engine.wrap_script(EXTRACT_NAMES_SCRIPT))
+        names_list, xl_list = clean_extracted_rows(rows or [], crawler_id)
+        extract_span.set(elements=len(rows or []), count=len(names_list))
+    return (names_list, xl_list) if names_list else None
+
+def run_with_cdp_engine(tasks):
+    """以 CDP 引擎同時爬取所有任務，直接抓取成功的任務不需要瀏覽器"""
+    results = {}
+    pending = []
+    for task in tasks:
+        if is_task_unchanged(task) or try_direct_fetch(task):
+            results[task["crawler_id"]] = True
+        else:
+            pending.append(task)
+    
+    if pending:
+        ensure_name_aliases(pending[0]["crawler_id"])
+        page_results = cdp_engine.run_tasks(pending, crawl_page_cdp)
+        for task in pending:
+            result = page_results.get(task["crawler_id"])
+            if result:
+                with telemetry.labels(**telemetry.task_labels(task)):
+                    store_ranking(task, *result, "CDP")
+            results[task["crawler_id"]] = bool(result)
+    
+    return results
 
 def run_crawler(task):
     """運行單個爬蟲任務"""
     crawler_id = task["crawler_id"]
     filename = task["filename"]
-    url = task["url"] 
-    debug_port = task["debug_port"]
     
-    max_retries = 3
+    # 來源沒有變動時直接結束，不需要抓取
+    if is_task_unchanged(task):
+        return True
     
-    for attempt in range(max_retries):
-        driver = None
-        user_data_dir = None
-        
-        try:
-            print(f"[{crawler_id}] 開始爬取 {filename} (嘗試 {attempt + 1}/{max_retries})")
-            
-            # 初始化 WebDriver
-            driver, user_data_dir = setup_driver(crawler_id, debug_port)
-            
-            # 載入頁面
-            print(f"[{crawler_id}] 正在載入頁面: {url}")
-            driver.get(url)
-            
-            # 使用改進的等待策略
-            wait_for_pokemon_data(driver, crawler_id)
-            
-            # 提取資料
-            names_list, xl_list = extract_pokemon_data(driver, crawler_id)
-            
-            if not names_list:
-                print(f"[{crawler_id}] 警告: {filename} 沒有找到任何資料")
-                if attempt < max_retries - 1:
-                    print(f"[{crawler_id}] 準備重試...")
-                    # 增加重試間隔
-                    time.sleep(5)
-                    continue
-                else:
-                    print(f"[{crawler_id}] {filename} 爬取失敗：找不到資料")
-                    return False
-            
-            # 確保資料夾存在
-            if not os.path.exists("data"):
-                os.makedirs("data")
-            
-            # 儲存成 CSV 檔案
-            data = pd.DataFrame({"Pokemon": names_list, "XL": xl_list})
-            data.to_csv(f"data/{filename}", index=False, encoding="utf-8-sig")
-            
-            # 統計結果
-            xl_count = sum(xl_list)
-            total_count = len(names_list)
-            print(f"[{crawler_id}] ✅ {filename} 資料已成功抓取並儲存")
-            print(f"[{crawler_id}] 總計 {total_count} 隻寶可夢，其中 {xl_count} 隻需要XL糖")
-            return True
-            
-        except Exception as e:
-            print(f"[{crawler_id}] ❌ 爬取 {filename} 時發生錯誤 (嘗試 {attempt + 1}/{max_retries}): {e}")
-            if attempt == max_retries - 1:
-                print(f"[{crawler_id}] {filename} 爬取失敗，已達最大重試次數")
-            else:
-                time.sleep(5)  # 增加重試間隔
-        finally:
-            # 清理資源
-            if driver or user_data_dir:
-                cleanup_crawler_resources(driver, user_data_dir, crawler_id)
+    # 優先使用直接抓取模式，失敗才啟動瀏覽器
+    if try_direct_fetch(task):
+        return True
     
-    return False
+    # 依失敗原因只重試需要的階段：重新提取、重新載入或重新取得分頁
+    print(f"[{crawler_id}] 以瀏覽器爬取 {filename}")
+    ensure_name_aliases(crawler_id)
+    steps = [("load", load_page), ("wait", wait_page), ("extract", extract_page)]
+    
+    def attempt(cancel, claim):
+        def store(result):
+            # 對沖嘗試中只有先取得結果的一方會寫入
+            claim()
+            store_ranking(task, *result)
+        return run_with_retries(task, lambda: open_task_tab(task, cancel), steps, store, cancel=cancel)
+    
+    # 超過以往耗時的 p95 仍未完成時，平行執行第二次嘗試
+    return run_hedged(task, attempt)
 
 def main():
     """主程式 - 3個爬蟲並行執行"""
     # 設定信號處理器
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    start_time = time.time()
     
     print("=" * 60)
     print("啟動 3 個並行爬蟲，每個處理不同的任務")
     print("=" * 60)
+    report_startup(IMPORT_START)
     
     # 預先清理可能殘留的 Chrome 進程
     print("清理殘留的 Chrome 進程...")
     kill_chrome_processes()
     
-    # 預先安裝 ChromeDriver（避免競爭）
-    print("預先準備 ChromeDriver...")
-    get_driver_path()
+    # 預先安裝 ChromeDriver（避免競爭）；直接抓取模式只在失敗時才需要瀏覽器
+    if not DIRECT_FETCH_ENABLED and CRAWLER_ENGINE != "cdp":
+        print("預先準備 ChromeDriver...")
+        get_driver_path()
     
     # 顯示任務分配
     print("\n任務分配:")
     for task in CRAWLER_TASKS:
-        print(f"  {task['crawler_id']} -> {task['filename']} (端口: {task['debug_port']})")
+        print(f"  {task['crawler_id']} -> {task['filename']}")
+    print(f"瀏覽器池: 最多 {BROWSER_POOL_SIZE} 個 Chrome，每個使用 {BROWSER_MAX_USES} 次後重新啟動")
     
     print(f"\n開始並行執行 {len(CRAWLER_TASKS)} 個爬蟲任務...")
     
-    # 使用線程池執行
-    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="Crawler") as executor:
-        # 提交所有任務
-        futures = {
-            executor.submit(run_crawler, task): task["crawler_id"] 
-            for task in CRAWLER_TASKS
-        }
+    if CRAWLER_ENGINE == "cdp":
+        # 單一事件迴圈同時驅動所有頁面
+        print("使用 CDP 引擎")
+        results = run_with_cdp_engine(CRAWLER_TASKS)
+    else:
+        # 使用線程池執行
+        with ThreadPoolExecutor(max_workers=BROWSER_POOL_SIZE, thread_name_prefix="Crawler") as executor:
+            # 提交所有任務
+            futures = {
+                executor.submit(run_crawler, task): task["crawler_id"] 
+                for task in CRAWLER_TASKS
+            }
         
-        # 等待完成並處理結果
-        results = {}
-        for future in as_completed(futures):
-            crawler_id = futures[future]
-            try:
-                success = future.result()
-                results[crawler_id] = success
-                if success:
-                    print(f"🎉 {crawler_id} 任務完成")
-                else:
-                    print(f"⚠️  {crawler_id} 任務失敗")
-            except Exception as e:
-                print(f"❌ {crawler_id} 執行時發生錯誤: {e}")
-                results[crawler_id] = False
+            # 等待完成並處理結果
+            results = {}
+            for future in as_completed(futures):
+                crawler_id = futures[future]
+                try:
+                    success = future.result()
+                    results[crawler_id] = success
+                    if success:
+                        print(f"🎉 {crawler_id} 任務完成")
+                    else:
+                        print(f"⚠️  {crawler_id} 任務失敗")
+                except Exception as e:
+                    print(f"❌ {crawler_id} 執行時發生錯誤: {e}")
+                    results[crawler_id] = False
     
     # 統計結果
     success_count = sum(results.values())
@@ -469,15 +557,25 @@ def main():
     
     # 最終清理
     print("執行最終清理...")
+    close_browser_pool()
     time.sleep(2)
     kill_chrome_processes()
     
+    # 產生前端使用的 JSON 分片
+    with telemetry.span("publish", crawler="pvp"):
+        publish_artifacts()
+    
+    # 輸出監控指標，並保存各任務的耗時供下次計算對沖門檻
+    telemetry.write_metrics("pvp", results, start_time)
+    latency_history.save()
+    
     # 如果需要推送到 GitHub，取消註解下面這行
     # push_to_github()
 
 def push_to_github():
     """將更新的檔案推送到 GitHub"""
     try:
+        from git import Repo
         repo = Repo(os.getcwd())
         
         # 檢查是否有變更
@@ -0,0 +1,359 @@
+"""
+常駐模式
+run.bat 每次都要啟動新的 Python、重新匯入模組並冷啟動瀏覽器。常駐模式讓程序、chromedriver 與
+瀏覽器池持續存活，以內建的排程定期更新（PvP 聯盟與 PvE 屬性使用不同的週期），
+並提供狀態頁供監控使用
+
+排程與 cron 的 */N 相同，對齊每天 00:00 的整數倍，例如 PvP 每 180 分鐘在 00:00、03:00、06:00 ... 執行，
+同時到期的群組合併成一次更新；啟動時預設先更新一次
+
+狀態頁 (預設 http://127.0.0.1:8765)：
+  GET  /health        常駐迴圈正常且最近一次更新沒有全部失敗時回傳 200，否則 503
+  GET  /status        各群組的上次執行結果、下次執行時間與瀏覽器池狀態 (JSON)
+  POST /run/<群組>     立即更新 pvp、pve 或 all，執行中再觸發只會排入下一次
+
+環境變數：
+  DAEMON_PVP_INTERVAL_MIN   PvP 更新週期 (分鐘)，預設 180
+  DAEMON_PVE_INTERVAL_MIN   PvE 更新週期 (分鐘)，預設 720
+  DAEMON_RUN_ON_START=0     啟動時不先更新，等到下一個排程時間
+  DAEMON_STATUS_HOST        狀態頁位址，預設 127.0.0.1
+  DAEMON_STATUS_PORT        狀態頁連接埠，預設 8765，0 表示不啟動
+  DAEMON_GIT_PUSH=1         每次更新後提交並推送 data/（與 run.bat 相同）
+
+瀏覽器池只在 Selenium 引擎下保持開啟；CRAWLER_ENGINE=cdp 時每次更新仍會啟動 CDP 瀏覽器
+使用方式：python daemon.py
+"""
+import time
+IMPORT_START = time.time()
+
+import json
+import os
+import signal
+import subprocess
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import crawler
+import pve_crawler
+import cdp_engine
+import change_detection
+import scheduler
+from generate_update_log import generate_update_log
+from publish_artifacts import publish_artifacts
+from startup_report import report_startup
+import telemetry
+from hedging import latency_history
+
+PVP_INTERVAL_MIN = float(os.environ.get("DAEMON_PVP_INTERVAL_MIN", "180"))
+PVE_INTERVAL_MIN = float(os.environ.get("DAEMON_PVE_INTERVAL_MIN", "720"))
+RUN_ON_START = os.environ.get("DAEMON_RUN_ON_START", "1") != "0"
+STATUS_HOST = os.environ.get("DAEMON_STATUS_HOST", "127.0.0.1")
+STATUS_PORT = int(os.environ.get("DAEMON_STATUS_PORT", "8765"))
+GIT_PUSH = os.environ.get("DAEMON_GIT_PUSH", "0") == "1"
+
+
+def next_aligned_time(interval, after):
+    """after 之後下一個對齊當天 00:00 的整數倍時間 (cron 的 */N)"""
+    midnight = datetime.fromtimestamp(after).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    slots = int((after - midnight) // interval) + 1
+    # 跨過午夜時重新對齊
+    return min(midnight + slots * interval, midnight + 24 * 3600)
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+
+class JobGroup:
+    """一組使用相同週期更新的任務"""
+
+    def __init__(self, name, module, interval_min):
+        self.name = name
+        self.module = module
+        self.interval = interval_min * 60
+        self.next_run = None
+        self.requested = False
+        self.last_started = None
+        self.last_finished = None
+        self.last_results = {}
+
+    def jobs(self):
+        return [(self.module, task) for task in self.module.CRAWLER_TASKS]
+
+    def schedule_next(self, now):
+        self.next_run = next_aligned_time(self.interval, now)
+
+    def is_due(self, now):
+        return self.requested or (self.next_run is not None and now >= self.next_run)
+
+    def status(self):
+        succeeded = sum(1 for success in self.last_results.values() if success)
+        # 執行中的群組 last_finished 仍是上一次的時間
+        finished = self.last_finished is not None and self.last_finished >= self.last_started
+        return {
+            "interval_min": self.interval / 60,
+            "next_run": format_time(self.next_run),
+            "requested": self.requested,
+            "last_started": format_time(self.last_started),
+            "last_finished": format_time(self.last_finished),
+            "last_duration_s": round(self.last_finished - self.last_started, 1) if finished else None,
+            "last_succeeded": succeeded,
+            "last_total": len(self.last_results),
+            "failed_tasks": sorted(task for task, success in self.last_results.items() if not success),
+        }
+
+
+class CrawlerDaemon:
+    """常駐排程：保持瀏覽器池開啟，依各群組的週期執行更新"""
+
+    def __init__(self):
+        self.groups = {
+            "pvp": JobGroup("pvp", crawler, PVP_INTERVAL_MIN),
+            "pve": JobGroup("pve", pve_crawler, PVE_INTERVAL_MIN),
+        }
+        self.started_at = time.time()
+        self.heartbeat = None
+        self.running_groups = []
+        self.cycle_count = 0
+        self.pool = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    # --- 排程 ---
+
+    def trigger(self, name):
+        """立即執行指定群組，回傳被排入的群組名稱"""
+        names = list(self.groups) if name == "all" else [name]
+        with self._lock:
+            for group_name in names:
+                self.groups[group_name].requested = True
+        self._wake.set()
+        return names
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def is_stopping(self):
+        return self._stop.is_set()
+
+    def due_groups(self, now):
+        with self._lock:
+            due = [group for group in self.groups.values() if group.is_due(now)]
+            for group in due:
+                group.requested = False
+                group.schedule_next(now)
+            self.running_groups = [group.name for group in due]
+        return due
+
+    def seconds_until_next(self, now):
+        with self._lock:
+            return max(0, min(group.next_run for group in self.groups.values()) - now)
+
+    def run(self):
+        """常駐迴圈，直到收到停止信號"""
+        now = time.time()
+        for group in self.groups.values():
+            group.schedule_next(now)
+            group.requested = RUN_ON_START
+            print(f"🗓️  {group.name}: 每 {group.interval / 60:.0f} 分鐘更新，下次 {format_time(group.next_run)}")
+
+        if cdp_engine.CRAWLER_ENGINE != "cdp":
+            self.pool = scheduler.install_shared_browser_pool(scheduler.MAX_WORKERS)
+
+        try:
+            while not self._stop.is_set():
+                self.heartbeat = time.time()
+                due = self.due_groups(self.heartbeat)
+                if due:
+                    self.run_cycle(due)
+                    continue
+                self._wake.wait(min(60, self.seconds_until_next(time.time())))
+                self._wake.clear()
+        finally:
+            self.shutdown()
+
+    # --- 更新 ---
+
+    def run_cycle(self, groups):
+        """執行一次更新：爬取到期的群組，再合併、產生更新日誌與前端分片"""
+        names = [group.name for group in groups]
+        jobs = [job for group in groups for job in group.jobs()]
+        start_time = time.time()
+        self.cycle_count += 1
+        print("\n" + "=" * 80)
+        print(f"🔄 第 {self.cycle_count} 次更新: {', '.join(names)} ({len(jobs)} 個任務)")
+        print("=" * 80)
+
+        for group in groups:
+            group.last_started = start_time
+        # gamemaster 與來源的變更檢查每次更新都重新進行，其餘的快取（driver 路徑、瀏覽器）沿用
+        crawler.gamemaster_data = None
+        change_detection.detector.start_run()
+
+        try:
+            if cdp_engine.CRAWLER_ENGINE == "cdp":
+                results = scheduler.run_with_cdp(jobs)
+            else:
+                results = scheduler.run_with_threads(jobs, keep_pool=True)
+        except Exception as e:
+            print(f"❌ 更新時發生錯誤: {e}")
+            results = {task["crawler_id"]: False for _, task in jobs}
+
+        finished_at = time.time()
+        with self._lock:
+            for group in groups:
+                group.last_results = {task["crawler_id"]: results.get(task["crawler_id"], False)
+                                      for _, task in group.jobs()}
+                group.last_finished = finished_at
+            self.running_groups = []
+
+        success_count = sum(1 for success in results.values() if success)
+        print(f"🎉 更新完成: {success_count}/{len(jobs)} 個任務成功，耗時 {finished_at - start_time:.1f} 秒")
+
+        try:
+            if "pve" in names:
+                with telemetry.span("merge", crawler="pve"):
+                    pve_crawler.merge_csv_files()
+            generate_update_log()
+            with telemetry.span("publish"):
+                publish_artifacts()
+            if GIT_PUSH and success_count:
+                push_data()
+        except Exception as e:
+            print(f"❌ 更新後處理時發生錯誤: {e}")
+
+        # 常駐模式的統計會跨次累計，textfile 每次更新後覆寫
+        telemetry.write_metrics("daemon", results, start_time)
+        latency_history.save()
+
+    def shutdown(self):
+        print("\n正在關閉常駐模式...")
+        if self.pool is not None:
+            scheduler.close_shared_browser_pool()
+            self.pool = None
+        crawler.kill_chrome_processes()
+
+    # --- 狀態 ---
+
+    def status(self):
+        with self._lock:
+            groups = {name: group.status() for name, group in self.groups.items()}
+            running = list(self.running_groups)
+        return {
+            "pid": os.getpid(),
+            "started_at": format_time(self.started_at),
+            "uptime_s": round(time.time() - self.started_at),
+            "heartbeat": format_time(self.heartbeat),
+            "engine": cdp_engine.CRAWLER_ENGINE,
+            "state": "running" if running else "idle",
+            "running": running,
+            "cycles": self.cycle_count,
+            "groups": groups,
+            "browser_pool": self.pool.status() if self.pool is not None else None,
+        }
+
+    def is_healthy(self):
+        """常駐迴圈仍在運作，且每個群組最近一次更新至少有一個任務成功"""
+        with self._lock:
+            if self._stop.is_set() or self.heartbeat is None:
+                return False
+            for group in self.groups.values():
+                if group.last_results and not any(group.last_results.values()):
+                    return False
+            return True
+
+
+def push_data():
+    """提交並推送 data/，與 run.bat 的步驟相同"""
+    try:
+        subprocess.run(["git", "add", "data"], check=True)
+        if subprocess.run(["git", "diff", "--cached", "--quiet"]).returncode == 0:
+            print("沒有檔案變更，跳過 Git 推送")
+            return
+        subprocess.run(["git", "commit", "-m", f"auto update data {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"],
+                       check=True)
+        subprocess.run(["git", "push", "origin", "main"], check=True)
+        print("已推送更新到 GitHub")
+    except Exception as e:
+        print(f"Git 推送時發生錯誤: {e}")
+
+
+def make_handler(daemon):
+    class StatusHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if path == "/health":
+                healthy = daemon.is_healthy()
+                return self.send_json(200 if healthy else 503, {"status": "ok" if healthy else "failing"})
+            if path in ("", "/status"):
+                return self.send_json(200, daemon.status())
+            self.send_error(404)
+
+        def do_POST(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            if len(parts) == 2 and parts[0] == "run" and (parts[1] == "all" or parts[1] in daemon.groups):
+                return self.send_json(202, {"queued": daemon.trigger(parts[1])})
+            self.send_error(404)
+
+    return StatusHandler
+
+
+def start_status_server(daemon):
+    """在背景線程啟動狀態頁"""
+    if not STATUS_PORT:
+        return None
+    try:
+        server = ThreadingHTTPServer((STATUS_HOST, STATUS_PORT), make_handler(daemon))
+    except OSError as e:
+        print(f"⚠️  無法啟動狀態頁 ({STATUS_HOST}:{STATUS_PORT}): {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="Daemon-Status").start()
+    print(f"✅ 狀態頁: http://{STATUS_HOST}:{server.server_address[1]}/status")
+    return server
+
+
+def main():
+    """主程式 - 常駐並依排程更新 PvP 與 PvE 資料"""
+    daemon = CrawlerDaemon()
+
+    def signal_handler(sig, frame):
+        if daemon.is_stopping():
+            # 第二次中斷直接結束，不等待目前的更新
+            print("\n再次收到中斷信號，強制結束...")
+            scheduler.signal_handler(sig, frame)
+        print("\n收到中斷信號，目前的更新完成後結束（再按一次強制結束）")
+        daemon.stop()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    print("=" * 80)
+    print(f"常駐模式: {len(crawler.CRAWLER_TASKS)} 個 PvP 任務 + {len(pve_crawler.CRAWLER_TASKS)} 個 PvE 任務")
+    print("=" * 80)
+    report_startup(IMPORT_START)
+
+    server = start_status_server(daemon)
+    try:
+        daemon.run()
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+ChromeDriver 本機快取
+第一次下載的 ChromeDriver 會複製到固定的快取資料夾並記錄版本與 SHA-256，
+之後每次執行只檢查雜湊、試啟動 (chromedriver --version) 與已安裝 Chrome 的主版本，確認可用就直接使用，
+只有快取的檔案損壞、不存在或與 Chrome 主版本不同時才重新下載；
+無法判斷 Chrome 版本時（例如 Windows），啟動瀏覽器出現 SessionNotCreatedException 後再清除快取重新下載
+
+環境變數：
+  CHROMEDRIVER_PATH     預先準備好的 ChromeDriver 路徑，設定後不再下載
+  CHROMEDRIVER_VERSION  固定下載的 ChromeDriver 版本，例如 120.0.6099.109
+  CHROMEDRIVER_OFFLINE  設為 1 時完全不連網，只使用 CHROMEDRIVER_PATH 或既有快取
+  CHROMEDRIVER_CACHE    快取資料夾，預設 ~/.pvpoke_crawler/chromedriver
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH")
+CHROMEDRIVER_VERSION = os.environ.get("CHROMEDRIVER_VERSION") or None
+CHROMEDRIVER_OFFLINE = os.environ.get("CHROMEDRIVER_OFFLINE", "0") == "1"
+CACHE_DIR = os.environ.get(
+    "CHROMEDRIVER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".pvpoke_crawler", "chromedriver")
+)
+CACHE_INFO_PATH = os.path.join(CACHE_DIR, "driver.json")
+DRIVER_FILENAME = "chromedriver.exe" if sys.platform.startswith("win") else "chromedriver"
+VERIFY_TIMEOUT = 15
+
+cache_lock = threading.Lock()
+verified_path = None
+# 最後一次確認 ChromeDriver 可用的時間，用來避免多個線程重複清除同一份快取
+verified_at = 0.0
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def probe_driver(path):
+    """試啟動 ChromeDriver，成功時回傳版本字串，失敗回傳 None"""
+    try:
+        result = subprocess.run(
+            [path, "--version"], capture_output=True, text=True, timeout=VERIFY_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    output = result.stdout.strip()
+    if result.returncode != 0 or not output.startswith("ChromeDriver"):
+        return None
+    return output
+
+
+def major_version(version):
+    """從版本字串取出主版本號，例如 'ChromeDriver 120.0.6099.109 (...)' -> 120"""
+    match = re.search(r"(\d+)\.\d+", version or "")
+    return int(match.group(1)) if match else None
+
+
+def installed_chrome_version():
+    """取得已安裝 Chrome 的版本字串，找不到或無法判斷時回傳 None（Windows 的 chrome.exe 不支援 --version）"""
+    from cdp_engine import find_chrome_binary
+
+    try:
+        result = subprocess.run(
+            [find_chrome_binary(), "--version"], capture_output=True, text=True, timeout=VERIFY_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    output = result.stdout.strip()
+    if result.returncode != 0 or not output:
+        return None
+    return output
+
+
+def load_cache_info():
+    try:
+        with open(CACHE_INFO_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def check_cached_driver():
+    """確認快取的 ChromeDriver 完整且可執行，回傳路徑或 None"""
+    info = load_cache_info()
+    path = info.get("path")
+    if not path or not os.path.exists(path):
+        return None
+    if CHROMEDRIVER_VERSION and info.get("requested_version") != CHROMEDRIVER_VERSION:
+        print(f"快取的 ChromeDriver 版本與指定版本 {CHROMEDRIVER_VERSION} 不同")
+        return None
+    if file_sha256(path) != info.get("sha256"):
+        print("⚠️  快取的 ChromeDriver 雜湊不符，可能已損壞")
+        return None
+    version = probe_driver(path)
+    if version is None:
+        print("⚠️  快取的 ChromeDriver 無法啟動")
+        return None
+    if not CHROMEDRIVER_VERSION:
+        driver_major = major_version(version)
+        chrome_major = major_version(installed_chrome_version())
+        if driver_major and chrome_major and driver_major != chrome_major:
+            print(f"⚠️  快取的 ChromeDriver ({driver_major}) 與已安裝的 Chrome ({chrome_major}) 主版本不同")
+            return None
+    return path
+
+
+def download_driver():
+    """以 webdriver-manager 下載 ChromeDriver 並複製到快取資料夾"""
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    print("正在下載和安裝 ChromeDriver...")
+    downloaded = ChromeDriverManager(driver_version=CHROMEDRIVER_VERSION).install()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, DRIVER_FILENAME)
+    tmp_path = path + ".tmp"
+    shutil.copyfile(downloaded, tmp_path)
+    os.chmod(tmp_path, 0o755)
+    os.replace(tmp_path, path)
+
+    version = probe_driver(path)
+    if version is None:
+        # webdriver-manager 自己的快取裡是壞掉的檔案，移除後下次重新下載
+        shutil.rmtree(os.path.dirname(downloaded), ignore_errors=True)
+        raise RuntimeError(f"下載的 ChromeDriver 無法啟動: {downloaded}")
+
+    info = {
+        "path": path,
+        "sha256": file_sha256(path),
+        "version": version,
+        "requested_version": CHROMEDRIVER_VERSION,
+    }
+    tmp_info = CACHE_INFO_PATH + ".tmp"
+    with open(tmp_info, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_info, CACHE_INFO_PATH)
+    print(f"ChromeDriver 安裝完成: {path} ({version})")
+    return path
+
+
+def resolve_driver_path():
+    """
+    取得可用的 ChromeDriver 路徑（同一個程序只檢查一次）
+    順序：CHROMEDRIVER_PATH -> 已驗證的快取 -> 重新下載（離線模式下不下載）
+    """
+    global verified_path, verified_at
+    with cache_lock:
+        if verified_path is not None:
+            return verified_path
+
+        if CHROMEDRIVER_PATH:
+            if probe_driver(CHROMEDRIVER_PATH) is None:
+                raise RuntimeError(f"CHROMEDRIVER_PATH 指定的 ChromeDriver 無法啟動: {CHROMEDRIVER_PATH}")
+            verified_path = CHROMEDRIVER_PATH
+            verified_at = time.time()
+            print(f"使用指定的 ChromeDriver: {verified_path}")
+            return verified_path
+
+        path = check_cached_driver()
+        if path:
+            print(f"使用快取的 ChromeDriver: {path}")
+        elif CHROMEDRIVER_OFFLINE:
+            raise RuntimeError("離線模式下沒有可用的 ChromeDriver，請設定 CHROMEDRIVER_PATH 或先在線上執行一次")
+        else:
+            try:
+                path = download_driver()
+            except Exception as e:
+                print(f"ChromeDriver 安裝失敗，重試一次: {e}")
+                path = download_driver()
+
+        verified_path = path
+        verified_at = time.time()
+        return verified_path
+
+
+def invalidate_cached_driver(resolved_at):
+    """
+    啟動瀏覽器出現 SessionNotCreatedException（通常是 Chrome 自動更新後與 ChromeDriver 版本不符）時呼叫，
+    清除快取讓下一次 resolve_driver_path 重新下載
+    resolved_at 為呼叫端取得路徑的時間，之後已有其他線程重新下載時不再重複清除
+    回傳是否值得重試（CHROMEDRIVER_PATH 指定的檔案或離線模式下無法重新下載）
+    """
+    global verified_path
+    if CHROMEDRIVER_PATH or CHROMEDRIVER_OFFLINE:
+        return False
+    with cache_lock:
+        if verified_path is None or verified_at > resolved_at:
+            return True
+        verified_path = None
+        try:
+            os.remove(CACHE_INFO_PATH)
+        except FileNotFoundError:
+            pass
+    print("⚠️  ChromeDriver 與 Chrome 版本可能不符，已清除快取，將重新下載")
+    return True
+
+
+if __name__ == "__main__":
+    print(resolve_driver_path())
@@ -1,10 +1,13 @@
 """
 生成更新日誌檔案
 記錄更新時間和已更新的檔案列表
+檔案的變更時間、雜湊與筆數取自 output_writer 記錄的 state/output_manifest.json，
+沒有任何檔案內容變更時不會重寫日誌
 """
 import os
 import json
 from datetime import datetime
+from output_writer import load_manifest, file_sha256, write_bytes_if_changed
 
 def generate_update_log():
     """生成更新日誌到 data/update_log.json"""
@@ -22,18 +25,44 @@ def generate_update_log():
     
     all_files = pvp_files + pve_files
     
+    log_path = "data/update_log.json"
+    manifest = load_manifest()
+    
+    # 讀取上一次的日誌，用來判斷哪些檔案內容有變更
+    try:
+        with open(log_path, encoding="utf-8") as f:
+            previous_log = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous_log = {}
+    previous_hashes = {f["file"]: f.get("sha256") for f in previous_log.get("files", [])}
+    
     # 檢查哪些檔案存在並記錄
     updated_files = []
     for filepath in all_files:
         if os.path.exists(filepath):
-            # 取得檔案修改時間
-            mtime = os.path.getmtime(filepath)
-            file_time = datetime.fromtimestamp(mtime).isoformat()
+            entry = manifest.get(filepath, {})
+            sha256 = entry.get("sha256") or file_sha256(filepath)
+            if entry.get("updated"):
+                # 使用實際內容變更的時間
+                file_time = entry["updated"]
+            else:
+                # 取得檔案修改時間
+                mtime = os.path.getmtime(filepath)
+                file_time = datetime.fromtimestamp(mtime).isoformat()
             updated_files.append({
                 "file": filepath,
-                "modified": file_time
+                "modified": file_time,
+                "sha256": sha256,
+                "rows": entry.get("rows"),
+                "changed": previous_hashes.get(filepath) != sha256
             })
     
+    changed_files = [f for f in updated_files if f["changed"]]
+    if previous_log and not changed_files:
+        print(f"✅ 資料沒有變更，保留原本的更新日誌: {log_path}")
+        print(f"   更新時間: {previous_log.get('update_time_readable')}")
+        return log_path
+    
     # 生成日誌內容
     log_data = {
         "update_time": datetime.now().isoformat(),
@@ -43,25 +72,21 @@ def generate_update_log():
         "summary": {
             "pvp_count": len([f for f in updated_files if "pvpoke" in f["file"]]),
             "pve_count": len([f for f in updated_files if "pve.csv" in f["file"]]),
-            "total_count": len(updated_files)
+            "total_count": len(updated_files),
+            "changed_count": len(changed_files)
         }
     }
     
-    # 確保 data 資料夾存在
-    if not os.path.exists("data"):
-        os.makedirs("data")
-    
-    # 寫入 JSON 日誌
-    log_path = "data/update_log.json"
-    with open(log_path, "w", encoding="utf-8") as f:
-        json.dump(log_data, f, ensure_ascii=False, indent=2)
+    # 寫入 JSON 日誌（原子替換）
+    write_bytes_if_changed(log_path, json.dumps(log_data, ensure_ascii=False, indent=2).encode("utf-8"))
     
     print(f"✅ 更新日誌已生成: {log_path}")
     print(f"   更新時間: {log_data['update_time_readable']}")
     print(f"   更新檔案數: {log_data['summary']['total_count']}")
     
     for file_info in updated_files:
-        print(f"   - {file_info['file']}")
+        mark = "已變更" if file_info["changed"] else "未變更"
+        print(f"   - {file_info['file']} ({mark})")
     
     return log_path
 
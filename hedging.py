@@ -0,0 +1,175 @@
+"""
+落後任務的對沖重試 (hedged requests)
+整次執行的耗時取決於最慢的一個頁面。任務執行超過以往耗時的 p95 仍未完成時，
+另外以新的分頁平行執行第二次嘗試，採用先取得有效資料的一方，另一方在下一個步驟前停止
+
+每個任務最近的耗時記錄在 state/task_latency.json（本機狀態，不進版本控制），資料不足時使用預設的門檻
+兩方之中只有先呼叫 claim() 的一方可以寫入結果，另一方會收到 TaskCancelled，避免重複寫檔
+落後的一方若卡在 driver.get 等操作中，會在該操作結束或逾時後停止（selenium 無法中途取消），
+等待閒置瀏覽器時也會放棄；瀏覽器池關閉前會等它歸還分頁
+排程器設定 concurrency_limiter 時，對沖嘗試同樣佔用並行數，已達上限時稍後再嘗試啟動
+
+環境變數：
+  CRAWLER_HEDGE=0              停用
+  CRAWLER_HEDGE_DEFAULT_DELAY  記錄不足時的對沖門檻 (秒)，預設 60
+  CRAWLER_HEDGE_MIN_DELAY      對沖門檻下限 (秒)，預設 10
+"""
+import json
+import math
+import os
+import queue
+import threading
+import time
+
+import telemetry
+from retry_policy import TaskCancelled
+
+HEDGE_ENABLED = os.environ.get("CRAWLER_HEDGE", "1") != "0"
+HEDGE_DEFAULT_DELAY = float(os.environ.get("CRAWLER_HEDGE_DEFAULT_DELAY", "60"))
+HEDGE_MIN_DELAY = float(os.environ.get("CRAWLER_HEDGE_MIN_DELAY", "10"))
+HEDGE_PERCENTILE = 95
+# 計算門檻所需的最少記錄數與保留的記錄數
+HEDGE_MIN_SAMPLES = 5
+LATENCY_HISTORY_SIZE = 30
+LATENCY_PATH = os.path.join("state", "task_latency.json")
+# 並行數已滿時，每隔幾秒再嘗試啟動對沖
+HEDGE_RETRY_INTERVAL = 2
+
+# 對沖嘗試佔用的並行數控制（需有 try_acquire / release），由 scheduler 設定
+concurrency_limiter = None
+
+
+def set_concurrency_limiter(limiter):
+    global concurrency_limiter
+    concurrency_limiter = limiter
+
+
+def percentile(values, pct):
+    """最近秩法的百分位數"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyHistory:
+    """記錄每個任務以瀏覽器完成所需的時間，用來決定對沖門檻"""
+
+    def __init__(self, path=LATENCY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._history = None
+        self._dirty = False
+
+    def _load(self):
+        if self._history is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._history = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._history = {}
+        return self._history
+
+    def record(self, task_id, seconds):
+        with self._lock:
+            samples = self._load().setdefault(task_id, [])
+            samples.append(round(seconds, 2))
+            del samples[:-LATENCY_HISTORY_SIZE]
+            self._dirty = True
+
+    def hedge_delay(self, task_id):
+        """以往耗時的 p95，記錄不足時使用預設門檻"""
+        with self._lock:
+            samples = list(self._load().get(task_id, []))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, percentile(samples, HEDGE_PERCENTILE))
+
+    def save(self):
+        """有新記錄時寫回檔案，在 main 結束時呼叫"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._history, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+# 兩個爬蟲共用同一份記錄
+latency_history = LatencyHistory()
+
+
+def run_hedged(task, attempt):
+    """
+    執行任務，超過對沖門檻仍未完成時平行執行第二次嘗試，回傳是否成功
+    attempt(cancel, claim): 執行一次完整的爬取流程並回傳是否成功；
+      cancel 為 threading.Event，設定後應儘快停止；
+      寫入結果前呼叫 claim()，不是第一個呼叫者時拋出 TaskCancelled
+    """
+    task_id = task["crawler_id"]
+    start_time = time.time()
+
+    claim_lock = threading.Lock()
+    claimed = []
+
+    def claim():
+        with claim_lock:
+            if claimed:
+                raise TaskCancelled()
+            claimed.append(True)
+
+    if not HEDGE_ENABLED:
+        success = attempt(None, claim)
+        if success:
+            latency_history.record(task_id, time.time() - start_time)
+        return success
+
+    cancel = threading.Event()
+    done = queue.Queue()
+
+    def runner(label, limiter=None):
+        try:
+            with telemetry.labels(hedge=label):
+                success = attempt(cancel, claim)
+        except Exception as e:
+            print(f"[{task_id}] ❌ {label} 嘗試發生錯誤: {e}")
+            success = False
+        finally:
+            if limiter is not None:
+                limiter.release()
+        done.put((label, success))
+
+    threading.Thread(target=runner, args=("primary",), daemon=True, name=f"{task_id}-primary").start()
+    running = 1
+    hedged = False
+    wait_until = start_time + latency_history.hedge_delay(task_id)
+
+    while True:
+        try:
+            timeout = None if hedged else max(0, wait_until - time.time())
+            label, success = done.get(timeout=timeout)
+        except queue.Empty:
+            # 超過門檻仍未完成，在並行數許可時平行執行第二次嘗試
+            limiter = concurrency_limiter
+            if limiter is not None and not limiter.try_acquire():
+                wait_until = time.time() + HEDGE_RETRY_INTERVAL
+                continue
+            print(f"[{task_id}] ⏱️ 已執行 {time.time() - start_time:.1f} 秒，超過對沖門檻，啟動對沖嘗試")
+            threading.Thread(target=runner, args=("hedge", limiter), daemon=True, name=f"{task_id}-hedge").start()
+            running += 1
+            hedged = True
+            continue
+
+        running -= 1
+        if success:
+            # 採用先成功的一方，通知另一方停止
+            cancel.set()
+            elapsed = time.time() - start_time
+            latency_history.record(task_id, elapsed)
+            if running:
+                print(f"[{task_id}] 採用 {label} 嘗試的結果 (耗時 {elapsed:.1f} 秒)，停止另一個嘗試")
+            return True
+        if not running:
+            return False
@@ -0,0 +1,322 @@
+"""
+排名歷史資料庫 (SQLite)
+每次爬取成功儲存 CSV 時，同時把該聯盟 / 屬性的排名寫進本機的 SQLite，
+內容與上一次相同時不重複記錄，查詢排名變化不需要再翻 git 歷史解析 CSV
+
+資料表：
+  snapshots  每次記錄的聯盟 / 屬性 (source = pvp / pve，category = 1500 / fire ...)
+  rankings   該次記錄的排名、名稱、比對鍵與 XL
+             名稱只有本體（暗影與一般型態相同），查詢與比較一律使用比對鍵 (name_normalizer.canonical_key)
+
+使用方式：
+  python history_store.py history "大劍鬼 (暗影)" --category 1500 --days 30   名稱或比對鍵，例如 samurott_shadow
+  python history_store.py diff --category 1500 --top 50
+  python history_store.py backfill        從 git 歷史匯入過去的 CSV
+
+設定 CRAWLER_HISTORY=0 可停用，CRAWLER_HISTORY_DB 指定資料庫位置
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+from datetime import datetime, timedelta
+
+from name_normalizer import canonical_key, parse_name
+
+HISTORY_ENABLED = os.environ.get("CRAWLER_HISTORY", "1") != "0"
+HISTORY_DB_PATH = os.environ.get("CRAWLER_HISTORY_DB", "history.db")
+
+# 各輸出檔案對應的 source / category，供 backfill 使用
+PVP_FILES = {
+    "data/pvpoke_1500.csv": "1500",
+    "data/pvpoke_2500.csv": "2500",
+    "data/pvpoke_10000.csv": "10000",
+}
+PVE_MERGED_FILE = "data/pve.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    category TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rankings (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    rank INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    xl INTEGER,
+    key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_category ON snapshots(source, category, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_rankings_snapshot ON rankings(snapshot_id, rank);
+CREATE INDEX IF NOT EXISTS idx_rankings_name ON rankings(name, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_rankings_key ON rankings(key, snapshot_id);
+"""
+
+
+def rows_digest(rows):
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class HistoryStore:
+    """排名歷史的寫入與查詢"""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    def record(self, source, category, names, xl_list=None, keys=None, recorded_at=None):
+        """
+        記錄一次排名，內容與該分類最近一次記錄相同時略過
+        keys 為每個名稱的比對鍵，未提供時由名稱計算
+        回傳是否有新增記錄
+        """
+        xl_values = list(xl_list) if xl_list is not None else [None] * len(names)
+        keys = list(keys) if keys is not None else [canonical_key(name) for name in names]
+        rows = [[rank, name, xl, key] for rank, (name, xl, key) in enumerate(zip(names, xl_values, keys), start=1)]
+        digest = rows_digest(rows)
+        recorded_at = recorded_at or datetime.now().isoformat(timespec="seconds")
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                # 與同一時間點之前最近的一次比較，重複匯入 git 歷史時也不會產生重複記錄
+                latest = conn.execute(
+                    "SELECT digest FROM snapshots WHERE source = ? AND category = ? AND recorded_at <= ? "
+                    "ORDER BY recorded_at DESC, id DESC LIMIT 1",
+                    (source, category, recorded_at)
+                ).fetchone()
+                if latest and latest[0] == digest:
+                    return False
+
+                with conn:
+                    cursor = conn.execute(
+                        "INSERT INTO snapshots (source, category, recorded_at, digest) VALUES (?, ?, ?, ?)",
+                        (source, category, recorded_at, digest)
+                    )
+                    snapshot_id = cursor.lastrowid
+                    conn.executemany(
+                        "INSERT INTO rankings (snapshot_id, rank, name, xl, key) VALUES (?, ?, ?, ?, ?)",
+                        [(snapshot_id, rank, name, xl, key) for rank, name, xl, key in rows]
+                    )
+                return True
+            finally:
+                conn.close()
+
+    def resolve_key(self, conn, name):
+        """
+        查詢用的比對鍵：名稱或比對鍵本身有記錄時直接使用，
+        否則從記錄中相同名稱的比對鍵挑選型態相同的一個（例如以中文名稱查詢以 speciesId 記錄的排名）
+        """
+        key = canonical_key(name)
+        if conn.execute("SELECT 1 FROM rankings WHERE key = ? LIMIT 1", (key,)).fetchone():
+            return key
+        base, forms = parse_name(name)
+        candidates = sorted((row[0] for row in conn.execute(
+            "SELECT DISTINCT key FROM rankings WHERE name = ?", (base,)
+        ) if row[0]), key=lambda candidate: (len(candidate), candidate))
+        suffix = "_" + "_".join(forms)
+        for candidate in candidates:
+            if not forms or candidate.endswith(suffix):
+                return candidate
+        return key
+
+    def rank_history(self, name, source, category, since=None):
+        """
+        名稱（或比對鍵）在每次記錄中的最佳排名，不在排名內時為 None，回傳 [(時間, 排名)]
+        以比對鍵查詢，暗影與一般型態分開計算
+        """
+        conn = self._connect()
+        try:
+            key = self.resolve_key(conn, name)
+            return conn.execute(
+                "SELECT s.recorded_at, MIN(r.rank) FROM snapshots s "
+                "LEFT JOIN rankings r ON r.snapshot_id = s.id AND r.key = ? "
+                "WHERE s.source = ? AND s.category = ? AND s.recorded_at >= ? "
+                "GROUP BY s.id ORDER BY s.recorded_at, s.id",
+                (key, source, category, since or "")
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def snapshot_ids(self, source, category):
+        """該分類所有記錄的 (id, 時間)，由舊到新"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT id, recorded_at FROM snapshots WHERE source = ? AND category = ? "
+                "ORDER BY recorded_at, id",
+                (source, category)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def names_in(self, snapshot_id, top=None):
+        """該次記錄的 [(名稱, 比對鍵)]，依排名排序"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT name, key FROM rankings WHERE snapshot_id = ? AND rank <= ? ORDER BY rank",
+                (snapshot_id, top if top else 2 ** 31)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [tuple(row) for row in rows]
+
+    def diff(self, source, category, old_id=None, new_id=None, top=None):
+        """
+        比較兩次記錄的名單，預設為最近兩次
+        以比對鍵比較，回傳 (舊記錄時間, 新記錄時間, 新進名單, 掉出名單)，名單為 [(名稱, 比對鍵)]
+        """
+        snapshots = self.snapshot_ids(source, category)
+        times = dict(snapshots)
+        if new_id is None:
+            if not snapshots:
+                return None
+            new_id = snapshots[-1][0]
+        if old_id is None:
+            older = [sid for sid, _ in snapshots if sid != new_id and times[sid] <= times[new_id]]
+            if not older:
+                return None
+            old_id = older[-1]
+        old_names = self.names_in(old_id, top)
+        new_names = self.names_in(new_id, top)
+        old_keys, new_keys = {key for _, key in old_names}, {key for _, key in new_names}
+        added = list(dict.fromkeys(entry for entry in new_names if entry[1] not in old_keys))
+        removed = list(dict.fromkeys(entry for entry in old_names if entry[1] not in new_keys))
+        return times.get(old_id), times.get(new_id), added, removed
+
+
+# 兩個爬蟲共用
+history = HistoryStore()
+
+
+def record_ranking(source, category, names, xl_list=None, keys=None):
+    """爬蟲儲存結果時呼叫，失敗不影響爬取流程"""
+    if not HISTORY_ENABLED:
+        return
+    try:
+        history.record(source, category, names, xl_list, keys)
+    except Exception as e:
+        print(f"⚠️  寫入排名歷史時發生錯誤: {e}")
+
+
+def parse_csv_bytes(data):
+    reader = csv.reader(io.StringIO(data.decode("utf-8-sig")))
+    columns = next(reader, [])
+    return columns, list(reader)
+
+
+def git_versions(path):
+    """檔案在 git 歷史中的每個版本，由舊到新回傳 (提交時間, 內容)"""
+    log = subprocess.run(
+        ["git", "log", "--reverse", "--format=%H %cI", "--", path],
+        capture_output=True, text=True, check=True
+    ).stdout.split("\n")
+    for line in filter(None, log):
+        commit, committed_at = line.split(" ", 1)
+        # 轉成與爬蟲記錄相同的本地時間格式，才能依字串排序
+        committed_at = datetime.fromisoformat(committed_at).astimezone().replace(tzinfo=None)
+        shown = subprocess.run(["git", "show", f"{commit}:{path}"], capture_output=True)
+        if shown.returncode == 0:
+            yield committed_at.isoformat(timespec="seconds"), shown.stdout
+
+
+def backfill(store):
+    """從 git 歷史匯入過去的 PvP / PvE CSV"""
+    added = 0
+    for path, category in PVP_FILES.items():
+        for committed_at, data in git_versions(path):
+            columns, rows = parse_csv_bytes(data)
+            if "Pokemon" not in columns:
+                continue
+            name_index = columns.index("Pokemon")
+            xl_index = columns.index("XL") if "XL" in columns else None
+            key_index = columns.index("Key") if "Key" in columns else None
+            names = [row[name_index] for row in rows]
+            xl_list = [int(row[xl_index]) for row in rows] if xl_index is not None else None
+            keys = [row[key_index] for row in rows] if key_index is not None else None
+            added += store.record("pvp", category, names, xl_list, keys, recorded_at=committed_at)
+
+    for committed_at, data in git_versions(PVE_MERGED_FILE):
+        columns, rows = parse_csv_bytes(data)
+        if "type" not in columns or "name" not in columns:
+            continue
+        type_index, name_index = columns.index("type"), columns.index("name")
+        key_index = columns.index("key") if "key" in columns else None
+        by_type = {}
+        for row in rows:
+            key = row[key_index] if key_index is not None else canonical_key(row[name_index])
+            by_type.setdefault(row[type_index], []).append((row[name_index], key))
+        for ptype, entries in by_type.items():
+            names, keys = zip(*entries)
+            added += store.record("pve", ptype, names, keys=keys, recorded_at=committed_at)
+    return added
+
+
+def format_entries(entries):
+    """[(名稱, 比對鍵)] -> "名稱 (比對鍵), ..."，比對鍵用來區分暗影等型態"""
+    return ", ".join(f"{name} ({key})" for name, key in entries) if entries else "無"
+
+
+def category_source(category):
+    return "pvp" if category.isdigit() else "pve"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查詢排名歷史")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    history_parser = subparsers.add_parser("history", help="寶可夢在某個聯盟 / 屬性的排名變化")
+    history_parser.add_argument("name", help="名稱或比對鍵，例如 \"七夕青鳥 (暗影)\" 或 altaria_shadow")
+    history_parser.add_argument("--category", default="1500", help="聯盟 (1500/2500/10000) 或 PvE 屬性")
+    history_parser.add_argument("--days", type=int, default=30)
+
+    diff_parser = subparsers.add_parser("diff", help="最近兩次記錄的名單差異")
+    diff_parser.add_argument("--category", default="1500")
+    diff_parser.add_argument("--top", type=int, default=None, help="只比較前 N 名")
+
+    subparsers.add_parser("backfill", help="從 git 歷史匯入過去的 CSV")
+
+    args = parser.parse_args()
+
+    if args.command == "history":
+        since = (datetime.now() - timedelta(days=args.days)).isoformat(timespec="seconds")
+        rows = history.rank_history(args.name, category_source(args.category), args.category, since)
+        if not rows:
+            print(f"最近 {args.days} 天沒有 {args.category} 的記錄")
+        for recorded_at, rank in rows:
+            print(f"{recorded_at}  {rank if rank is not None else '-'}")
+    elif args.command == "diff":
+        result = history.diff(category_source(args.category), args.category, top=args.top)
+        if result is None:
+            print(f"{args.category} 的記錄少於兩次，無法比較")
+            return
+        old_time, new_time, added, removed = result
+        print(f"{old_time} -> {new_time}")
+        print(f"新進 ({len(added)}): {format_entries(added)}")
+        print(f"掉出 ({len(removed)}): {format_entries(removed)}")
+    elif args.command == "backfill":
+        print(f"✅ 共匯入 {backfill(history)} 筆歷史記錄")
+
+
+if __name__ == "__main__":
+    main()
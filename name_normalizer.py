@@ -0,0 +1,154 @@
+"""
+寶可夢名稱正規化
+PvP (PvPoke) 與 PvE (Pokemon GO Hub) 的名稱格式不同，例如 "Zacian (Crowned Sword)"、
+"Crowned Sword Zacian"、"七夕青鳥 (暗影)"、"Shadow Altaria"。這裡把兩邊的名稱拆成
+本體名稱與型態（暗影、超級進化、地區型態、劍之王 ...），產生：
+  display_name   顯示用的本體名稱，例如 "Zacian"、"Tapu Bulu"、"七夕青鳥"
+  canonical_key  與 PvPoke speciesId 相同格式的比對鍵，例如 "zacian_crowned_sword"、"altaria_shadow"
+兩邊的資料可以直接以比對鍵合併，不需要模糊比對
+
+以 gamemaster 的 speciesName -> speciesId 註冊別名後，頁面上的名稱會直接對應到 speciesId，
+名稱本體有別名時加上括號中的型態，例如 "七夕青鳥 (暗影)" -> "altaria_shadow"
+沒有註冊別名時（無法取得 gamemaster）比對鍵由名稱本身產生，中文名稱無法與 PvE 的英文名稱對應
+所有正規表示式預先編譯，單一名稱的結果以 LRU 快取，整欄名稱以 normalize_column 一次處理
+"""
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+
+# 括號內容（通常是型態），全形與半形
+BRACKET_PATTERN = re.compile(r"[(（\[【{]([^)）\]】}]*)[)）\]】}]")
+# 排名頁面上名稱後面的 XL 標記，前後不能是英文字母
+XL_MARKER_PATTERN = re.compile(r"(?<![A-Za-z])XL(?![A-Za-z])")
+# 分隔單字的空白（"Porygon-Z"、"Ho-Oh" 的連字號是名稱的一部分）
+TOKEN_SPLIT_PATTERN = re.compile(r"\s+")
+# 比對鍵中直接移除的符號與改為底線的分隔 ("Mr. Mime" -> "mr_mime"，"Farfetch'd" -> "farfetchd")
+KEY_DROP_PATTERN = re.compile(r"['’.]")
+KEY_SEPARATOR_PATTERN = re.compile(r"[^\w]+")
+# 性別符號，與 PvPoke 的 speciesId 相同 ("Nidoran♀" -> "nidoran_female")
+GENDER_SYMBOLS = {"♀": " female", "♂": " male"}
+GENDER_PATTERN = re.compile("|".join(GENDER_SYMBOLS))
+
+# 型態別名 -> 比對鍵中使用的型態；None 表示預設型態，不放進比對鍵
+FORM_ALIASES = {
+    "shadow": "shadow", "暗影": "shadow",
+    "mega": "mega", "超級": "mega", "超級進化": "mega",
+    "primal": "primal", "原始": "primal", "原始回歸": "primal",
+    "alolan": "alolan", "alola": "alolan", "阿羅拉": "alolan",
+    "galarian": "galarian", "galar": "galarian", "伽勒爾": "galarian",
+    "hisuian": "hisuian", "hisui": "hisuian", "洗翠": "hisuian",
+    "paldean": "paldean", "paldea": "paldean", "帕底亞": "paldean",
+    "crowned": "crowned", "劍之王": "crowned_sword", "盾之王": "crowned_shield",
+    "origin": "origin", "起源": "origin",
+    "altered": "altered", "別種": "altered",
+    "therian": "therian", "靈獸": "therian",
+    "incarnate": "incarnate", "化身": "incarnate",
+    "unbound": "unbound", "解放": "unbound",
+    "confined": None, "懲戒": None,
+    "forme": None, "form": None, "形態": None, "型態": None,
+}
+# 只在型態之後出現時才視為型態的單字（"Crowned Sword"、"Mega Charizard X"）
+FORM_SUFFIXES = {"sword", "shield", "x", "y"}
+# 比對鍵中型態的順序：地區 -> 其他型態 -> 超級進化 -> 暗影，與 PvPoke 的 speciesId 相同
+FORM_ORDER = ["alolan", "galarian", "hisuian", "paldean", "origin", "altered", "therian", "incarnate",
+              "unbound", "crowned", "crowned_sword", "crowned_shield", "primal", "mega", "shadow"]
+# 其他型態（例如 "standard"）排在地區與超級進化之間
+OTHER_FORM_ORDER = FORM_ORDER.index("unbound")
+FORM_RANK = {form: i for i, form in enumerate(FORM_ORDER)}
+
+# 已知名稱 -> speciesId（由 gamemaster 註冊）
+alias_lock = threading.Lock()
+species_aliases = {}
+
+
+def register_aliases(mapping):
+    """註冊 {名稱: speciesId}，之後這些名稱的比對鍵直接使用 speciesId"""
+    with alias_lock:
+        species_aliases.update({key_text(name): species_id.lower()
+                                for name, species_id in mapping.items() if name and species_id})
+    canonical_key.cache_clear()
+
+
+def clean_text(text):
+    """移除 XL 標記並整理空白，保留原本的字元（例如全形的 "謎擬Ｑ"）"""
+    return " ".join(XL_MARKER_PATTERN.sub(" ", text or "").split())
+
+
+def key_text(text):
+    """比對鍵使用的文字，另外統一全形與半形字元"""
+    return unicodedata.normalize("NFKC", clean_text(text))
+
+
+@lru_cache(maxsize=8192)
+def parse_name(raw_name):
+    """拆成 (本體名稱, 型態)，型態依 FORM_ORDER 排序並去除重複"""
+    text = clean_text(raw_name)
+    forms = []
+    words = []
+
+    def add_tokens(tokens, in_brackets):
+        previous_form = None
+        for token in tokens:
+            lowered = token.lower()
+            if lowered in FORM_ALIASES:
+                form = FORM_ALIASES[lowered]
+                if form:
+                    forms.append(form)
+                previous_form = form
+            elif previous_form and lowered in FORM_SUFFIXES:
+                # "Crowned Sword" -> crowned_sword，"Mega Charizard Y" 則在下面處理
+                forms[-1] = f"{previous_form}_{lowered}"
+                previous_form = None
+            elif in_brackets:
+                # 括號內無法辨識的單字仍是型態的一部分，例如 "(Standard)"
+                forms.append(lowered)
+            else:
+                words.append(token)
+                previous_form = None
+
+    for content in BRACKET_PATTERN.findall(text):
+        add_tokens(TOKEN_SPLIT_PATTERN.split(content.strip()), True)
+    add_tokens(TOKEN_SPLIT_PATTERN.split(BRACKET_PATTERN.sub(" ", text).strip()), False)
+
+    # "Mega Charizard X"：超級進化的 X / Y 在本體名稱之後
+    if "mega" in forms and len(words) > 1 and words[-1].lower() in ("x", "y"):
+        forms[forms.index("mega")] = f"mega_{words.pop().lower()}"
+
+    if not words:
+        # 整個名稱都是型態用字時無法判斷本體，保留原文
+        return text, ()
+    forms = sorted(set(forms), key=lambda form: (FORM_RANK.get(form.split("_")[0], OTHER_FORM_ORDER), form))
+    return " ".join(words), tuple(forms)
+
+
+@lru_cache(maxsize=8192)
+def display_name(raw_name):
+    """顯示用的本體名稱（不含型態與 XL 標記）"""
+    return parse_name(raw_name)[0]
+
+
+@lru_cache(maxsize=8192)
+def canonical_key(raw_name):
+    """與 PvPoke speciesId 格式相同的比對鍵"""
+    base, forms = parse_name(raw_name)
+    with alias_lock:
+        alias = species_aliases.get(key_text(raw_name))
+        base_alias = species_aliases.get(key_text(base)) if forms else None
+    if alias:
+        return alias
+    if base_alias:
+        # 別名只註冊了本體名稱，型態另外加上，已包含在別名中的型態不重複
+        return "_".join([base_alias, *(form for form in forms if not base_alias.endswith(f"_{form}"))])
+    base = unicodedata.normalize("NFKC", base).lower()
+    base = GENDER_PATTERN.sub(lambda match: GENDER_SYMBOLS[match.group()], base)
+    base_key = KEY_SEPARATOR_PATTERN.sub("_", KEY_DROP_PATTERN.sub("", base)).strip("_")
+    return "_".join([base_key, *forms]) if base_key else ""
+
+
+def normalize_column(raw_names):
+    """一次正規化整欄名稱，重複的名稱只計算一次，回傳 (顯示名稱, 比對鍵)"""
+    unique = {raw: (display_name(raw), canonical_key(raw)) for raw in dict.fromkeys(raw_names)}
+    names = [unique[raw][0] for raw in raw_names]
+    keys = [unique[raw][1] for raw in raw_names]
+    return names, keys
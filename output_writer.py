@@ -0,0 +1,211 @@
+"""
+輸出檔案寫入
+先寫到同資料夾的暫存檔，比對內容雜湊與現有檔案，只有內容不同時才以 os.replace 原子替換，
+避免前端讀到寫到一半的檔案，也避免內容沒變卻產生 git 變更
+
+每個檔案的雜湊、筆數與最後變更時間記錄在 state/output_manifest.json（本機狀態，不進版本控制）
+
+資料列以串流方式逐筆編碼寫入暫存檔，不需要 pandas；
+依副檔名選擇格式 (.csv / .json / .ndjson)，可用 register_encoder 加入其他格式
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+MANIFEST_PATH = os.path.join("state", "output_manifest.json")
+
+manifest_lock = threading.Lock()
+
+
+def _default_file_mode():
+    """mkstemp 建立的暫存檔權限為 0600，替換後改回一般檔案依 umask 的權限"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+DEFAULT_FILE_MODE = _default_file_mode()
+
+
+def copy_file_mode(tmp_path, path):
+    """沿用既有檔案的權限，新檔案使用預設權限"""
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = DEFAULT_FILE_MODE
+    os.chmod(tmp_path, mode)
+
+
+def file_sha256(path):
+    """計算檔案內容的 SHA-256，檔案不存在時回傳 None"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def atomic_write_bytes(path, data):
+    """寫到暫存檔後原子替換"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        copy_file_mode(tmp_path, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_manifest(path, digest, size, rows, changed):
+    """記錄檔案的雜湊與筆數，呼叫端需持有 manifest_lock"""
+    key = path.replace(os.sep, "/")
+    manifest = load_manifest()
+    entry = manifest.get(key)
+    if changed or entry is None or entry.get("sha256") != digest:
+        manifest[key] = {
+            "sha256": digest,
+            "rows": rows,
+            "bytes": size,
+            "updated": datetime.now().isoformat(),
+        }
+        atomic_write_bytes(MANIFEST_PATH, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def write_bytes_if_changed(path, data, rows=None):
+    """內容與現有檔案不同時才寫入，回傳是否有變更"""
+    digest = hashlib.sha256(data).hexdigest()
+
+    with manifest_lock:
+        changed = file_sha256(path) != digest
+        if changed:
+            atomic_write_bytes(path, data)
+        _update_manifest(path, digest, len(data), rows, changed)
+
+    return changed
+
+
+def encode_csv(stream, columns, rows):
+    """CSV 格式（UTF-8 BOM、系統換行字元，與 Excel 及原本 pandas 的輸出相同）"""
+    stream.write("\ufeff")
+    writer = csv.writer(stream, lineterminator=os.linesep)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def encode_json(stream, columns, rows):
+    """JSON 陣列，每筆資料為一個物件"""
+    stream.write("[")
+    count = 0
+    for row in rows:
+        stream.write(",\n" if count else "\n")
+        stream.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        count += 1
+    stream.write("\n]\n" if count else "]\n")
+    return count
+
+
+def encode_ndjson(stream, columns, rows):
+    """每行一筆 JSON 物件"""
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+ENCODERS = {
+    ".csv": encode_csv,
+    ".json": encode_json,
+    ".ndjson": encode_ndjson,
+}
+
+
+def register_encoder(extension, encoder):
+    """加入新的輸出格式，encoder(stream, columns, rows) 需回傳寫入的筆數"""
+    ENCODERS[extension.lower()] = encoder
+
+
+class _HashingWriter(io.RawIOBase):
+    """寫入檔案的同時計算 SHA-256 與大小"""
+
+    def __init__(self, f):
+        self.f = f
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.f.write(data)
+        self.hash.update(data)
+        self.size += len(data)
+        return len(data)
+
+
+def write_rows_if_changed(path, columns, rows):
+    """
+    依副檔名的格式把資料列逐筆寫到暫存檔，內容與現有檔案不同時才原子替換
+    rows 可以是任何可迭代物件，回傳是否有變更
+    """
+    encoder = ENCODERS[os.path.splitext(path)[1].lower()]
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            hashing = _HashingWriter(f)
+            buffered = io.BufferedWriter(hashing)
+            stream = io.TextIOWrapper(buffered, encoding="utf-8", newline="")
+            count = encoder(stream, columns, rows)
+            stream.flush()
+            stream.detach()
+            buffered.flush()
+        digest = hashing.hash.hexdigest()
+
+        with manifest_lock:
+            changed = file_sha256(path) != digest
+            if changed:
+                copy_file_mode(tmp_path, path)
+                os.replace(tmp_path, path)
+            _update_manifest(path, digest, hashing.size, count, changed)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    status = "已更新" if changed else "內容未變更，略過寫入"
+    print(f"📄 {path}: {status} ({count} 筆)")
+    return changed
+
+
+def read_csv_rows(path):
+    """讀取 CSV 檔案，回傳 (欄位, 資料列)"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        return columns, list(reader)
@@ -0,0 +1,67 @@
+"""
+事件驅動的頁面就緒偵測
+在頁面內以 MutationObserver 觀察目標元素，數量足夠且 DOM 停止變動時立即回報，
+一次 execute_async_script 呼叫就取代固定的 time.sleep 與逐秒輪詢
+"""
+
+# 在頁面內執行的偵測腳本，結果以 callback 回傳給 Python
+READY_SCRIPT = """
+var selector = arguments[0], minCount = arguments[1], quietMs = arguments[2];
+var settleMs = arguments[3], timeoutMs = arguments[4], scroll = arguments[5];
+var done = arguments[arguments.length - 1];
+var start = Date.now(), lastChange = Date.now(), finished = false;
+var observer = null, timer = null;
+
+function countReady() {
+    var n = 0;
+    document.querySelectorAll(selector).forEach(function (e) {
+        if (e.textContent.trim()) { n++; }
+    });
+    return n;
+}
+
+function finish(ready, reason) {
+    if (finished) { return; }
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    clearInterval(timer);
+    done({ready: ready, reason: reason, count: countReady(), elapsed_ms: Date.now() - start});
+}
+
+function check() {
+    var now = Date.now(), n = countReady(), quiet = now - lastChange;
+    if (n >= minCount && quiet >= quietMs) { return finish(true, "count"); }
+    if (n > 0 && quiet >= settleMs) { return finish(true, "stable"); }
+    if (now - start >= timeoutMs) { finish(false, "timeout"); }
+}
+
+if (scroll && document.body) {
+    window.scrollTo(0, document.body.scrollHeight);
+    window.scrollTo(0, 0);
+}
+observer = new MutationObserver(function () { lastChange = Date.now(); });
+observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+timer = setInterval(check, 100);
+check();
+"""
+
+
+def wait_until_ready(driver, selector, min_count, timeout=30, quiet_ms=500,
+                     settle_ms=3000, scroll=False):
+    """
+    等待頁面上符合 selector 且有文字的元素就緒，回傳偵測結果 dict：
+    ready (是否就緒)、reason (count / stable / timeout)、count (元素數量)、elapsed_ms (耗時)
+
+    - 數量達到 min_count 且 DOM 靜止 quiet_ms 毫秒：就緒
+    - 數量未達標但已有元素，且 DOM 靜止 settle_ms 毫秒：視為清單已穩定
+    - 超過 timeout 秒：回報逾時
+    """
+    # 給 WebDriver 多一點時間，讓頁面內的逾時先觸發；瀏覽器池中的 driver 會被下一個任務沿用，結束後還原
+    previous_timeout = driver.timeouts.script
+    driver.set_script_timeout(timeout + 5)
+    try:
+        return driver.execute_async_script(
+            READY_SCRIPT, selector, min_count, quiet_ms, settle_ms, int(timeout * 1000), scroll
+        )
+    finally:
+        driver.set_script_timeout(previous_timeout)
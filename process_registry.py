@@ -0,0 +1,179 @@
+"""
+爬蟲 Chrome 進程登記與調試端口分配
+只記錄並清理爬蟲自己啟動的進程樹 (chromedriver / Chrome 及其子進程)，
+不再掃描整台主機的所有進程，也不會誤殺其他 headless Chrome；
+調試端口改為動態分配，多個爬蟲工作可以同時在同一台主機執行
+
+每次執行的登記內容寫在暫存資料夾 pvpoke_crawler_registry/<PID>.json，
+下次啟動時只會清理已結束的執行所遺留的進程
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+
+REGISTRY_DIR = os.path.join(tempfile.gettempdir(), "pvpoke_crawler_registry")
+
+
+def _process_key(proc):
+    """以 PID 與建立時間識別進程，避免 PID 被重複使用時誤殺"""
+    return {"pid": proc.pid, "create_time": proc.create_time()}
+
+
+def _find_process(entry):
+    """依登記資料取得仍存在且為同一個的進程，否則回傳 None"""
+    # psutil 只在實際登記或清理進程時才載入，沒有啟動瀏覽器的執行不需要它
+    import psutil
+    try:
+        proc = psutil.Process(entry["pid"])
+        if abs(proc.create_time() - entry["create_time"]) < 1:
+            return proc
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return None
+
+
+def _kill_tree(processes):
+    """終止進程與其目前的所有子進程，回傳終止的數量"""
+    import psutil
+    targets = {}
+    for proc in processes:
+        try:
+            targets[proc.pid] = proc
+            for child in proc.children(recursive=True):
+                targets[child.pid] = child
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+    killed = 0
+    for proc in targets.values():
+        try:
+            proc.kill()
+            killed += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    psutil.wait_procs(list(targets.values()), timeout=3)
+    return killed
+
+
+class ProcessRegistry:
+    """記錄本次執行啟動的瀏覽器進程樹"""
+
+    def __init__(self, registry_dir=REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self.path = os.path.join(registry_dir, f"{os.getpid()}.json")
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._reserved_ports = set()
+
+    def allocate_port(self):
+        """向作業系統取得一個目前空閒的端口"""
+        with self._lock:
+            while True:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.bind(("127.0.0.1", 0))
+                    port = sock.getsockname()[1]
+                if port not in self._reserved_ports:
+                    self._reserved_ports.add(port)
+                    return port
+
+    def release_port(self, port):
+        with self._lock:
+            self._reserved_ports.discard(port)
+
+    def _save(self):
+        import psutil
+        os.makedirs(self.registry_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "owner": _process_key(psutil.Process()),
+                "entries": {str(pid): entry for pid, entry in self._entries.items()}
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def register(self, owner_id, root_pid, port=None):
+        """登記啟動的根進程 (chromedriver 或 Chrome) 與目前的子進程"""
+        import psutil
+        try:
+            root = psutil.Process(root_pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        entry = {
+            "owner_id": owner_id,
+            "port": port,
+            "processes": [_process_key(p) for p in tree if p.is_running()],
+        }
+        with self._lock:
+            self._entries[root_pid] = entry
+            self._save()
+
+    def release(self, root_pid):
+        """終止指定根進程的整個進程樹並移除登記，回傳終止的數量"""
+        with self._lock:
+            entry = self._entries.pop(root_pid, None)
+            if entry is None:
+                return 0
+            if entry.get("port"):
+                self._reserved_ports.discard(entry["port"])
+            self._save()
+        processes = [p for p in map(_find_process, entry["processes"]) if p]
+        return _kill_tree(processes)
+
+    def release_all(self):
+        """終止本次執行登記的所有進程"""
+        with self._lock:
+            roots = list(self._entries)
+        killed = sum(self.release(root_pid) for root_pid in roots)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return killed
+
+    def cleanup_stale(self):
+        """清理已結束的執行所遺留的進程，正在執行中的其他爬蟲不受影響"""
+        killed = 0
+        try:
+            filenames = os.listdir(self.registry_dir)
+        except FileNotFoundError:
+            return 0
+
+        for filename in filenames:
+            path = os.path.join(self.registry_dir, filename)
+            if not filename.endswith(".json") or path == self.path:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if _find_process(data.get("owner", {"pid": -1, "create_time": 0})):
+                # 該次執行仍在進行中
+                continue
+            for entry in data.get("entries", {}).values():
+                processes = [p for p in map(_find_process, entry.get("processes", [])) if p]
+                killed += _kill_tree(processes)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return killed
+
+
+# 同一個 Python 程序中的所有爬蟲共用
+registry = ProcessRegistry()
+
+
+def kill_crawler_processes():
+    """清理本次執行與已結束執行所遺留的爬蟲進程"""
+    try:
+        killed = registry.release_all() + registry.cleanup_stale()
+        if killed > 0:
+            print(f"共終止 {killed} 個爬蟲相關的 Chrome 進程")
+        else:
+            print("沒有找到需要清理的爬蟲 Chrome 進程")
+    except Exception as e:
+        print(f"清理爬蟲 Chrome 進程時發生錯誤: {e}")
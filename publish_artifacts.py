@@ -0,0 +1,123 @@
+"""
+產生前端使用的 JSON 分片
+PvP 三個聯盟合併成一份前 N 名索引，每個 PvE 屬性各輸出一個已清理、已排序的 JSON 檔，並附上 manifest，
+前端只需要下載目前查詢的那一份，不必每次點擊都下載並解析整份 CSV
+分片只包含網頁 (script.js) 實際使用的欄位
+
+輸出：
+  data/shards/manifest.json      各分片的路徑、筆數與內容雜湊（前端用來避免快取舊檔）
+  data/shards/pvp/index.json     前 N 名查詢用的索引，格式見 top_n_index.py
+  data/shards/pve/<屬性>.json    {"type": "fire", "count": N, "names": [名稱, ...], "ranks": [最佳排名, ...]}
+                                 names 已去除重複，ranks 為每個名稱第一次出現的排名
+比對鍵 (Key / key 欄位) 只保留在 CSV 中，網頁沒有使用，不放進分片
+
+所有前端資料會再以 compress_artifacts.py 產生 .gz / .br 版本
+
+使用方式：python publish_artifacts.py
+"""
+import hashlib
+import json
+import os
+
+from compress_artifacts import compress_artifacts
+from output_writer import read_csv_rows, write_bytes_if_changed
+from top_n_index import build_top_n_index
+
+SHARDS_DIR = os.path.join("data", "shards")
+MANIFEST_PATH = os.path.join(SHARDS_DIR, "manifest.json")
+
+PVP_LEAGUES = ["1500", "2500", "10000"]
+PVE_MERGED_PATH = os.path.join("data", "pve.csv")
+
+
+def encode_json(payload):
+    """前端使用的 JSON 不需要縮排"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def load_pvp_rows(league):
+    """讀取聯盟排名，回傳 [[名稱, XL], ...]，略過空白名稱"""
+    path = os.path.join("data", f"pvpoke_{league}.csv")
+    if not os.path.exists(path):
+        return None
+    columns, rows = read_csv_rows(path)
+    name_index, xl_index = columns.index("Pokemon"), columns.index("XL")
+    pokemon = []
+    for row in rows:
+        name = row[name_index].strip()
+        if name:
+            pokemon.append([name, 1 if row[xl_index] in ("1", "True") else 0])
+    return pokemon
+
+
+def load_pve_names():
+    """讀取合併後的 PvE 排名，回傳 {屬性: ([名稱, ...], [最佳排名, ...])}，依排名排序並去除重複"""
+    if not os.path.exists(PVE_MERGED_PATH):
+        return {}
+    columns, rows = read_csv_rows(PVE_MERGED_PATH)
+    type_index, rank_index, name_index = columns.index("type"), columns.index("rank"), columns.index("name")
+
+    ranked = {}
+    for row in rows:
+        ranked.setdefault(row[type_index], []).append((int(row[rank_index]), row[name_index].strip()))
+
+    names_by_type = {}
+    for ptype, entries in ranked.items():
+        names, ranks = [], []
+        seen = set()
+        for rank, name in sorted(entries):
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+                ranks.append(rank)
+        names_by_type[ptype] = (names, ranks)
+    return names_by_type
+
+
+def build_shards():
+    """回傳 {分片名稱: 內容}"""
+    shards = {}
+    league_rows = {}
+    for league in PVP_LEAGUES:
+        pokemon = load_pvp_rows(league)
+        if pokemon is not None:
+            league_rows[league] = pokemon
+    if league_rows:
+        index = build_top_n_index(league_rows)
+        index["count"] = len(index["names"])
+        shards["pvp/index"] = index
+    for ptype, (names, ranks) in load_pve_names().items():
+        shards[f"pve/{ptype}"] = {"type": ptype, "count": len(names), "names": names, "ranks": ranks}
+    return shards
+
+
+def publish_artifacts():
+    """寫出所有分片與 manifest，只有內容變更的檔案會被重寫"""
+    shards = build_shards()
+    if not shards:
+        print("⚠️  沒有可發佈的資料")
+        return None
+
+    manifest = {"version": 1, "shards": {}}
+    changed_count = 0
+    for key, payload in shards.items():
+        data = encode_json(payload)
+        relative_path = f"{key}.json"
+        changed_count += write_bytes_if_changed(os.path.join(SHARDS_DIR, relative_path), data, rows=payload["count"])
+        manifest["shards"][key] = {
+            "path": relative_path,
+            "count": payload["count"],
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest()[:12],
+        }
+
+    write_bytes_if_changed(MANIFEST_PATH, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    print(f"📦 前端分片: {len(shards)} 個，其中 {changed_count} 個有變更 ({MANIFEST_PATH})")
+
+    # 產生預先壓縮的版本並檢查大小預算
+    compress_artifacts()
+    return manifest
+
+
+if __name__ == "__main__":
+    publish_artifacts()
@@ -1,424 +1,502 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import time
-import pandas as pd
+IMPORT_START = time.time()
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from datetime import datetime
-from git import Repo
-import shutil
 import threading
-import tempfile
 from pathlib import Path
-import uuid
-import psutil
-
-# 自動清除壞掉的 .wdm cache
-cache_dir = os.path.join(os.path.expanduser("~"), ".wdm")
-if os.path.exists(cache_dir):
-    shutil.rmtree(cache_dir)
-    print("已清除 .wdm cache，等待重新下載乾淨的 driver")
+from contextlib import contextmanager
+from browser_pool import BrowserPool
+from page_ready import wait_until_ready
+from request_filter import apply_request_filter, report_network_stats
+import cdp_engine
+from cdp_engine import CRAWLER_ENGINE
+from change_detection import detector
+from output_writer import write_rows_if_changed, read_csv_rows
+from process_registry import kill_crawler_processes
+from chrome_driver import setup_driver, cleanup_crawler_resources, get_driver_path
+from startup_report import report_startup
+from history_store import record_ranking
+from publish_artifacts import publish_artifacts
+import telemetry
+from retry_policy import CrawlFailure, run_with_retries, EMPTY
+from hedging import run_hedged, latency_history
+from name_normalizer import canonical_key, clean_text, display_name, normalize_column
+import json
+import re
 
 # 定義所有屬性爬蟲任務
 POKEMON_TYPES = ["normal", "fire", "water", "electric", "grass", "ice", "fighting", 
                 "poison", "ground", "flying", "psychic", "bug", "rock", "ghost", 
                 "dragon", "dark", "steel", "fairy"]
 
+# 可用環境變數指向本機的測試伺服器
+POKEMONGOHUB_BASE_URL = os.environ.get("POKEMONGOHUB_BASE_URL", "https://db.pokemongohub.net").rstrip("/")
+
 # 生成爬蟲任務列表
 CRAWLER_TASKS = []
-for i, ptype in enumerate(POKEMON_TYPES):
+for ptype in POKEMON_TYPES:
     CRAWLER_TASKS.append({
         "crawler_id": f"Crawler-{ptype}",
         "filename": f"{ptype}.csv",
-        "url": f"https://db.pokemongohub.net/pokemon-list/best-per-type/{ptype}",
-        "debug_port": 9225 + i,  # 從9225開始分配端口
+        "url": f"{POKEMONGOHUB_BASE_URL}/pokemon-list/best-per-type/{ptype}",
         "type": ptype
     })
 
 # 全域變數和鎖
-driver_lock = threading.Lock()
-driver_path = None
-
-def get_driver_path():
-    """線程安全地獲取 ChromeDriver 路徑"""
-    global driver_path
-    with driver_lock:
-        if driver_path is None:
-            print("正在下載和安裝 ChromeDriver...")
-            driver_path = ChromeDriverManager().install()
-            print(f"ChromeDriver 安裝完成: {driver_path}")
-            
-            # 確保檔案權限正確
-            try:
-                os.chmod(driver_path, 0o755)
-            except Exception as e:
-                print(f"設定 ChromeDriver 權限時發生警告: {e}")
-        
-        return driver_path
-
-def create_unique_user_data_dir(crawler_id):
-    """為每個爬蟲創建獨立的用戶資料目錄"""
-    temp_dir = tempfile.gettempdir()
-    unique_dir = os.path.join(temp_dir, f"chrome_profile_{crawler_id}_{uuid.uuid4().hex[:8]}")
-    os.makedirs(unique_dir, exist_ok=True)
-    return unique_dir
-
-def setup_driver(crawler_id, debug_port):
-    """為指定的爬蟲設定 Selenium WebDriver"""
-    print(f"[{crawler_id}] 正在初始化 WebDriver...")
-    
-    # 創建獨立的用戶資料目錄
-    user_data_dir = create_unique_user_data_dir(crawler_id)
-    
-    options = webdriver.ChromeOptions()
-    
-    # 基本選項
-    options.add_argument("--headless=new")  # 使用新的 headless 模式
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-web-security")
-    options.add_argument("--disable-features=VizDisplayCompositor")
-    
-    # 為每個爬蟲指定獨立資源
-    options.add_argument(f"--user-data-dir={user_data_dir}")
-    options.add_argument(f"--remote-debugging-port={debug_port}")
-    
-    # 性能優化選項
-    options.add_argument("--disable-extensions")
-    options.add_argument("--disable-plugins")
-    options.add_argument("--disable-ipc-flooding-protection")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    # 記憶體優化
-    options.add_argument("--memory-pressure-off")
-    options.add_argument("--max_old_space_size=4096")
-    
-    # 獲取 ChromeDriver 路徑
-    chrome_driver_path = get_driver_path()
-    
-    driver = None
-    try:
-        service = Service(chrome_driver_path)
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(60)
-        driver.implicitly_wait(10)
-        print(f"[{crawler_id}] WebDriver 初始化成功，使用端口: {debug_port}")
-        return driver, user_data_dir
-        
-    except Exception as e:
-        print(f"[{crawler_id}] WebDriver 初始化失敗: {e}")
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-        # 清理資源
-        try:
-            shutil.rmtree(user_data_dir, ignore_errors=True)
-        except:
-            pass
-        raise
-    
-def clean_pokemon_name(raw_name):
-    """清理寶可夢名稱，移除括號內容並只保留最後一個單詞"""
-    if not raw_name:
-        return raw_name
-    
-    # 移除括號及其內容 (包括圓括號、方括號等)
-    import re
-    cleaned_name = re.sub(r'\([^)]*\)', '', raw_name)  # 移除圓括號內容
-    cleaned_name = re.sub(r'\[[^\]]*\]', '', cleaned_name)  # 移除方括號內容
-    cleaned_name = re.sub(r'\{[^}]*\}', '', cleaned_name)  # 移除大括號內容
-    
-    # 清理多餘空格
-    cleaned_name = cleaned_name.strip()
-    
-    # 取最後一個空格後的單詞
-    if cleaned_name and ' ' in cleaned_name:
-        return cleaned_name.split()[-1]
-    else:
-        return cleaned_name
+browser_pool_lock = threading.Lock()
+browser_pool = None
+
+# 各屬性完成時結果直接放進記憶體，data/pve.csv 由這份資料產生，不再重新讀取 pve/*.csv
+merge_lock = threading.Lock()
+merged_results = {}
+last_merge_time = 0
+MERGED_CSV_PATH = "data/pve.csv"
+# 爬取期間最多每幾秒更新一次 data/pve.csv，讓先完成的屬性可以先被使用
+MERGE_FLUSH_INTERVAL = 5
+
+# 每個屬性保留的排名數量
+PVE_TOP_N = 50
 
+# 在頁面內依序嘗試三種方式抓取寶可夢連結，並截取前 N 筆
+# 方法1: 結果區塊內連到 /pokemon/ 的連結文字
+# 方法2: 整個頁面中 href 含 pokemon 的連結文字
+# 方法3: 所有 href 含 pokemon 的連結網址（去除重複）
+EXTRACT_LINKS_SCRIPT = """
+var root = arguments[0] || document.querySelector('[class*="PokemonCounters_results__"]') || document.body;
+var limit = arguments[1];
 
-def cleanup_crawler_resources(driver, user_data_dir, crawler_id):
-    """清理爬蟲相關資源"""
-    if driver:
+function textRows(anchors) {
+    var rows = [];
+    for (var i = 0; i < anchors.length && rows.length < limit; i++) {
+        var text = anchors[i].innerText.trim();
+        if (text) { rows.push([text, anchors[i].href]); }
+    }
+    return rows;
+}
+
+var rows = textRows(root.querySelectorAll('a[href*="/pokemon/"]'));
+if (rows.length) { return {method: 1, rows: rows}; }
+
+rows = textRows(document.querySelectorAll('a[href*="pokemon"]'));
+if (rows.length) { return {method: 2, rows: rows}; }
+
+var seen = {}, links = document.getElementsByTagName("a");
+rows = [];
+for (var i = 0; i < links.length && rows.length < limit; i++) {
+    var href = links[i].href;
+    if (!href || href.toLowerCase().indexOf("pokemon") === -1 || seen[href]) { continue; }
+    seen[href] = true;
+    rows.push(["", href]);
+}
+return {method: 3, rows: rows};
+"""
+
+# Next.js 頁面內嵌資料
+NEXT_DATA_PATTERN = re.compile(rb'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', re.S)
+
+# 瀏覽器池設定：同時存活的 Chrome 數量與每個 Chrome 可服務的任務數
+BROWSER_POOL_SIZE = 6
+BROWSER_MAX_USES = 10
+
+def clean_link_rows(data, crawler_id):
+    """把頁面回傳的連結資料整理成寶可夢名稱，型態在儲存時由 name_normalizer 拆開"""
+    method = data.get("method")
+    rows = data.get("rows") or []
+    names = []
+
+    for text, href in rows:
+        if method == 3:
+            # 從URL中提取寶可夢名稱
+            raw_name = href.split('/')[-1].replace('-', ' ').title()
+        else:
+            raw_name = text
+        name = clean_text(raw_name)
+        if display_name(name):
+            names.append(name)
+
+    if method == 3:
+        print(f"[{crawler_id}] 找到 {len(rows)} 個包含pokemon的連結")
+        print(f"[{crawler_id}] 從連結提取到 {len(names)} 個名稱")
+    else:
+        print(f"[{crawler_id}] 方法{method}找到 {len(names)} 個名稱")
+    return names
+
+def extract_pve_names(driver, results, crawler_id):
+    """一次腳本呼叫取回連結文字與網址，在 Python 端只做名稱清理"""
+    with telemetry.span("extract") as extract_span:
         try:
-            driver.quit()
-            print(f"[{crawler_id}] WebDriver 已關閉")
+            data = driver.execute_script(EXTRACT_LINKS_SCRIPT, results, PVE_TOP_N) or {}
         except Exception as e:
-            print(f"[{crawler_id}] 關閉 WebDriver 時發生錯誤: {e}")
-    
-    # 清理臨時目錄
+            print(f"[{crawler_id}] 抓取連結失敗: {e}")
+            extract_span.set(outcome="error", error=str(e)[:200])
+            return []
+
+        names = clean_link_rows(data, crawler_id)
+        extract_span.set(count=len(names), outcome="ok" if names else "empty")
+        return names
+
+
+def get_browser_pool():
+    """線程安全地取得共用的瀏覽器池"""
+    global browser_pool
+    with browser_pool_lock:
+        if browser_pool is None:
+            browser_pool = BrowserPool(
+                setup_driver, cleanup_crawler_resources,
+                size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES,
+                name="PVE-Browser"
+            )
+        return browser_pool
+
+def close_browser_pool(wait=True):
+    """關閉瀏覽器池中的所有 Chrome；wait=False 時不等待使用中的分頁（中斷時使用）"""
+    global browser_pool
+    with browser_pool_lock:
+        if browser_pool is not None:
+            if wait:
+                browser_pool.close()
+            else:
+                browser_pool.close(timeout=0)
+            browser_pool = None
+
+def kill_chrome_processes():
+    """只清理爬蟲自己啟動並登記的 Chrome 進程，保留其他 Chrome"""
+    kill_crawler_processes()
+
+def load_and_extract(driver, task):
+    """在已取得的分頁中載入屬性頁面並抓取寶可夢名稱"""
+    state = {}
+    load_page(driver, task, state)
+    wait_page(driver, task, state)
+
+    # 4️⃣ 抓取寶可夢名稱，三種方式在同一次腳本呼叫中依序嘗試
+    print(f"[{task['crawler_id']}] 抓取寶可夢名稱...")
+    return extract_pve_names(driver, state["results"], task["crawler_id"])
+
+# 以下為重試引擎使用的步驟，失敗時拋出 CrawlFailure 或 selenium 例外，讓重試從對應的階段開始
+def load_page(driver, task, state):
+    """載入屬性頁面"""
+    print(f"[{task['crawler_id']}] 正在載入頁面: {task['url']}")
+    with telemetry.span("load", url=task["url"]):
+        driver.get(task["url"])
+
+def wait_page(driver, task, state):
+    """等待階段包含就緒偵測、cookie 彈窗與結果區塊的尋找，結果區塊保留給提取步驟使用"""
+    with telemetry.span("wait") as wait_span:
+        state["results"] = wait_for_results(driver, task["crawler_id"], wait_span)
+
+def extract_page(driver, task, state):
+    """抓取前 PVE_TOP_N 個寶可夢名稱"""
+    print(f"[{task['crawler_id']}] 抓取寶可夢名稱...")
+    names = extract_pve_names(driver, state.get("results"), task["crawler_id"])[:PVE_TOP_N]
+    if not names:
+        raise CrawlFailure(EMPTY, f"{task['type']} 屬性沒有找到任何資料")
+    return names
+
+@contextmanager
+def open_task_tab(task, cancel=None):
+    """從瀏覽器池取得分頁並套用請求過濾，不再每次嘗試都啟動新的 Chrome；cancel 設定後放棄等待閒置的瀏覽器"""
+    crawler_id = task["crawler_id"]
+    with get_browser_pool().tab(crawler_id, cancel=cancel) as driver:
+        apply_request_filter(driver, task["url"], crawler_id)
+        yield driver
+        report_network_stats(driver, crawler_id, task["url"])
+
+def wait_for_results(driver, crawler_id, wait_span):
+    """等待頁面內容與結果區塊出現，回傳結果區塊元素"""
+    # 等寶可夢連結出現且 DOM 不再變動，取代固定的等待時間
     try:
-        shutil.rmtree(user_data_dir, ignore_errors=True)
-        print(f"[{crawler_id}] 已清理臨時目錄: {user_data_dir}")
+        ready = wait_until_ready(driver, 'a[href*="/pokemon/"]', PVE_TOP_N, timeout=20)
+        print(f"[{crawler_id}] 頁面就緒偵測: {ready.get('reason')}，"
+              f"{ready.get('count', 0)} 個連結 (耗時 {ready.get('elapsed_ms', 0) / 1000:.2f} 秒)")
+        wait_span.set(count=ready.get("count", 0), reason=ready.get("reason"))
     except Exception as e:
-        print(f"[{crawler_id}] 清理臨時目錄時發生錯誤: {e}")
+        print(f"[{crawler_id}] 頁面就緒偵測失敗: {e}")
+        wait_span.set(reason="error")
 
-def kill_chrome_processes():
-    """清理與本任務相關的 Chrome 進程 (端口 9225-9243)"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    # 1️⃣ 嘗試多種 selector，找到頁面主要內容
+    print(f"[{crawler_id}] 等待頁面內容載入...")
     try:
-        killed_count = 0
-        target_ports = set(range(9225, 9225 + len(POKEMON_TYPES)))
+        # 先嘗試原本的選擇器
+        WebDriverWait(driver, 15).until(
+            EC.presence_of_element_located(
+                (By.XPATH, '//div[contains(@class,"layout_layout__")]')
+            )
+        )
+        print(f"[{crawler_id}] 找到 layout 元素")
+    except:
+        print(f"[{crawler_id}] 找不到 layout，嘗試其他選擇器...")
+        # 嘗試其他可能的選擇器
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located(
+                    (By.TAG_NAME, "main")
+                )
+            )
+            print(f"[{crawler_id}] 找到 main 元素")
+        except:
+            print(f"[{crawler_id}] 嘗試等待 body 載入完成...")
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located(
+                    (By.TAG_NAME, "body")
+                )
+            )
+            time.sleep(3)  # 額外等待時間
+
+    # 2️⃣ 如果有 cookie 彈窗，先關掉
+    try:
+        cookie_btn = WebDriverWait(driver, 3).until(
+            EC.element_to_be_clickable((By.XPATH, '//button[contains(text(),"Accept")]'))
+        )
+        cookie_btn.click()
+        print(f"[{crawler_id}] 已點擊 Accept cookies")
+        time.sleep(1)
+    except:
+        print(f"[{crawler_id}] 沒有找到 cookie 彈窗")
+
+    # 3️⃣ 等結果區塊載入，嘗試多種選擇器
+    print(f"[{crawler_id}] 尋找結果區塊...")
+    results = None
+
+    # 嘗試不同的選擇器
+    selectors = [
+        '//div[contains(@class,"PokemonCounters_results__")]',
+        '//div[contains(@class,"results")]',
+        '//div[contains(@class, "pokemon")]',
+        '//main//div',
+        '//div[@class]'
+    ]
+
+    for selector in selectors:
+        try:
+            results = WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, selector))
+            )
+            print(f"[{crawler_id}] 找到結果區塊: {selector}")
+            break
+        except:
+            continue
+
+    if results is None:
+        print(f"[{crawler_id}] 所有選擇器都失敗，嘗試直接從整個頁面抓取...")
+        results = driver.find_element(By.TAG_NAME, "body")
+        wait_span.set(outcome="fallback")
+
+    return results
+
+def save_type_csv(task, names):
+    """正規化名稱後儲存單一屬性的排名資料到 pve/ 資料夾，key 為與 PvP 資料共用的比對鍵"""
+    path = f"pve/{task['filename']}"
+    names, keys = normalize_column(names)
+    with telemetry.span("write", file=path, count=len(names)) as write_span:
+        # 儲存成 CSV 檔案，內容沒變時不重寫
+        rows = ((rank, name, key) for rank, (name, key) in enumerate(zip(names, keys), start=1))
+        changed = write_rows_if_changed(path, ["rank", "name", "key"], rows)
+        write_span.set(changed=changed, bytes=os.path.getsize(path) if changed else 0)
+    print(f"[{task['crawler_id']}] ✅ {task['type']} 屬性資料已成功抓取並儲存 (共 {len(names)} 筆資料)")
+    detector.commit(task["crawler_id"])
+    add_merge_result(task["type"], names, keys)
+    record_ranking("pve", task["type"], names, keys=keys)
+
+def add_merge_result(ptype, names, keys):
+    """把單一屬性的結果加入合併資料，並視情況先更新部分完成的 data/pve.csv"""
+    with merge_lock:
+        merged_results[ptype] = list(zip(names, keys))
+    write_merged_csv(force=False)
+
+def load_type_names(ptype):
+    """讀取本次沒有重新爬取的屬性（例如來源未變更）既有的 CSV，回傳 [(名稱, 比對鍵)]"""
+    columns, rows = read_csv_rows(f"pve/{ptype}.csv")
+    name_index = columns.index("name")
+    if "key" in columns:
+        key_index = columns.index("key")
+        return [(row[name_index], row[key_index]) for row in rows]
+    # 加入比對鍵之前產生的檔案
+    return [(row[name_index], canonical_key(row[name_index])) for row in rows]
+
+def write_merged_csv(force=True):
+    """
+    以記憶體中的結果一次產生 data/pve.csv，回傳各屬性的筆數
+    force=False 時距離上次寫入未滿 MERGE_FLUSH_INTERVAL 秒則略過並回傳 None
+    """
+    global last_merge_time
+    with merge_lock:
+        if not force and time.time() - last_merge_time < MERGE_FLUSH_INTERVAL:
+            return None
+        last_merge_time = time.time()
         
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                if 'chrome' in proc.info['name'].lower():
-                    # 檢查命令行參數中是否包含我們的調試端口
-                    cmdline = ' '.join(proc.info.get('cmdline', []))
-                    for port in target_ports:
-                        if f'--remote-debugging-port={port}' in cmdline:
-                            proc.kill()
-                            killed_count += 1
-                            print(f"終止了使用端口 {port} 的 Chrome 進程 (PID: {proc.pid})")
-                            break
-            except (psutil.NoSuchProcess, psutil.AccessDenied, TypeError):
-                pass
-                
-        if killed_count > 0:
-            print(f"已終止 {killed_count} 個與本任務相關的 Chrome 進程")
+        for ptype in POKEMON_TYPES:
+            if ptype not in merged_results and os.path.exists(f"pve/{ptype}.csv"):
+                try:
+                    merged_results[ptype] = load_type_names(ptype)
+                except Exception as e:
+                    print(f"❌ 讀取 {ptype}.csv 時發生錯誤: {e}")
+        
+        type_counts = {ptype: len(merged_results[ptype]) for ptype in POKEMON_TYPES if ptype in merged_results}
+        if type_counts:
+            # 欄位順序: type, rank, name, key
+            rows = (
+                [ptype, rank, name, key]
+                for ptype in POKEMON_TYPES if ptype in merged_results
+                for rank, (name, key) in enumerate(merged_results[ptype], start=1)
+            )
+            write_rows_if_changed(MERGED_CSV_PATH, ["type", "rank", "name", "key"], rows)
+        return type_counts
+
+def extract_page_data(body):
+    """取出 Next.js 頁面內嵌的資料 (__NEXT_DATA__ 的 pageProps)，避免 buildId 等欄位影響指紋"""
+    match = NEXT_DATA_PATTERN.search(body)
+    if not match:
+        return body
+    try:
+        page_props = json.loads(match.group(1)).get("props", {}).get("pageProps", {})
+    except ValueError:
+        return match.group(1)
+    return json.dumps(page_props, sort_keys=True).encode("utf-8")
+
+def is_task_unchanged(task):
+    """頁面資料沒有變動且 CSV 已存在時，不需要啟動瀏覽器"""
+    with telemetry.span("change_check", **telemetry.task_labels(task)) as check_span:
+        unchanged = detector.is_unchanged(task["crawler_id"], [task["url"]], [f"pve/{task['filename']}"],
+                                          extract=extract_page_data)
+        check_span.set(outcome="unchanged" if unchanged else "changed")
+    if unchanged:
+        print(f"[{task['crawler_id']}] 來源資料未變更，跳過 {task['type']} 屬性")
+        detector.commit(task["crawler_id"])
+        return True
+    return False
+
+async def crawl_page_cdp(page, task):
+    """CDP 引擎使用的頁面爬取流程，結果格式與 load_and_extract 相同"""
+    crawler_id = task["crawler_id"]
+    
+    print(f"[{crawler_id}] 正在載入頁面: {task['url']}")
+    with telemetry.span("load", url=task["url"]):
+        await page.goto(task["url"])
+    
+    with telemetry.span("wait") as wait_span:
+        ready = await page.wait_until_ready('a[href*="/pokemon/"]', PVE_TOP_N, timeout=20)
+        wait_span.set(count=ready.get("count", 0), reason=ready.get("reason"))
+    print(f"[{crawler_id}] 頁面就緒偵測: {ready.get('reason')}，{ready.get('count', 0)} 個連結")
+    
+    with telemetry.span("extract") as extract_span:
+        data = await page.evaluate(cdp_engine.wrap_script(EXTRACT_LINKS_SCRIPT, None, PVE_TOP_N))
+        names = clean_link_rows(data or {}, crawler_id)[:PVE_TOP_N]
+        extract_span.set(count=len(names), outcome="ok" if names else "empty")
+    return names or None
+
+def run_with_cdp_engine(tasks):
+    """以 CDP 引擎同時爬取所有屬性頁面"""
+    results = {}
+    pending = []
+    for task in tasks:
+        if is_task_unchanged(task):
+            results[task["crawler_id"]] = True
         else:
-            print("沒有找到需要清理的 Chrome 進程")
-    except Exception as e:
-        print(f"清理 Chrome 進程時發生錯誤: {e}")
+            pending.append(task)
+    
+    if not pending:
+        return results
+    
+    page_results = cdp_engine.run_tasks(pending, crawl_page_cdp)
+    for task in pending:
+        names = page_results.get(task["crawler_id"])
+        if names:
+            with telemetry.labels(**telemetry.task_labels(task)):
+                save_type_csv(task, names)
+        results[task["crawler_id"]] = bool(names)
+    return results
 
 def run_crawler(task):
     """運行單個爬蟲任務"""
     crawler_id = task["crawler_id"]
-    filename = task["filename"]
-    url = task["url"] 
-    debug_port = task["debug_port"]
     ptype = task["type"]
     
-    max_retries = 3
+    # 來源沒有變動時直接結束，不需要啟動瀏覽器
+    if is_task_unchanged(task):
+        return True
     
-    for attempt in range(max_retries):
-        driver = None
-        user_data_dir = None
-        
-        try:
-            print(f"[{crawler_id}] 開始爬取 {ptype} 屬性資料 (嘗試 {attempt + 1}/{max_retries})")
-            
-            # 初始化 WebDriver
-            driver, user_data_dir = setup_driver(crawler_id, debug_port)
-            
-            # 載入頁面
-            print(f"[{crawler_id}] 正在載入頁面: {url}")
-            driver.get(url)
-            time.sleep(5)  # 額外等待時間
-            
-            # 1️⃣ 嘗試多種 selector，找到頁面主要內容
-            print(f"[{crawler_id}] 等待頁面內容載入...")
-            try:
-                # 先嘗試原本的選擇器
-                WebDriverWait(driver, 15).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//div[contains(@class,"layout_layout__")]')
-                    )
-                )
-                print(f"[{crawler_id}] 找到 layout 元素")
-            except:
-                print(f"[{crawler_id}] 找不到 layout，嘗試其他選擇器...")
-                # 嘗試其他可能的選擇器
-                try:
-                    WebDriverWait(driver, 15).until(
-                        EC.presence_of_element_located(
-                            (By.TAG_NAME, "main")
-                        )
-                    )
-                    print(f"[{crawler_id}] 找到 main 元素")
-                except:
-                    print(f"[{crawler_id}] 嘗試等待 body 載入完成...")
-                    WebDriverWait(driver, 15).until(
-                        EC.presence_of_element_located(
-                            (By.TAG_NAME, "body")
-                        )
-                    )
-                    time.sleep(3)  # 額外等待時間
-
-            # 2️⃣ 如果有 cookie 彈窗，先關掉
-            try:
-                cookie_btn = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, '//button[contains(text(),"Accept")]'))
-                )
-                cookie_btn.click()
-                print(f"[{crawler_id}] 已點擊 Accept cookies")
-                time.sleep(1)
-            except:
-                print(f"[{crawler_id}] 沒有找到 cookie 彈窗")
-
-            # 3️⃣ 等結果區塊載入，嘗試多種選擇器
-            print(f"[{crawler_id}] 尋找結果區塊...")
-            results = None
-            
-            # 嘗試不同的選擇器
-            selectors = [
-                '//div[contains(@class,"PokemonCounters_results__")]',
-                '//div[contains(@class,"results")]',
-                '//div[contains(@class, "pokemon")]',
-                '//main//div',
-                '//div[@class]'
-            ]
-            
-            for selector in selectors:
-                try:
-                    results = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.XPATH, selector))
-                    )
-                    print(f"[{crawler_id}] 找到結果區塊: {selector}")
-                    break
-                except:
-                    continue
-            
-            if results is None:
-                print(f"[{crawler_id}] 所有選擇器都失敗，嘗試直接從整個頁面抓取...")
-                results = driver.find_element(By.TAG_NAME, "body")
-
-            # 4️⃣ 抓取寶可夢名稱，嘗試多種方式
-            print(f"[{crawler_id}] 抓取寶可夢名稱...")
-            names = []
-            
-            # 方法1: 原本的方式
-            try:
-                name_elems = results.find_elements(By.XPATH, './/a[contains(@href,"/pokemon/")]')
-                raw_names = [e.text.strip() for e in name_elems if e.text.strip()]
-                # 清理名稱：移除括號內容並只保留最後一個單詞
-                names = [clean_pokemon_name(name) for name in raw_names if clean_pokemon_name(name)]
-                print(f"[{crawler_id}] 方法1找到 {len(names)} 個名稱")
-            except:
-                print(f"[{crawler_id}] 方法1失敗")
-            
-            # 方法2: 如果方法1沒找到，嘗試其他選擇器
-            if len(names) == 0:
-                try:
-                    name_elems = driver.find_elements(By.XPATH, '//a[contains(@href,"pokemon")]')
-                    raw_names = [e.text.strip() for e in name_elems if e.text.strip()]
-                    # 清理名稱：移除括號內容並只保留最後一個單詞
-                    names = [clean_pokemon_name(name) for name in raw_names if clean_pokemon_name(name)]
-                    print(f"[{crawler_id}] 方法2找到 {len(names)} 個名稱")
-                except:
-                    print(f"[{crawler_id}] 方法2失敗")
-            
-            # 方法3: 更廣泛的搜尋
-            if len(names) == 0:
-                try:
-                    # 嘗試找任何包含pokemon的連結
-                    name_elems = driver.find_elements(By.PARTIAL_LINK_TEXT, "")
-                    all_links = [e.get_attribute('href') for e in name_elems if e.get_attribute('href')]
-                    pokemon_links = [link for link in all_links if 'pokemon' in link.lower()]
-                    print(f"[{crawler_id}] 找到 {len(pokemon_links)} 個包含pokemon的連結")
-                    
-                    if len(pokemon_links) > 0:
-                        # 從連結中提取寶可夢名稱
-                        for link in pokemon_links[:50]:  # 限制50個
-                            try:
-                                # 從URL中提取寶可夢名稱
-                                raw_name = link.split('/')[-1].replace('-', ' ').title()
-                                # 清理名稱：移除括號內容並只保留最後一個單詞
-                                name = clean_pokemon_name(raw_name)
-                                if name:
-                                    names.append(name)
-                            except:
-                                continue
-                        print(f"[{crawler_id}] 從連結提取到 {len(names)} 個名稱")
-                        
-                except Exception as e:
-                    print(f"[{crawler_id}] 方法3失敗: {e}")
-
-            # 取前50個結果
-            names = names[:50] if names else []
-            
-            if not names:
-                print(f"[{crawler_id}] 警告: {ptype} 屬性沒有找到任何資料")
-                if attempt < max_retries - 1:
-                    continue
-                else:
-                    print(f"[{crawler_id}] {ptype} 屬性爬取失敗：找不到資料")
-                    return False
-            
-            # 確保資料夾存在
-            if not os.path.exists("pve"):
-                os.makedirs("pve")
-            
-            # 儲存成 CSV 檔案
-            data = pd.DataFrame({"rank": range(1, len(names) + 1), "name": names})
-            data.to_csv(f"pve/{filename}", index=False, encoding="utf-8-sig")
-            print(f"[{crawler_id}] ✅ {ptype} 屬性資料已成功抓取並儲存 (共 {len(names)} 筆資料)")
-            return True
-            
-        except Exception as e:
-            print(f"[{crawler_id}] ❌ 爬取 {ptype} 屬性時發生錯誤 (嘗試 {attempt + 1}/{max_retries}): {e}")
-            if attempt == max_retries - 1:
-                print(f"[{crawler_id}] {ptype} 屬性爬取失敗，已達最大重試次數")
-            else:
-                time.sleep(3)  # 等待後重試
-        finally:
-            # 清理資源
-            if driver or user_data_dir:
-                cleanup_crawler_resources(driver, user_data_dir, crawler_id)
+    # 依失敗原因只重試需要的階段：重新提取、重新載入或重新取得分頁
+    print(f"[{crawler_id}] 開始爬取 {ptype} 屬性資料")
+    steps = [("load", load_page), ("wait", wait_page), ("extract", extract_page)]
     
-    return False
+    def attempt(cancel, claim):
+        def store(result):
+            # 對沖嘗試中只有先取得結果的一方會寫入
+            claim()
+            save_type_csv(task, result)
+        return run_with_retries(task, lambda: open_task_tab(task, cancel), steps, store, cancel=cancel)
+    
+    # 超過以往耗時的 p95 仍未完成時，平行執行第二次嘗試
+    return run_hedged(task, attempt)
 
 def main():
     """主程式 - 多個爬蟲並行執行"""
+    start_time = time.time()
     print("=" * 80)
     print(f"啟動 {len(POKEMON_TYPES)} 個並行爬蟲，爬取所有寶可夢屬性的PVE資料")
     print("=" * 80)
+    report_startup(IMPORT_START)
     
     # 預先清理可能殘留的 Chrome 進程
     print("清理殘留的 Chrome 進程...")
     kill_chrome_processes()
     
-    # 預先安裝 ChromeDriver（避免競爭）
-    print("預先準備 ChromeDriver...")
-    get_driver_path()
+    # 預先安裝 ChromeDriver（避免競爭）；CDP 引擎不需要 ChromeDriver
+    if CRAWLER_ENGINE != "cdp":
+        print("預先準備 ChromeDriver...")
+        get_driver_path()
     
     # 顯示任務分配
     print("\n任務分配:")
     for i, task in enumerate(CRAWLER_TASKS):
-        print(f"  {task['crawler_id']} -> {task['type']} 屬性 (端口: {task['debug_port']})")
+        print(f"  {task['crawler_id']} -> {task['type']} 屬性")
         if (i + 1) % 3 == 0:  # 每3個換行
             print()
+    print(f"瀏覽器池: 最多 {BROWSER_POOL_SIZE} 個 Chrome，每個使用 {BROWSER_MAX_USES} 次後重新啟動")
     
     print(f"\n開始並行執行 {len(CRAWLER_TASKS)} 個爬蟲任務...")
     
-    # 使用線程池執行，每個線程處理一個任務
-    # 固定使用6個同時執行的線程
-    max_workers = 6
-    
-    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PVE-Crawler") as executor:
-        # 提交所有任務
-        futures = {
-            executor.submit(run_crawler, task): task["crawler_id"] 
-            for task in CRAWLER_TASKS
-        }
+    if CRAWLER_ENGINE == "cdp":
+        # 單一事件迴圈同時驅動所有頁面
+        print("使用 CDP 引擎")
+        results = run_with_cdp_engine(CRAWLER_TASKS)
+    else:
+        # 使用線程池執行，每個線程處理一個任務
+        # 線程數與瀏覽器池大小相同，每個線程同時只佔用一個瀏覽器
+        max_workers = BROWSER_POOL_SIZE
+    
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PVE-Crawler") as executor:
+            # 提交所有任務
+            futures = {
+                executor.submit(run_crawler, task): task["crawler_id"] 
+                for task in CRAWLER_TASKS
+            }
         
-        # 等待完成並處理結果
-        results = {}
-        completed_count = 0
+            # 等待完成並處理結果
+            results = {}
+            completed_count = 0
         
-        for future in as_completed(futures):
-            crawler_id = futures[future]
-            try:
-                success = future.result()
-                results[crawler_id] = success
-                completed_count += 1
+            for future in as_completed(futures):
+                crawler_id = futures[future]
+                try:
+                    success = future.result()
+                    results[crawler_id] = success
+                    completed_count += 1
                 
-                if success:
-                    print(f"🎉 {crawler_id} 任務完成 ({completed_count}/{len(CRAWLER_TASKS)})")
-                else:
-                    print(f"⚠️  {crawler_id} 任務失敗 ({completed_count}/{len(CRAWLER_TASKS)})")
-            except Exception as e:
-                print(f"❌ {crawler_id} 執行時發生錯誤: {e}")
-                results[crawler_id] = False
-                completed_count += 1
+                    if success:
+                        print(f"🎉 {crawler_id} 任務完成 ({completed_count}/{len(CRAWLER_TASKS)})")
+                    else:
+                        print(f"⚠️  {crawler_id} 任務失敗 ({completed_count}/{len(CRAWLER_TASKS)})")
+                except Exception as e:
+                    print(f"❌ {crawler_id} 執行時發生錯誤: {e}")
+                    results[crawler_id] = False
+                    completed_count += 1
     
     # 統計結果
     success_count = sum(results.values())
@@ -441,65 +519,48 @@ def main():
     
     # 最終清理
     print("執行最終清理...")
+    close_browser_pool()
     time.sleep(2)
     kill_chrome_processes()
     
     # 合併所有CSV檔案
-    merge_success = merge_csv_files()
+    with telemetry.span("merge", crawler="pve"):
+        merge_success = merge_csv_files()
     
     if merge_success:
         print("\n所有任務完成！合併檔案已儲存到 data/pve.csv")
     else:
         print("\n爬取完成，但合併檔案時發生錯誤")
     
+    # 產生前端使用的 JSON 分片
+    with telemetry.span("publish", crawler="pve"):
+        publish_artifacts()
+    
+    # 輸出監控指標，並保存各任務的耗時供下次計算對沖門檻
+    telemetry.write_metrics("pve", results, start_time)
+    latency_history.save()
+    
     # 可選：推送到 GitHub
     # push_to_github()
 
 def merge_csv_files():
-    """合併所有屬性的CSV檔案成一個總檔案"""
-    print("\n開始合併所有CSV檔案...")
-    
-    all_data = []
-    successful_files = []
-    
-    # 確保 data 資料夾存在
-    if not os.path.exists("data"):
-        os.makedirs("data")
+    """合併所有屬性的資料成一個總檔案（使用記憶體中的結果，本次未爬取的屬性才讀取既有 CSV）"""
+    print("\n開始合併所有屬性資料...")
     
+    type_counts = write_merged_csv()
     for ptype in POKEMON_TYPES:
-        csv_path = f"pve/{ptype}.csv"
-        if os.path.exists(csv_path):
-            try:
-                df = pd.read_csv(csv_path, encoding="utf-8-sig")
-                # 加入屬性欄位
-                df['type'] = ptype
-                # 重新排序欄位: type, rank, name
-                df = df[['type', 'rank', 'name']]
-                all_data.append(df)
-                successful_files.append(ptype)
-                print(f"✅ 已讀取 {ptype} 屬性資料 ({len(df)} 筆)")
-            except Exception as e:
-                print(f"❌ 讀取 {ptype}.csv 時發生錯誤: {e}")
-        else:
-            print(f"⚠️  找不到 {ptype}.csv 檔案")
+        if ptype not in type_counts:
+            print(f"⚠️  找不到 {ptype} 屬性的資料")
     
-    if all_data:
-        # 合併所有資料
-        merged_df = pd.concat(all_data, ignore_index=True)
-        
-        # 儲存合併結果
-        output_path = "data/pve.csv"
-        merged_df.to_csv(output_path, index=False, encoding="utf-8-sig")
-        
+    if type_counts:
         print(f"\n🎉 合併完成！")
-        print(f"📁 輸出檔案: {output_path}")
-        print(f"📊 總筆數: {len(merged_df)} 筆資料")
-        print(f"📋 成功合併的屬性: {len(successful_files)}/{len(POKEMON_TYPES)}")
+        print(f"📁 輸出檔案: {MERGED_CSV_PATH}")
+        print(f"📊 總筆數: {sum(type_counts.values())} 筆資料")
+        print(f"📋 成功合併的屬性: {len(type_counts)}/{len(POKEMON_TYPES)}")
         
         # 顯示每個屬性的資料筆數統計
         print(f"\n各屬性資料統計:")
-        type_counts = merged_df['type'].value_counts().sort_index()
-        for ptype, count in type_counts.items():
+        for ptype, count in sorted(type_counts.items()):
             print(f"  {ptype.ljust(10)}: {count} 筆")
             
         return True
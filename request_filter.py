@@ -0,0 +1,274 @@
+"""
+爬蟲瀏覽器的網路請求過濾
+透過 DevTools protocol 的 Network.setBlockedURLs 擋掉圖片、字型、廣告與追蹤腳本，
+並從 Chrome 的 performance log 統計每個任務實際的請求數、傳輸量與被擋下的請求（依資源類型）
+
+每個任務結束時回報擋下的請求數與估計節省的傳輸量 / 載入時間，
+估計值以同一個網址未過濾時的用量為基準，記錄在 state/network_baseline.json，
+由下面的驗證指令或 CRAWLER_REQUEST_FILTER=0 的執行產生
+
+驗證預設設定是否影響抓取結果：
+    python request_filter.py crawler 0
+    python request_filter.py pve_crawler 0
+會分別在關閉 / 開啟過濾的情況下爬取同一個頁面，比對結果並顯示節省的流量與時間
+"""
+import importlib
+import json
+import os
+import sys
+import threading
+from urllib.parse import urlparse
+
+# 設定 CRAWLER_REQUEST_FILTER=0 可停用過濾
+FILTER_ENABLED = os.environ.get("CRAWLER_REQUEST_FILTER", "1") != "0"
+# 未過濾時各網址的網路用量，用來估計過濾節省的量
+BASELINE_PATH = os.path.join("state", "network_baseline.json")
+
+baseline_lock = threading.Lock()
+
+# setBlockedURLs 只能比對網址，資源類型以副檔名對應
+RESOURCE_TYPE_PATTERNS = {
+    "image": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.avif*"],
+    "font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "media": ["*.mp4*", "*.webm*", "*.mp3*", "*.ogg*"],
+}
+
+# 廣告與追蹤服務，兩個網站共用
+AD_TRACKER_PATTERNS = [
+    "*googletagmanager.com*",
+    "*google-analytics.com*",
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*adservice.google.*",
+    "*amazon-adsystem.com*",
+    "*adnxs.com*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*quantserve.com*",
+    "*scorecardresearch.com*",
+]
+
+# 各網站的預設設定，只保留抓取文字所需的 HTML / CSS / JS
+SITE_PRESETS = {
+    "pvpoketw.com": {
+        "blocked_resource_types": ["image", "font", "media"],
+        "blocked_url_patterns": AD_TRACKER_PATTERNS,
+    },
+    "db.pokemongohub.net": {
+        "blocked_resource_types": ["image", "font", "media"],
+        "blocked_url_patterns": AD_TRACKER_PATTERNS + [
+            "*pubfig*",
+            "*playwire.com*",
+            "*nitropay.com*",
+            "*ezoic*",
+        ],
+    },
+}
+
+
+def enable_network_logging(options):
+    """開啟 Chrome 的 performance log，用於統計網路用量"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def get_preset(url):
+    """依網址的主機名稱取得對應的預設設定，沒有對應時回傳 None"""
+    host = urlparse(url).hostname or ""
+    for site, preset in SITE_PRESETS.items():
+        if host == site or host.endswith("." + site):
+            return preset
+    return None
+
+
+def build_blocked_patterns(preset):
+    """把資源類型與網址清單合併成 setBlockedURLs 使用的格式"""
+    patterns = []
+    for resource_type in preset.get("blocked_resource_types", []):
+        patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+    patterns.extend(preset.get("blocked_url_patterns", []))
+    return patterns
+
+
+def apply_request_filter(driver, url, crawler_id):
+    """在目前分頁套用網址對應的過濾設定，並清空之前累積的網路紀錄"""
+    # 先清空 performance log，讓統計只包含本次任務
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+    preset = get_preset(url)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        patterns = build_blocked_patterns(preset) if (FILTER_ENABLED and preset) else []
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"[{crawler_id}] 套用請求過濾時發生錯誤: {e}")
+        return 0
+
+    if patterns:
+        print(f"[{crawler_id}] 已套用請求過濾 ({len(patterns)} 條規則)")
+    return len(patterns)
+
+
+def new_stats():
+    return {"requests": 0, "bytes": 0, "blocked": 0, "blocked_types": {}, "load_ms": None}
+
+
+def add_network_event(stats, method, params):
+    """把一個 DevTools Network 事件計入統計，Selenium 與 CDP 引擎共用"""
+    if method == "Network.requestWillBeSent":
+        stats["requests"] += 1
+    elif method == "Network.loadingFinished":
+        stats["bytes"] += int(params.get("encodedDataLength", 0))
+    elif method == "Network.loadingFailed" and params.get("blockedReason"):
+        stats["blocked"] += 1
+        resource_type = params.get("type") or "Other"
+        stats["blocked_types"][resource_type] = stats["blocked_types"].get(resource_type, 0) + 1
+
+
+def collect_network_stats(driver):
+    """從 performance log 統計請求數、傳輸位元組、被擋下的請求數與頁面載入時間"""
+    stats = new_stats()
+
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        entries = []
+
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError, TypeError):
+            continue
+        add_network_event(stats, message.get("method"), message.get("params", {}))
+
+    try:
+        stats["load_ms"] = driver.execute_script(
+            "var n = performance.getEntriesByType('navigation')[0];"
+            "return n ? Math.round(n.loadEventEnd || n.duration) : null;"
+        )
+    except Exception:
+        pass
+
+    return stats
+
+
+def format_stats(stats):
+    """把網路統計整理成一行文字"""
+    load = f"{stats['load_ms'] / 1000:.2f} 秒" if stats.get("load_ms") else "未知"
+    return (f"{stats['requests']} 個請求，傳輸 {stats['bytes'] / 1024:.0f} KB，"
+            f"擋下 {stats['blocked']} 個請求，頁面載入 {load}")
+
+
+def load_baselines():
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def record_baseline(url, stats):
+    """記錄網址未過濾時的網路用量"""
+    with baseline_lock:
+        baselines = load_baselines()
+        baselines[url] = {"requests": stats["requests"], "bytes": stats["bytes"], "load_ms": stats.get("load_ms")}
+        os.makedirs(os.path.dirname(BASELINE_PATH) or ".", exist_ok=True)
+        tmp_path = BASELINE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, BASELINE_PATH)
+
+
+def estimate_savings(url, stats):
+    """與未過濾的基準相比估計節省的 (位元組, 毫秒)，沒有基準時回傳 None，無法比較的項目為 None"""
+    with baseline_lock:
+        baseline = load_baselines().get(url)
+    if not baseline:
+        return None
+    saved_ms = None
+    if baseline.get("load_ms") and stats.get("load_ms"):
+        saved_ms = baseline["load_ms"] - stats["load_ms"]
+    return baseline["bytes"] - stats["bytes"], saved_ms
+
+
+def format_savings(url, stats):
+    """擋下的請求（依資源類型）與估計節省量"""
+    blocked_types = stats.get("blocked_types") or {}
+    types = "、".join(f"{name} {count}" for name, count in sorted(blocked_types.items(), key=lambda item: -item[1]))
+    text = f"擋下 {stats['blocked']} 個請求" + (f" ({types})" if types else "")
+    savings = estimate_savings(url, stats)
+    if savings is None:
+        return text + "，尚無未過濾的基準可估計節省量（執行 python request_filter.py 建立）"
+    saved_bytes, saved_ms = savings
+    text += f"，估計節省 {saved_bytes / 1024:.0f} KB"
+    if saved_ms is not None:
+        text += f" / {saved_ms / 1000:.2f} 秒"
+    return text
+
+
+def report_stats(crawler_id, url, stats):
+    """印出本次任務的網路用量；有套用過濾時另外印出擋下的請求與估計節省量，未過濾時記錄為基準"""
+    print(f"[{crawler_id}] 網路用量: {format_stats(stats)}")
+    if not get_preset(url):
+        return
+    if FILTER_ENABLED:
+        print(f"[{crawler_id}] 請求過濾: {format_savings(url, stats)}")
+    else:
+        try:
+            record_baseline(url, stats)
+        except OSError as e:
+            print(f"[{crawler_id}] 記錄網路用量基準時發生錯誤: {e}")
+
+
+def report_network_stats(driver, crawler_id, url):
+    """統計並印出本次任務的網路用量"""
+    stats = collect_network_stats(driver)
+    report_stats(crawler_id, url, stats)
+    return stats
+
+
+def validate_filter(crawler_module, task):
+    """在關閉 / 開啟過濾的情況下各爬一次同一個頁面，確認結果相同並回報節省量"""
+    global FILTER_ENABLED
+    crawler_id = task["crawler_id"]
+    pool = crawler_module.get_browser_pool()
+    runs = {}
+    original = FILTER_ENABLED
+
+    try:
+        for enabled in (False, True):
+            FILTER_ENABLED = enabled
+            with pool.tab(crawler_id) as driver:
+                apply_request_filter(driver, task["url"], crawler_id)
+                result = crawler_module.load_and_extract(driver, task)
+                runs[enabled] = (result, collect_network_stats(driver))
+    finally:
+        FILTER_ENABLED = original
+        crawler_module.close_browser_pool()
+
+    (baseline, baseline_stats), (filtered, filtered_stats) = runs[False], runs[True]
+    identical = baseline == filtered
+    record_baseline(task["url"], baseline_stats)
+
+    print("=" * 60)
+    print(f"[{crawler_id}] 未過濾: {format_stats(baseline_stats)}")
+    print(f"[{crawler_id}] 已過濾: {format_stats(filtered_stats)}")
+    saved_kb = (baseline_stats["bytes"] - filtered_stats["bytes"]) / 1024
+    print(f"[{crawler_id}] 節省傳輸量: {saved_kb:.0f} KB")
+    if baseline_stats["load_ms"] and filtered_stats["load_ms"]:
+        saved_s = (baseline_stats["load_ms"] - filtered_stats["load_ms"]) / 1000
+        print(f"[{crawler_id}] 節省載入時間: {saved_s:.2f} 秒")
+    print(f"[{crawler_id}] 抓取結果{'相同 ✅' if identical else '不同 ❌'}")
+    print("=" * 60)
+    return identical
+
+
+if __name__ == "__main__":
+    module_name = sys.argv[1] if len(sys.argv) > 1 else "crawler"
+    task_index = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    module = importlib.import_module(module_name)
+    ok = validate_filter(module, module.CRAWLER_TASKS[task_index])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,173 @@
+"""
+爬取重試策略
+依失敗原因決定下一次從哪個階段重來，不再每次都重新取得分頁、冷啟動載入頁面：
+  launch      瀏覽器啟動失敗或已崩潰        -> 重新取得分頁（瀏覽器池會重新啟動崩潰的 Chrome）
+  navigation  頁面載入逾時或連線錯誤        -> 在同一個分頁重新載入
+  render      頁面沒有在時間內渲染完成      -> 在同一個頁面繼續等待
+  empty       頁面已載入但沒有提取到資料    -> 只重新提取
+同一原因連續失敗時，表示從該階段重來沒有用，往前升級一個階段（例如提取兩次都是空的就重新載入），
+每次重試前以指數退避加上隨機抖動等待，並受每個任務的時間上限限制
+
+環境變數：
+  CRAWLER_RETRY_ATTEMPTS      每個任務最多嘗試次數，預設 5
+  CRAWLER_RETRY_DEADLINE      每個任務重試的時間上限 (秒)，預設 120
+  CRAWLER_RETRY_BACKOFF_MAX   單次等待上限 (秒)，預設 20
+"""
+import os
+import random
+import time
+from contextlib import ExitStack
+
+import telemetry
+
+RETRY_MAX_ATTEMPTS = int(os.environ.get("CRAWLER_RETRY_ATTEMPTS", "5"))
+RETRY_DEADLINE = float(os.environ.get("CRAWLER_RETRY_DEADLINE", "120"))
+RETRY_BACKOFF_MAX = float(os.environ.get("CRAWLER_RETRY_BACKOFF_MAX", "20"))
+
+# 失敗類型
+LAUNCH = "launch"
+NAVIGATION = "navigation"
+RENDER = "render"
+EMPTY = "empty"
+
+# 爬取階段，依序執行；launch 為取得分頁
+PHASES = ["launch", "load", "wait", "extract"]
+# 各失敗類型第一次重試時開始的階段
+RESTART_PHASE = {LAUNCH: "launch", NAVIGATION: "load", RENDER: "wait", EMPTY: "extract"}
+# 從各階段重試時的基本等待時間 (秒)，越昂貴的階段等越久
+BACKOFF_BASE = {"launch": 2.0, "load": 1.0, "wait": 0.5, "extract": 0.5}
+
+# 表示瀏覽器或分頁已無法使用的錯誤訊息
+BROWSER_LOST_MESSAGES = (
+    "chrome not reachable", "disconnected", "invalid session id", "session deleted",
+    "no such window", "target window already closed", "connection refused", "browser has closed",
+)
+
+
+class TaskCancelled(Exception):
+    """對沖嘗試中另一方已完成"""
+
+
+class CrawlFailure(Exception):
+    """爬取步驟回報的失敗，kind 為失敗類型"""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def classify_failure(error):
+    """把例外歸類為失敗類型"""
+    if isinstance(error, CrawlFailure):
+        return error.kind
+    message = str(error).lower()
+    if any(text in message for text in BROWSER_LOST_MESSAGES):
+        return LAUNCH
+    if type(error).__name__ in ("NoSuchElementException", "StaleElementReferenceException"):
+        return RENDER
+    # 逾時與其他 WebDriver 錯誤都先以重新載入處理
+    return NAVIGATION
+
+
+def next_restart_phase(kind, previous_kind=None, previous_phase=None):
+    """決定下一次重試開始的階段，同一原因連續失敗時往前升級一個階段"""
+    phase = RESTART_PHASE[kind]
+    if kind == previous_kind and previous_phase is not None:
+        index = min(PHASES.index(phase), PHASES.index(previous_phase) - 1)
+        phase = PHASES[max(0, index)]
+    return phase
+
+
+def backoff_delay(phase, retry_index):
+    """指數退避加上隨機抖動：在 [d/2, d] 之間取值，d = 基本等待 * 2^retry_index"""
+    delay = min(RETRY_BACKOFF_MAX, BACKOFF_BASE.get(phase, 1.0) * (2 ** retry_index))
+    return random.uniform(delay / 2, delay)
+
+
+def release_tab(tab, error=None):
+    """歸還分頁；帶入錯誤時讓瀏覽器池檢查瀏覽器是否已崩潰"""
+    if tab is None:
+        return
+    if error is not None:
+        tab.__exit__(type(error), error, error.__traceback__)
+    else:
+        tab.close()
+
+
+def run_with_retries(task, open_tab, steps, store, max_attempts=None, deadline=None, cancel=None):
+    """
+    執行爬取步驟並依失敗原因重試，回傳是否成功
+    open_tab(): 回傳取得分頁的 context manager，進入時得到 driver
+    steps: [(階段, fn(driver, task, state)), ...]，依 load / wait / extract 的順序，
+           最後一個步驟的回傳值交給 store(結果) 儲存；
+           state 在同一個分頁的重試之間保留（例如等待步驟找到的元素）
+    步驟失敗時拋出 CrawlFailure 或 selenium 的例外
+    cancel: threading.Event，設定後在下一個步驟前停止並回傳 False（對沖嘗試中另一方已完成）
+    """
+    crawler_id = task["crawler_id"]
+    max_attempts = max_attempts or RETRY_MAX_ATTEMPTS
+    deadline_at = time.monotonic() + (deadline or RETRY_DEADLINE)
+
+    tab = None
+    driver = None
+    state = {}
+    phase = "launch"
+    previous_kind = None
+    try:
+        for attempt in range(1, max_attempts + 1):
+            with telemetry.span("attempt", **telemetry.task_labels(task, attempt), restart_from=phase) as attempt_span:
+                print(f"[{crawler_id}] 開始爬取 (嘗試 {attempt}/{max_attempts}，從 {phase} 階段開始)")
+                try:
+                    if phase == "launch":
+                        release_tab(tab)
+                        tab, driver, state = None, None, {}
+                        stack = ExitStack()
+                        driver = stack.enter_context(open_tab())
+                        tab = stack
+                    result = None
+                    for step_phase, step in steps:
+                        if PHASES.index(step_phase) >= PHASES.index(phase):
+                            if cancel is not None and cancel.is_set():
+                                raise TaskCancelled()
+                            result = step(driver, task, state)
+                except TaskCancelled:
+                    attempt_span.set(outcome="cancelled")
+                    print(f"[{crawler_id}] 另一個嘗試已完成，停止爬取")
+                    return False
+                except Exception as e:
+                    # 取得分頁時失敗一律視為瀏覽器啟動失敗
+                    kind = LAUNCH if driver is None else classify_failure(e)
+                    attempt_span.set(outcome=kind, error=str(e)[:200])
+                    print(f"[{crawler_id}] ❌ 嘗試 {attempt}/{max_attempts} 失敗 ({kind}): {e}")
+                    if kind == LAUNCH:
+                        release_tab(tab, e)
+                        tab, driver = None, None
+                else:
+                    try:
+                        store(result)
+                    except TaskCancelled:
+                        attempt_span.set(outcome="cancelled")
+                        print(f"[{crawler_id}] 另一個嘗試已先寫入結果")
+                        return False
+                    return True
+
+            if attempt == max_attempts:
+                print(f"[{crawler_id}] 爬取失敗，已達最大嘗試次數")
+                break
+
+            phase = next_restart_phase(kind, previous_kind, phase)
+            previous_kind = kind
+            delay = backoff_delay(phase, attempt - 1)
+            if time.monotonic() + delay > deadline_at:
+                print(f"[{crawler_id}] 爬取失敗，已超過重試時間上限")
+                break
+            print(f"[{crawler_id}] {delay:.1f} 秒後從 {phase} 階段重試")
+            if cancel is not None:
+                if cancel.wait(delay):
+                    print(f"[{crawler_id}] 另一個嘗試已完成，停止重試")
+                    return False
+            else:
+                time.sleep(delay)
+        return False
+    finally:
+        release_tab(tab)
@@ -0,0 +1,294 @@
+"""
+PvP 與 PvE 爬蟲的統一排程器
+把 crawler.py 與 pve_crawler.py 的 CRAWLER_TASKS 合併在同一個線程池執行，
+並依照 CPU / 記憶體餘裕與任務耗時動態調整同時執行的數量
+
+使用方式：python scheduler.py
+"""
+import time
+IMPORT_START = time.time()
+
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import psutil
+
+import crawler
+import pve_crawler
+import cdp_engine
+import chrome_driver
+from browser_pool import BrowserPool
+from generate_update_log import generate_update_log
+from publish_artifacts import publish_artifacts
+from startup_report import report_startup
+import telemetry
+import hedging
+from hedging import latency_history
+
+# 同時執行數量的上下限
+MIN_WORKERS = 1
+MAX_WORKERS = 9
+
+# 資源門檻：CPU 使用率超過上限或可用記憶體不足時降低並行數
+CPU_HIGH_PERCENT = 85
+CPU_LOW_PERCENT = 60
+# 每個 headless Chrome 大約需要的記憶體，另外保留一部分給系統
+BROWSER_MEMORY_MB = 300
+RESERVED_MEMORY_MB = 512
+# 同類任務最近的平均耗時超過基準的倍數時，視為資源爭用，不再增加並行數
+# 基準為同類任務在最近幾次之前的平均耗時（滾動視窗），只計算實際使用瀏覽器的任務
+LATENCY_SLOWDOWN_RATIO = 1.5
+RECENT_WINDOW = 3
+BASELINE_WINDOW = 10
+# 每隔幾秒重新評估一次
+ADJUST_INTERVAL = 2
+
+
+class AdaptiveLimiter:
+    """可在執行期間調整上限的並行數控制"""
+
+    def __init__(self, min_workers=MIN_WORKERS, max_workers=MAX_WORKERS, initial=None):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = initial or max(min_workers, min(max_workers, psutil.cpu_count() or 1))
+        self.active = 0
+        # 任務類型 (模組名稱) -> 最近的耗時
+        self.durations = {}
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    def try_acquire(self):
+        """不等待的 acquire，已達上限時回傳 False（對沖嘗試使用）"""
+        with self._condition:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self, duration=None, kind="default"):
+        """duration 為任務耗時，None 表示不列入耗時統計（例如沒有使用瀏覽器的任務）"""
+        with self._condition:
+            self.active -= 1
+            if duration is not None:
+                history = self.durations.setdefault(kind, [])
+                history.append(duration)
+                del history[:-(RECENT_WINDOW + BASELINE_WINDOW)]
+            self._condition.notify_all()
+
+    def latency_ratio(self):
+        """各類任務最近的平均耗時相對於同類先前耗時的最大倍數，樣本不足時回傳 None"""
+        ratios = []
+        with self._condition:
+            for history in self.durations.values():
+                recent, baseline = history[-RECENT_WINDOW:], history[:-RECENT_WINDOW]
+                if len(recent) < RECENT_WINDOW or len(baseline) < RECENT_WINDOW:
+                    continue
+                ratios.append((sum(recent) / len(recent)) / max(sum(baseline) / len(baseline), 1e-6))
+        return max(ratios) if ratios else None
+
+    def adjust(self):
+        """依照資源使用率與任務耗時調整並行上限"""
+        cpu = psutil.cpu_percent(interval=None)
+        available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        ratio = self.latency_ratio()
+
+        with self._condition:
+            old_limit = self.limit
+            memory_room = (available_mb - RESERVED_MEMORY_MB) // BROWSER_MEMORY_MB
+            slowing = ratio is not None and ratio > LATENCY_SLOWDOWN_RATIO
+
+            if cpu > CPU_HIGH_PERCENT or memory_room < 1:
+                self.limit = max(self.min_workers, self.limit - 1)
+            elif slowing:
+                pass
+            elif cpu < CPU_LOW_PERCENT and memory_room > self.active:
+                self.limit = min(self.max_workers, self.limit + 1)
+
+            if self.limit != old_limit:
+                print(f"⚙️  並行數 {old_limit} -> {self.limit} "
+                      f"(CPU {cpu:.0f}%, 可用記憶體 {available_mb:.0f} MB)")
+                self._condition.notify_all()
+
+
+def build_jobs():
+    """合併兩個爬蟲的任務，每個任務標記所屬模組"""
+    jobs = [(crawler, task) for task in crawler.CRAWLER_TASKS]
+    jobs += [(pve_crawler, task) for task in pve_crawler.CRAWLER_TASKS]
+    return jobs
+
+
+def install_shared_browser_pool(size):
+    """
+    讓兩個爬蟲共用同一個瀏覽器池，瀏覽器以 chrome_driver 中兩個爬蟲共用的參數啟動
+    單獨執行 crawler.py / pve_crawler.py 時不經過這裡，各自使用自己的瀏覽器池
+    """
+    pool = BrowserPool(
+        chrome_driver.setup_driver, chrome_driver.cleanup_crawler_resources,
+        size=size, max_uses=crawler.BROWSER_MAX_USES,
+        name="Shared-Browser"
+    )
+    crawler.browser_pool = pool
+    pve_crawler.browser_pool = pool
+    return pool
+
+
+def close_shared_browser_pool(wait=True):
+    crawler.close_browser_pool(wait)
+    pve_crawler.browser_pool = None
+
+
+def run_job(limiter, module, task):
+    """
+    在並行數限制下執行單一任務
+    直接抓取或來源未變更的任務沒有使用瀏覽器，耗時不列入統計，避免拉低基準
+    """
+    limiter.acquire()
+    start_time = time.time()
+    pool = module.browser_pool
+    tabs_before = pool.tabs_opened(task["crawler_id"]) if pool else 0
+    used_browser = False
+    try:
+        result = module.run_crawler(task)
+        # 瀏覽器池可能在任務中才建立
+        pool = pool or module.browser_pool
+        used_browser = pool is not None and pool.tabs_opened(task["crawler_id"]) > tabs_before
+        return result
+    finally:
+        limiter.release(time.time() - start_time if used_browser else None, module.__name__)
+
+
+def monitor(limiter, stop_event):
+    """定期調整並行數，直到所有任務結束"""
+    psutil.cpu_percent(interval=None)
+    while not stop_event.wait(ADJUST_INTERVAL):
+        limiter.adjust()
+
+
+def run_with_threads(jobs, keep_pool=False):
+    """
+    以自適應並行數的線程池執行所有任務
+    keep_pool=True 時使用已安裝的共用瀏覽器池，結束後不關閉（常駐模式讓瀏覽器保持開啟）
+    """
+    limiter = AdaptiveLimiter()
+    print(f"初始並行數: {limiter.limit} (上限 {limiter.max_workers})")
+    if not keep_pool:
+        install_shared_browser_pool(limiter.max_workers)
+    # 對沖嘗試同樣佔用並行數
+    hedging.set_concurrency_limiter(limiter)
+
+    stop_event = threading.Event()
+    monitor_thread = threading.Thread(target=monitor, args=(limiter, stop_event), daemon=True)
+    monitor_thread.start()
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=limiter.max_workers, thread_name_prefix="Scheduler") as executor:
+            futures = {
+                executor.submit(run_job, limiter, module, task): task["crawler_id"]
+                for module, task in jobs
+            }
+            for future in as_completed(futures):
+                crawler_id = futures[future]
+                try:
+                    results[crawler_id] = future.result()
+                except Exception as e:
+                    print(f"❌ {crawler_id} 執行時發生錯誤: {e}")
+                    results[crawler_id] = False
+                status = "🎉 任務完成" if results[crawler_id] else "⚠️  任務失敗"
+                print(f"{status}: {crawler_id} ({len(results)}/{len(jobs)})")
+    finally:
+        stop_event.set()
+        hedging.set_concurrency_limiter(None)
+        if not keep_pool:
+            close_shared_browser_pool()
+    return results
+
+
+def run_with_cdp(jobs):
+    """以單一 CDP 事件迴圈執行所有需要瀏覽器的任務"""
+    results = {}
+    pending = []
+    for module, task in jobs:
+        if module.is_task_unchanged(task) or (module is crawler and crawler.try_direct_fetch(task)):
+            results[task["crawler_id"]] = True
+        else:
+            pending.append((module, task))
+
+    if not pending:
+        return results
+
+    modules = {task["crawler_id"]: module for module, task in pending}
+
+    async def crawl_page(page, task):
+        return await modules[task["crawler_id"]].crawl_page_cdp(page, task)
+
+    page_results = cdp_engine.run_tasks([task for _, task in pending], crawl_page)
+    for module, task in pending:
+        result = page_results.get(task["crawler_id"])
+        if result:
+            with telemetry.labels(**telemetry.task_labels(task)):
+                if module is crawler:
+                    crawler.store_ranking(task, *result, "CDP")
+                else:
+                    pve_crawler.save_type_csv(task, result)
+        results[task["crawler_id"]] = bool(result)
+    return results
+
+
+def signal_handler(sig, frame):
+    """處理中斷信號，確保清理資源"""
+    print("\n收到中斷信號，正在清理資源...")
+    close_shared_browser_pool(wait=False)
+    crawler.kill_chrome_processes()
+    pve_crawler.kill_chrome_processes()
+    sys.exit(0)
+
+
+def main():
+    """主程式 - 在同一個排程中完成 PvP 與 PvE 的更新"""
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    jobs = build_jobs()
+    start_time = time.time()
+
+    print("=" * 80)
+    print(f"統一排程: {len(crawler.CRAWLER_TASKS)} 個 PvP 任務 + {len(pve_crawler.CRAWLER_TASKS)} 個 PvE 任務")
+    print("=" * 80)
+    report_startup(IMPORT_START)
+
+    if cdp_engine.CRAWLER_ENGINE == "cdp":
+        print("使用 CDP 引擎")
+        results = run_with_cdp(jobs)
+    else:
+        results = run_with_threads(jobs)
+
+    success_count = sum(1 for success in results.values() if success)
+    print("\n" + "=" * 80)
+    print(f"總計: {success_count}/{len(jobs)} 個任務成功完成，耗時 {time.time() - start_time:.1f} 秒")
+    print("=" * 80)
+
+    crawler.kill_chrome_processes()
+    pve_crawler.kill_chrome_processes()
+
+    # 合併 PvE 資料、產生更新日誌，最後產生前端分片與壓縮檔
+    with telemetry.span("merge", crawler="pve"):
+        pve_crawler.merge_csv_files()
+    generate_update_log()
+    with telemetry.span("publish"):
+        publish_artifacts()
+
+    # 輸出監控指標，並保存各任務的耗時供下次計算對沖門檻
+    telemetry.write_metrics("scheduler", results, start_time)
+    latency_history.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,54 @@ const TYPE_CONFIG = {
     fairy: { name: '妖精', color: '#EE99AC', icon: '🧚' }
 };
 
+// 資料來源：後端產生的 JSON 分片，每次只下載需要的那一份
+const DATA_BASE_URL = 'https://raw.githubusercontent.com/mikaiyen/PVpokeCrawler/main/data/';
+let shardManifestPromise = null;
+const shardCache = {};
+
+// 載入分片清單（每次開啟頁面只下載一次）
+function fetchShardManifest() {
+    if (!shardManifestPromise) {
+        shardManifestPromise = fetch(`${DATA_BASE_URL}shards/manifest.json`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`manifest.json 載入失敗 (${response.status})`);
+                }
+                return response.json();
+            })
+            .catch(error => {
+                shardManifestPromise = null;
+                throw error;
+            });
+    }
+    return shardManifestPromise;
+}
+
+// 載入單一分片，例如 "pvp/1500" 或 "pve/fire"；同一個分片只下載一次
+function fetchShard(key) {
+    if (!shardCache[key]) {
+        shardCache[key] = fetchShardManifest()
+            .then(manifest => {
+                const entry = manifest.shards[key];
+                if (!entry) {
+                    return null;
+                }
+                // 以內容雜湊作為版本參數，資料更新後不會讀到快取的舊檔
+                return fetch(`${DATA_BASE_URL}shards/${entry.path}?v=${entry.sha256}`).then(response => {
+                    if (!response.ok) {
+                        throw new Error(`${entry.path} 載入失敗 (${response.status})`);
+                    }
+                    return response.json();
+                });
+            })
+            .catch(error => {
+                delete shardCache[key];
+                throw error;
+            });
+    }
+    return shardCache[key];
+}
+
 // 分頁切換功能
 function showTab(tabName) {
     // 隱藏所有分頁內容
@@ -125,43 +173,12 @@ async function fetchSingleTypeData(type) {
     copyBtn.disabled = true;
     
     try {
-        // 載入 PVE CSV 資料（如果還沒載入）
-        if (!window.pveData) {
-            const response = await fetch('https://raw.githubusercontent.com/mikaiyen/PVpokeCrawler/main/data/pve.csv');
-            const csvText = await response.text();
-            const rows = csvText.trim().split('\n').slice(1); // 移除標題行
-            
-            // 解析 CSV 資料並存到全域變數
-            window.pveData = {};
-            rows.forEach(row => {
-                const [pokemonType, rank, name] = row.split(',');
-                if (!window.pveData[pokemonType]) {
-                    window.pveData[pokemonType] = [];
-                }
-                window.pveData[pokemonType].push({ 
-                    rank: parseInt(rank), 
-                    name: name.trim() 
-                });
-            });
-        }
+        // 只載入該屬性的分片（名稱已依排名排序並去除重複）
+        const shard = await fetchShard(`pve/${type}`);
         
         // 取得該屬性的前N名Pokemon
-        if (window.pveData[type]) {
-            const topPokemon = window.pveData[type]
-                .sort((a, b) => a.rank - b.rank)
-                .slice(0, count)
-                .map(p => p.name);
-            
-            // 去除重複的Pokemon名稱，保持排名順序
-            const uniquePokemon = [];
-            const seenNames = new Set();
-            
-            topPokemon.forEach(name => {
-                if (!seenNames.has(name)) {
-                    seenNames.add(name);
-                    uniquePokemon.push(name);
-                }
-            });
+        if (shard) {
+            const uniquePokemon = shard.names.filter((name, i) => shard.ranks[i] <= count);
             
             setTimeout(() => {
                 resultDiv.className = 'pve-result';
@@ -213,6 +230,38 @@ function createParticles() {
     }
 }
 
+// 從前 N 名索引取出某聯盟排名在 limit 以內的寶可夢
+// ranks 為遞增排序，以二分搜尋找出前綴長度後只走訪結果本身
+function addTopN(index, league, limit, xlPokemon, nonXlPokemon) {
+    const entry = index.leagues[league];
+    if (!entry || !(limit > 0)) {
+        return;
+    }
+    // 排名以差值儲存，第一次使用時累加還原並保留在快取的索引中
+    if (!entry.ranks) {
+        let rank = 0;
+        entry.ranks = entry.rank_gaps.map(gap => (rank += gap));
+    }
+    let low = 0;
+    let high = entry.ranks.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (entry.ranks[mid] <= limit) {
+            low = mid + 1;
+        } else {
+            high = mid;
+        }
+    }
+    for (let i = 0; i < low; i++) {
+        const name = index.names[entry.ids[i]];
+        if (entry.xl[i] === '1') {
+            xlPokemon.add(name);
+        } else {
+            nonXlPokemon.add(name);
+        }
+    }
+}
+
 // 主要數據載入函數
 async function fetchPokemonData() {
     fetchLastUpdatedTime();
@@ -222,10 +271,10 @@ async function fetchPokemonData() {
     const num2500 = document.getElementById("num2500").value;
     const num10000 = document.getElementById("num10000").value;
     
-    const fileConfigs = [
-        { fileName: "pvpoke_1500.csv", numRankings: num1500, league: "Great League (1500)" },
-        { fileName: "pvpoke_2500.csv", numRankings: num2500, league: "Ultra League (2500)" },
-        { fileName: "pvpoke_10000.csv", numRankings: num10000, league: "Master League (10000)" }
+    const leagueConfigs = [
+        { key: "1500", numRankings: num1500, league: "Great League (1500)" },
+        { key: "2500", numRankings: num2500, league: "Ultra League (2500)" },
+        { key: "10000", numRankings: num10000, league: "Master League (10000)" }
     ];
     
     const xlPokemon = new Set();
@@ -246,25 +295,13 @@ async function fetchPokemonData() {
     loadBtn.innerHTML = '<span>⏳ 載入中...</span>';
 
     try {
-        // 載入並處理每個CSV文件
-        for (const config of fileConfigs) {
-            console.log(`正在載入 ${config.league}: 前 ${config.numRankings} 名`);
-            
-            const response = await fetch(`https://raw.githubusercontent.com/mikaiyen/PVpokeCrawler/main/data/${config.fileName}`);
-            const csvText = await response.text();
-            const rows = csvText.trim().split('\n').slice(1);
-
-            // 根據設定的數量取得對應筆數的資料
-            rows.slice(0, parseInt(config.numRankings)).forEach(row => {
-                const [name, xl] = row.split(',');
-                if (name && name.trim()) {  // 確保有有效的名稱
-                    if (xl === '1') {
-                        xlPokemon.add(name.trim());
-                    } else {
-                        nonXlPokemon.add(name.trim());
-                    }
-                }
-            });
+        // 載入前 N 名索引（三個聯盟共用一個檔案），不需要解析完整排名
+        const index = await fetchShard("pvp/index");
+        if (index) {
+            for (const config of leagueConfigs) {
+                console.log(`正在載入 ${config.league}: 前 ${config.numRankings} 名`);
+                addTopN(index, config.key, parseInt(config.numRankings), xlPokemon, nonXlPokemon);
+            }
         }
 
         // 動畫顯示結果
@@ -319,7 +356,7 @@ async function fetchLastUpdatedTime() {
     
     try {
         // 優先從 update_log.json 讀取
-        const response = await fetch("https://raw.githubusercontent.com/mikaiyen/PVpokeCrawler/main/data/update_log.json");
+        const response = await fetch(`${DATA_BASE_URL}update_log.json`);
         
         if (response.ok) {
             const logData = await response.json();
@@ -0,0 +1,31 @@
+"""
+啟動耗時報告
+記錄從爬蟲模組開始匯入到 main() 開始執行的時間、已載入的重量級套件與記憶體用量，
+用來確認 selenium / pandas 等套件只在真正需要時才載入
+（完整的匯入明細可用 python -X importtime crawler.py 查看）
+"""
+import sys
+import time
+
+HEAVY_MODULES = ["selenium", "webdriver_manager", "pandas", "git", "psutil", "websockets"]
+
+
+def peak_memory_mb():
+    """目前程序的最高常駐記憶體 (MB)，Windows 上無法取得時回傳 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的單位是 bytes，Linux 是 KB
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def report_startup(import_start):
+    """印出啟動耗時報告"""
+    elapsed = time.time() - import_start
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    memory = peak_memory_mb()
+    memory_text = f"，記憶體 {memory:.0f} MB" if memory is not None else ""
+    print(f"⏱️  啟動耗時 {elapsed:.2f} 秒{memory_text}，"
+          f"已載入的套件: {', '.join(loaded) if loaded else '無'}")
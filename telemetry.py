@@ -0,0 +1,197 @@
+"""
+結構化的階段計時
+每個任務每次嘗試的各個階段 (launch / load / wait / extract / write ...) 各記錄一個 span，
+包含任務、嘗試次數、元素數量、寫入大小與結果，以 JSON lines 追加寫入 CRAWLER_SPANS_PATH，
+main 結束時再輸出 Prometheus textfile 格式的統計，供 node_exporter 的 textfile collector 收集
+
+span 可以巢狀使用，內層自動沿用外層的 crawler / task / attempt（以 contextvars 傳遞，
+線程與 asyncio 任務各自獨立）：
+
+    with telemetry.span("attempt", **telemetry.task_labels(task, attempt)) as attempt_span:
+        with telemetry.span("wait") as wait_span:
+            ...
+            wait_span.set(count=120)
+        attempt_span.set(outcome="empty")
+
+環境變數：
+  CRAWLER_TELEMETRY=0        停用
+  CRAWLER_SPANS_PATH         span 的 JSON lines 檔案，預設 logs/spans.jsonl
+  CRAWLER_METRICS_DIR        Prometheus textfile 輸出資料夾，預設 logs（檔名為 pvpoke_<執行名稱>.prom）
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from output_writer import atomic_write_bytes
+
+TELEMETRY_ENABLED = os.environ.get("CRAWLER_TELEMETRY", "1") != "0"
+SPANS_PATH = os.environ.get("CRAWLER_SPANS_PATH", os.path.join("logs", "spans.jsonl"))
+METRICS_DIR = os.environ.get("CRAWLER_METRICS_DIR", "logs")
+
+METRIC_PREFIX = "pvpoke_crawler"
+# 階段耗時的 histogram 區間 (秒)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+# 內層 span 會沿用的欄位
+CONTEXT_KEYS = ("crawler", "task", "attempt")
+
+_context = contextvars.ContextVar("telemetry_context", default={})
+stats_lock = threading.Lock()
+# (crawler, phase, outcome) -> {"count", "sum", "buckets", "items", "bytes"}
+phase_stats = {}
+
+
+class Span:
+    """單一階段的記錄，執行中可用 set() 補上元素數量、寫入大小或結果"""
+
+    def __init__(self, record):
+        self.record = record
+
+    def set(self, **attrs):
+        self.record.update(attrs)
+
+
+def task_labels(task, attempt=None):
+    """由任務設定產生 span 欄位，PvP 任務有 league，PvE 任務有 type"""
+    labels = {"crawler": "pvp" if "league" in task else "pve", "task": task["crawler_id"]}
+    if attempt is not None:
+        labels["attempt"] = attempt
+    return labels
+
+
+@contextmanager
+def labels(**attrs):
+    """只設定內層 span 沿用的欄位，不記錄階段（例如在爬取結束後才寫檔的流程）"""
+    token = _context.set({**_context.get(), **attrs})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@contextmanager
+def span(phase, **attrs):
+    """記錄一個階段；區塊內發生例外時結果為 error 並繼續拋出"""
+    if not TELEMETRY_ENABLED:
+        yield Span({})
+        return
+
+    parent = _context.get()
+    record = {**parent, **attrs, "phase": phase}
+    token = _context.set({key: record[key] for key in CONTEXT_KEYS if key in record})
+    current = Span(record)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        record.setdefault("outcome", "error")
+        record.setdefault("error", f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        _context.reset(token)
+        record.setdefault("outcome", "ok")
+        record["start"] = datetime.fromtimestamp(started_at).isoformat(timespec="milliseconds")
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        finish_span(record)
+
+
+def finish_span(record):
+    """累計統計並追加寫入 JSON lines"""
+    key = (record.get("crawler", ""), record["phase"], str(record["outcome"]))
+    seconds = record["duration_ms"] / 1000
+    with stats_lock:
+        stats = phase_stats.setdefault(key, {
+            "count": 0, "sum": 0.0, "buckets": [0] * len(DURATION_BUCKETS), "items": 0, "bytes": 0
+        })
+        stats["count"] += 1
+        stats["sum"] += seconds
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+        if isinstance(record.get("count"), int):
+            stats["items"] += record["count"]
+        if isinstance(record.get("bytes"), int):
+            stats["bytes"] += record["bytes"]
+
+        if SPANS_PATH:
+            try:
+                directory = os.path.dirname(SPANS_PATH)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(SPANS_PATH, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                print(f"⚠️  無法寫入 span 記錄: {e}")
+
+
+def format_labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_metrics(runner, results, started_at):
+    """把本次執行累計的統計轉成 Prometheus textfile 格式"""
+    lines = []
+
+    def metric(name, metric_type, help_text):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+    with stats_lock:
+        snapshot = sorted(phase_stats.items())
+
+    metric("phase_duration_seconds", "histogram", "Duration of each crawl phase in the last run.")
+    for (crawler, phase, outcome), stats in snapshot:
+        labels = {"runner": runner, "crawler": crawler, "phase": phase, "outcome": outcome}
+        for bound, count in zip(DURATION_BUCKETS, stats["buckets"]):
+            lines.append(f"{METRIC_PREFIX}_phase_duration_seconds_bucket{format_labels(**labels, le=bound)} {count}")
+        lines.append(f"{METRIC_PREFIX}_phase_duration_seconds_bucket{format_labels(**labels, le='+Inf')} {stats['count']}")
+        lines.append(f"{METRIC_PREFIX}_phase_duration_seconds_sum{format_labels(**labels)} {stats['sum']:.6f}")
+        lines.append(f"{METRIC_PREFIX}_phase_duration_seconds_count{format_labels(**labels)} {stats['count']}")
+
+    metric("phase_items", "gauge", "Elements found or rows written per phase in the last run.")
+    for (crawler, phase, outcome), stats in snapshot:
+        if stats["items"]:
+            labels = format_labels(runner=runner, crawler=crawler, phase=phase, outcome=outcome)
+            lines.append(f"{METRIC_PREFIX}_phase_items{labels} {stats['items']}")
+
+    metric("bytes_written", "gauge", "Bytes written to output files in the last run.")
+    bytes_by_crawler = {}
+    for (crawler, _, _), stats in snapshot:
+        bytes_by_crawler[crawler] = bytes_by_crawler.get(crawler, 0) + stats["bytes"]
+    for crawler, size in sorted(bytes_by_crawler.items()):
+        lines.append(f"{METRIC_PREFIX}_bytes_written{format_labels(runner=runner, crawler=crawler)} {size}")
+
+    success_count = sum(1 for success in results.values() if success)
+    metric("tasks", "gauge", "Tasks by result in the last run.")
+    lines.append(f"{METRIC_PREFIX}_tasks{format_labels(runner=runner, result='success')} {success_count}")
+    lines.append(f"{METRIC_PREFIX}_tasks{format_labels(runner=runner, result='failure')} {len(results) - success_count}")
+
+    metric("run_duration_seconds", "gauge", "Wall time of the last run.")
+    lines.append(f"{METRIC_PREFIX}_run_duration_seconds{format_labels(runner=runner)} {time.time() - started_at:.3f}")
+    metric("last_run_timestamp_seconds", "gauge", "Unix time when the last run finished.")
+    lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds{format_labels(runner=runner)} {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(runner, results, started_at):
+    """
+    在 main 結束時輸出 Prometheus textfile，回傳檔案路徑
+    runner 為執行名稱 (pvp / pve / scheduler)，分別寫到不同檔案，彼此不會覆蓋
+    """
+    if not (TELEMETRY_ENABLED and METRICS_DIR):
+        return None
+    path = os.path.join(METRICS_DIR, f"pvpoke_{runner}.prom")
+    try:
+        # textfile collector 要求原子替換，避免讀到寫到一半的檔案
+        atomic_write_bytes(path, render_metrics(runner, results, started_at).encode("utf-8"))
+    except Exception as e:
+        print(f"⚠️  無法寫入監控指標: {e}")
+        return None
+    print(f"📈 監控指標已寫入 {path}，階段記錄: {SPANS_PATH}")
+    return path
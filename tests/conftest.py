@@ -0,0 +1,93 @@
+"""
+測試共用設定
+以 benchmark/fixture_server.py 作為本機的 PvPoke / Pokemon GO Hub 替身，不需要連網也不需要 Chrome
+"""
+import csv
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmark"))
+sys.path.insert(0, REPO_DIR)
+
+# 模組匯入時就會讀取的設定：不寫 span / 排名歷史，也不做對沖；任務網址指向不存在的位址，避免意外連網
+os.environ["CRAWLER_TELEMETRY"] = "0"
+os.environ["CRAWLER_HISTORY"] = "0"
+os.environ["CRAWLER_HEDGE"] = "0"
+os.environ["PVPOKE_BASE_URL"] = "http://127.0.0.1:9"
+os.environ["POKEMONGOHUB_BASE_URL"] = "http://127.0.0.1:9"
+
+LEAGUES = ["1500", "2500", "10000"]
+# 直接抓取至少需要 DIRECT_FETCH_MIN_ROWS 筆
+FIXTURE_ROWS = 60
+
+
+def write_league_csvs(data_dir, prefix, rows=FIXTURE_ROWS):
+    """寫出三個聯盟的排名 CSV，名稱為 <prefix><聯盟>x<序號>，每三隻有一隻需要 XL，回傳 {聯盟: 名稱}"""
+    os.makedirs(data_dir, exist_ok=True)
+    names_by_league = {}
+    for league in LEAGUES:
+        names = [f"{prefix}{league}x{i}" for i in range(rows)]
+        with open(os.path.join(data_dir, f"pvpoke_{league}.csv"), "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Pokemon", "XL"])
+            writer.writerows([name, 1 if i % 3 == 0 else 0] for i, name in enumerate(names))
+        names_by_league[league] = names
+    return names_by_league
+
+
+def read_column(path, column):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        index = columns.index(column)
+        return [row[index] for row in reader]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """爬蟲的輸出都寫在臨時資料夾"""
+    work = tmp_path / "work"
+    (work / "data").mkdir(parents=True)
+    monkeypatch.chdir(work)
+    return work
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    """每個測試使用新的變更偵測狀態"""
+    import change_detection
+    import crawler
+    import pve_crawler
+
+    fresh = change_detection.ChangeDetector()
+    for module in (change_detection, crawler, pve_crawler):
+        monkeypatch.setattr(module, "detector", fresh)
+    return fresh
+
+
+@pytest.fixture
+def pvp_server(tmp_path, monkeypatch, workdir, detector):
+    """以 source/ 中的 CSV 啟動測試伺服器，並讓直接抓取指向它；修改 CSV 後呼叫 server.fixtures.load()"""
+    import crawler
+    import name_normalizer
+    from fixture_server import start_server
+
+    source = tmp_path / "source"
+    write_league_csvs(source, "one")
+    server, base_url = start_server(0, 0, 0, data_dir=str(source))
+    monkeypatch.setattr(crawler, "PVPOKE_DATA_BASE_URL", f"{base_url}/data")
+    monkeypatch.setattr(crawler, "gamemaster_data", None)
+    server.source_dir = str(source)
+    server.base_url = base_url
+    # gamemaster 註冊的名稱別名不能留給其他測試
+    saved_aliases = dict(name_normalizer.species_aliases)
+    yield server
+    server.shutdown()
+    server.server_close()
+    name_normalizer.species_aliases.clear()
+    name_normalizer.species_aliases.update(saved_aliases)
+    name_normalizer.canonical_key.cache_clear()
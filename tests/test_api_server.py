@@ -0,0 +1,44 @@
+import threading
+
+import api_server
+from conftest import write_league_csvs
+from top_n_index import query_top_n
+
+
+def test_refresh_fetches_new_rankings_every_time(pvp_server):
+    """每次背景更新都要重新檢查來源，不能沿用第一次「未變更」的結果"""
+    cache = api_server.RankingCache(ttl=3600, crawl=True, min_interval=0)
+
+    for version in ["one", "one", "two", "three"]:
+        expected = write_league_csvs(pvp_server.source_dir, version)
+        pvp_server.fixtures.load()
+
+        assert cache.refresh(force=True)
+        cache.wait(60)
+
+        index, _, stale = cache.get()
+        assert not stale
+        xl_names, non_xl_names = query_top_n(index, {"1500": 3})
+        assert sorted(xl_names + non_xl_names) == sorted(expected["1500"][:3])
+
+
+def test_concurrent_refreshes_are_coalesced(workdir, monkeypatch):
+    release = threading.Event()
+    crawls = []
+
+    def slow_crawl():
+        crawls.append(True)
+        release.wait(10)
+        return {"Crawler-1500": True}
+
+    monkeypatch.setattr(api_server, "crawl_pvp", slow_crawl)
+    cache = api_server.RankingCache(ttl=3600, crawl=True, min_interval=0)
+    assert cache.refresh(force=True)
+    # 更新進行中的觸發併入同一次更新
+    assert not cache.refresh(force=True)
+    assert not cache.refresh()
+    release.set()
+    cache.wait(10)
+    assert len(crawls) == 1
+    assert cache.refresh_count == 1
+    assert cache.coalesced_count == 2
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from browser_pool import BrowserPool
+from retry_policy import TaskCancelled
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+    def new_window(self, kind):
+        handle = f"tab-{len(self.driver.window_handles)}"
+        self.driver.window_handles.append(handle)
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    def __init__(self):
+        self.window_handles = ["base"]
+        self.current_window_handle = "base"
+        self.switch_to = FakeSwitchTo(self)
+
+    def execute_cdp_cmd(self, command, params):
+        return {}
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+
+@pytest.fixture
+def pool():
+    events = []
+
+    def setup_driver(browser_id, debug_port):
+        events.append(("launch", browser_id))
+        return FakeDriver(), None
+
+    def cleanup(driver, user_data_dir, browser_id):
+        events.append(("retire", browser_id))
+
+    browser_pool = BrowserPool(setup_driver, cleanup, size=1, max_uses=10, name="Test")
+    browser_pool.events = events
+    yield browser_pool
+    browser_pool.close(timeout=0)
+
+
+def hold_tab(pool, release, acquired):
+    with pool.tab("holder"):
+        pool.events.append(("acquired", "holder"))
+        acquired.set()
+        release.wait(5)
+    pool.events.append(("released", "holder"))
+
+
+def test_waiting_for_a_busy_pool_stops_on_cancel(pool):
+    release, acquired = threading.Event(), threading.Event()
+    threading.Thread(target=hold_tab, args=(pool, release, acquired), daemon=True).start()
+    acquired.wait(5)
+
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    start = time.monotonic()
+    with pytest.raises(TaskCancelled):
+        with pool.tab("hedge", cancel=cancel):
+            pass
+    assert time.monotonic() - start < 2
+    release.set()
+
+
+def test_waiting_for_a_busy_pool_times_out(pool):
+    release, acquired = threading.Event(), threading.Event()
+    threading.Thread(target=hold_tab, args=(pool, release, acquired), daemon=True).start()
+    acquired.wait(5)
+
+    with pytest.raises(TimeoutError):
+        with pool.tab("hedge", timeout=0.2):
+            pass
+    release.set()
+
+
+def test_close_waits_for_tabs_in_use_and_rejects_waiters(pool):
+    release, acquired = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold_tab, args=(pool, release, acquired), daemon=True)
+    holder.start()
+    acquired.wait(5)
+
+    waiter_errors = []
+
+    def waiter():
+        try:
+            with pool.tab("waiter"):
+                pool.events.append(("acquired", "waiter"))
+        except Exception as e:
+            waiter_errors.append(e)
+
+    waiter_thread = threading.Thread(target=waiter, daemon=True)
+    waiter_thread.start()
+    threading.Timer(0.3, release.set).start()
+
+    pool.close(timeout=5)
+    waiter_thread.join(5)
+
+    # 使用中的瀏覽器在歸還後才關閉，等待中的任務不會在關閉後取得（或啟動）瀏覽器
+    assert pool.events.index(("released", "holder")) < pool.events.index(("retire", "Test-1"))
+    assert ("acquired", "waiter") not in pool.events
+    assert len(waiter_errors) == 1 and isinstance(waiter_errors[0], RuntimeError)
+    assert pool.launch_count == 1
@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+from cdp_engine import CDPBrowser
+
+
+class SilentWebSocket:
+    """送出的指令永遠不會有回應"""
+
+    async def send(self, payload):
+        pass
+
+
+def test_timed_out_command_is_removed_from_pending():
+    browser = CDPBrowser()
+    browser.websocket = SilentWebSocket()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(browser.send("Runtime.evaluate", timeout=0.01))
+    assert browser._pending == {}
@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+
+import crawler
+from conftest import read_column, write_league_csvs
+
+TASK = crawler.CRAWLER_TASKS[0]
+
+
+@pytest.fixture
+def status_codes(pvp_server, monkeypatch):
+    """記錄測試伺服器回應的狀態碼"""
+    codes = []
+    handler = pvp_server.RequestHandlerClass
+    original = handler.send_response
+
+    def send_response(self, code, message=None):
+        codes.append(code)
+        original(self, code, message)
+
+    monkeypatch.setattr(handler, "send_response", send_response)
+    return codes
+
+
+@pytest.fixture
+def source(pvp_server, workdir):
+    url = f"{pvp_server.base_url}/data/rankings/all/overall/rankings-1500.json"
+    output = workdir / "data" / "output.csv"
+    output.write_text("x")
+    return url, [str(output)]
+
+
+def check(detector, source, key="task"):
+    """模擬一次執行：檢查後視為成功並寫入驗證器"""
+    url, outputs = source
+    detector.start_run()
+    unchanged = detector.is_unchanged(key, [url], outputs)
+    detector.commit(key)
+    return unchanged
+
+
+def test_etag_returns_304_on_the_next_run(detector, source, status_codes):
+    assert not check(detector, source)
+    assert status_codes == [200]
+
+    assert check(detector, source)
+    assert check(detector, source)
+    assert status_codes == [200, 304, 304]
+
+
+def test_source_change_is_detected_across_runs(detector, source, pvp_server):
+    assert not check(detector, source)
+    assert check(detector, source)
+
+    write_league_csvs(pvp_server.source_dir, "two")
+    pvp_server.fixtures.load()
+    assert not check(detector, source)
+    assert check(detector, source)
+
+
+def test_fingerprint_is_used_when_the_etag_no_longer_matches(detector, source, status_codes):
+    url, _ = source
+    assert not check(detector, source)
+    # 例如 CDN 換了一組 ETag，但內容相同
+    detector._load()["task"]["urls"][url]["etag"] = '"other"'
+
+    assert check(detector, source)
+    assert status_codes == [200, 200]
+
+
+def test_failed_task_is_checked_again(detector, source, pvp_server):
+    url, outputs = source
+    assert not check(detector, source)
+
+    write_league_csvs(pvp_server.source_dir, "two")
+    pvp_server.fixtures.load()
+    for _ in range(2):
+        # 任務失敗沒有 commit，下一次執行仍然要重新爬取
+        detector.start_run()
+        assert not detector.is_unchanged("task", [url], outputs)
+    assert not check(detector, source)
+    assert check(detector, source)
+
+
+def test_missing_output_forces_a_crawl(detector, source):
+    url, outputs = source
+    assert not check(detector, source)
+    os.remove(outputs[0])
+    assert not check(detector, source)
+
+
+def test_state_is_kept_between_processes(detector, source, workdir):
+    import change_detection
+
+    assert not check(detector, source)
+    with open(os.path.join("state", "crawl_state.json"), encoding="utf-8") as f:
+        assert "task" in json.load(f)
+    # 新的程序讀取同一份狀態
+    assert check(change_detection.ChangeDetector(), source)
+
+
+def test_repeated_crawls_skip_only_unchanged_sources(pvp_server, capsys):
+    csv_path = os.path.join("data", TASK["filename"])
+    for run, version in enumerate(["one", "one", "two"], start=1):
+        expected = write_league_csvs(pvp_server.source_dir, version)["1500"]
+        pvp_server.fixtures.load()
+        crawler.detector.start_run()
+        crawler.gamemaster_data = None
+        capsys.readouterr()
+
+        assert crawler.run_crawler(TASK)
+
+        skipped = "來源資料未變更" in capsys.readouterr().out
+        assert skipped == (run == 2), f"第 {run} 次執行"
+        assert read_column(csv_path, "Pokemon") == expected
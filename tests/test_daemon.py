@@ -0,0 +1,24 @@
+import os
+
+import daemon
+from conftest import read_column, write_league_csvs
+
+
+def test_every_cycle_picks_up_source_changes(pvp_server, capsys):
+    """常駐模式的每次更新都要重新檢查來源，內容依序為 one -> one -> two -> three"""
+    crawler_daemon = daemon.CrawlerDaemon()
+    pvp_group = crawler_daemon.groups["pvp"]
+
+    for cycle, version in enumerate(["one", "one", "two", "three"], start=1):
+        expected = write_league_csvs(pvp_server.source_dir, version)
+        pvp_server.fixtures.load()
+        capsys.readouterr()
+
+        crawler_daemon.run_cycle([pvp_group])
+
+        output = capsys.readouterr().out
+        for league in expected:
+            assert read_column(os.path.join("data", f"pvpoke_{league}.csv"), "Pokemon") == expected[league]
+        assert all(pvp_group.last_results.values())
+        # 只有內容沒變的第二次更新可以跳過
+        assert ("來源資料未變更" in output) == (cycle == 2), f"第 {cycle} 次更新"
@@ -0,0 +1,140 @@
+import csv
+import html
+import json
+import os
+import re
+import urllib.request
+from contextlib import contextmanager
+
+import pytest
+
+import crawler
+from conftest import REPO_DIR, read_column, write_league_csvs
+from name_normalizer import normalize_column
+
+TASK = crawler.CRAWLER_TASKS[0]
+CSV_PATH = os.path.join("data", TASK["filename"])
+BROWSER_NAMES = ["Altaria (Shadow)", "Lickitung"]
+
+
+@pytest.fixture
+def fake_browser(monkeypatch):
+    """以假的分頁取代瀏覽器，記錄是否改用瀏覽器爬取"""
+    opened = []
+
+    @contextmanager
+    def open_task_tab(task, cancel=None):
+        opened.append(task["crawler_id"])
+        yield object()
+
+    monkeypatch.setattr(crawler, "open_task_tab", open_task_tab)
+    monkeypatch.setattr(crawler, "load_page", lambda driver, task, state=None: None)
+    monkeypatch.setattr(crawler, "wait_page", lambda driver, task, state=None: None)
+    monkeypatch.setattr(crawler, "extract_page", lambda driver, task, state=None: (list(BROWSER_NAMES), [0, 1]))
+    return opened
+
+
+def test_direct_fetch_builds_the_ranking_without_a_browser(pvp_server, fake_browser):
+    assert crawler.run_crawler(TASK)
+
+    assert fake_browser == []
+    expected = [f"one1500x{i}" for i in range(60)]
+    assert read_column(CSV_PATH, "Pokemon") == expected
+    # XL 由 gamemaster 的 defaultIVs 等級計算
+    assert read_column(CSV_PATH, "XL") == ["1" if i % 3 == 0 else "0" for i in range(60)]
+    # 比對鍵使用 gamemaster 的 speciesId
+    assert read_column(CSV_PATH, "Key")[:2] == ["fixture_1500_0", "fixture_1500_1"]
+
+
+def test_too_few_rows_fail_validation_and_fall_back_to_the_browser(pvp_server, fake_browser, capsys):
+    write_league_csvs(pvp_server.source_dir, "short", rows=crawler.DIRECT_FETCH_MIN_ROWS - 1)
+    pvp_server.fixtures.load()
+
+    assert crawler.run_crawler(TASK)
+
+    output = capsys.readouterr().out
+    assert "驗證不通過" in output and "改用瀏覽器爬取" in output
+    assert fake_browser == [TASK["crawler_id"]]
+    assert read_column(CSV_PATH, "Pokemon") == ["Altaria", "Lickitung"]
+    assert read_column(CSV_PATH, "Key") == ["altaria_shadow", "lickitung"]
+
+
+def test_unreachable_source_falls_back_to_the_browser(pvp_server, fake_browser, monkeypatch, capsys):
+    monkeypatch.setattr(crawler, "PVPOKE_DATA_BASE_URL", "http://127.0.0.1:9/data")
+
+    assert crawler.run_crawler(TASK)
+
+    assert "直接抓取失敗" in capsys.readouterr().out
+    assert fake_browser == [TASK["crawler_id"]]
+    assert read_column(CSV_PATH, "Pokemon") == ["Altaria", "Lickitung"]
+
+
+def test_direct_fetch_can_be_disabled(pvp_server, fake_browser, monkeypatch):
+    monkeypatch.setattr(crawler, "DIRECT_FETCH_ENABLED", False)
+
+    assert crawler.run_crawler(TASK)
+
+    assert fake_browser == [TASK["crawler_id"]]
+
+
+def test_direct_fetch_reuses_the_change_check_download(pvp_server, fake_browser, monkeypatch):
+    paths = []
+    handler = pvp_server.RequestHandlerClass
+    original = handler.send_response
+
+    def send_response(self, code, message=None):
+        paths.append(self.path)
+        original(self, code, message)
+
+    monkeypatch.setattr(handler, "send_response", send_response)
+    crawler.detector.start_run()
+
+    assert crawler.run_crawler(TASK)
+
+    assert fake_browser == []
+    # 變更檢查已下載排名與 gamemaster，直接抓取不再重複下載
+    assert sorted(paths) == sorted(["/data/rankings/all/overall/rankings-1500.json", "/data/gamemaster.min.json"])
+
+
+def write_committed_ranking(source_dir, rows=crawler.DIRECT_FETCH_MIN_ROWS + 10):
+    """以 data/pvpoke_1500.csv 的中文名稱作為來源，重複的名稱第二次出現時是暗影型態"""
+    committed = os.path.join(REPO_DIR, "data", "pvpoke_1500.csv")
+    names = read_column(committed, "Pokemon")[:rows]
+    xl_list = read_column(committed, "XL")[:rows]
+    seen = set()
+    raw_names = []
+    for name in names:
+        raw_names.append(f"{name} (暗影)" if name in seen else name)
+        seen.add(name)
+    with open(os.path.join(source_dir, "pvpoke_1500.csv"), "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Pokemon", "XL"])
+        writer.writerows(zip(raw_names, xl_list))
+    return names, raw_names, [int(xl) for xl in xl_list]
+
+
+def scrape_ranking_page(base_url, crawler_id):
+    """讀取測試伺服器的排名頁，依頁面渲染的 .name 元素產生 EXTRACT_NAMES_SCRIPT 的結果"""
+    with urllib.request.urlopen(f"{base_url}/rankings/all/1500/overall/") as response:
+        page = response.read().decode("utf-8")
+    rows = json.loads(re.search(r"var rows = (.*);", page).group(1))
+    # 有 XL 圖示時 innerText 為 "名稱 XL"
+    rows = [[html.unescape(name) + (" XL" if xl else ""), bool(xl)] for name, xl in rows]
+    return crawler.clean_extracted_rows(rows, crawler_id)
+
+
+def test_direct_fetch_matches_the_browser_scrape(pvp_server):
+    names, raw_names, xl_list = write_committed_ranking(pvp_server.source_dir)
+    pvp_server.fixtures.load()
+    assert any("(暗影)" in name for name in raw_names) and any(xl_list)
+
+    direct_names, direct_xl = crawler.run_direct_fetch(TASK)
+    page_names, page_xl = scrape_ranking_page(pvp_server.base_url, TASK["crawler_id"])
+
+    assert direct_names == page_names == raw_names
+    assert direct_xl == page_xl == xl_list
+    # 正規化後的顯示名稱與現有 CSV 的中文名稱相同，暗影型態保留在比對鍵中
+    assert normalize_column(direct_names) == normalize_column(page_names)
+    display_names, keys = normalize_column(direct_names)
+    assert display_names == names
+    assert len(set(keys)) == len(keys)
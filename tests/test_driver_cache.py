@@ -0,0 +1,72 @@
+import json
+import os
+import stat
+
+import pytest
+
+import driver_cache
+
+
+@pytest.fixture
+def cached_driver(tmp_path, monkeypatch):
+    """快取資料夾中放一個回報 120 版的假 ChromeDriver"""
+    path = tmp_path / driver_cache.DRIVER_FILENAME
+    path.write_text("#!/bin/sh\necho 'ChromeDriver 120.0.6099.109 (abc)'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    info_path = tmp_path / "driver.json"
+    info_path.write_text(json.dumps({
+        "path": str(path),
+        "sha256": driver_cache.file_sha256(str(path)),
+        "version": "ChromeDriver 120.0.6099.109 (abc)",
+        "requested_version": None,
+    }))
+    monkeypatch.setattr(driver_cache, "CACHE_INFO_PATH", str(info_path))
+    monkeypatch.setattr(driver_cache, "CHROMEDRIVER_PATH", None)
+    monkeypatch.setattr(driver_cache, "CHROMEDRIVER_VERSION", None)
+    monkeypatch.setattr(driver_cache, "CHROMEDRIVER_OFFLINE", False)
+    monkeypatch.setattr(driver_cache, "verified_path", None)
+    monkeypatch.setattr(driver_cache, "verified_at", 0.0)
+    return str(path)
+
+
+def test_major_version():
+    assert driver_cache.major_version("ChromeDriver 120.0.6099.109 (abc)") == 120
+    assert driver_cache.major_version("Google Chrome 131.0.6778.85 ") == 131
+    assert driver_cache.major_version(None) is None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="假的 ChromeDriver 是 shell script")
+def test_cached_driver_must_match_installed_chrome(cached_driver, monkeypatch):
+    monkeypatch.setattr(driver_cache, "installed_chrome_version", lambda: "Google Chrome 120.0.6099.71")
+    assert driver_cache.check_cached_driver() == cached_driver
+
+    monkeypatch.setattr(driver_cache, "installed_chrome_version", lambda: "Google Chrome 121.0.6167.85")
+    assert driver_cache.check_cached_driver() is None
+
+    # 無法判斷 Chrome 版本時沿用快取，由 SessionNotCreatedException 處理
+    monkeypatch.setattr(driver_cache, "installed_chrome_version", lambda: None)
+    assert driver_cache.check_cached_driver() == cached_driver
+
+
+@pytest.mark.skipif(os.name == "nt", reason="假的 ChromeDriver 是 shell script")
+def test_invalidate_forces_a_new_download_once(cached_driver, monkeypatch):
+    monkeypatch.setattr(driver_cache, "installed_chrome_version", lambda: None)
+    downloads = []
+    monkeypatch.setattr(driver_cache, "download_driver", lambda: downloads.append(1) or cached_driver)
+
+    assert driver_cache.resolve_driver_path() == cached_driver
+    resolved_at = driver_cache.verified_at
+    assert downloads == []
+
+    assert driver_cache.invalidate_cached_driver(resolved_at)
+    assert driver_cache.resolve_driver_path() == cached_driver
+    assert downloads == [1]
+
+    # 其他線程已重新下載過，同一次失敗不會再清除一次
+    assert driver_cache.invalidate_cached_driver(resolved_at)
+    assert driver_cache.verified_path == cached_driver
+
+
+def test_pinned_driver_is_not_invalidated(monkeypatch):
+    monkeypatch.setattr(driver_cache, "CHROMEDRIVER_PATH", "/opt/chromedriver")
+    assert not driver_cache.invalidate_cached_driver(0)
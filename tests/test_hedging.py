@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+import hedging
+from retry_policy import TaskCancelled
+from scheduler import AdaptiveLimiter
+
+TASK = {"crawler_id": "Crawler-test", "league": 1500}
+
+
+@pytest.fixture(autouse=True)
+def fast_hedge(monkeypatch, tmp_path):
+    history = hedging.LatencyHistory(str(tmp_path / "latency.json"))
+    monkeypatch.setattr(history, "hedge_delay", lambda task_id: 0.1)
+    monkeypatch.setattr(hedging, "latency_history", history)
+    monkeypatch.setattr(hedging, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "HEDGE_RETRY_INTERVAL", 0.05)
+    yield
+    hedging.set_concurrency_limiter(None)
+
+
+def make_attempt(durations):
+    """第 n 次呼叫執行 durations[n] 秒後寫入結果；cancel 設定時提早停止"""
+    calls = []
+    stored = []
+    finished = []
+    lock = threading.Lock()
+
+    def attempt(cancel, claim):
+        with lock:
+            index = len(calls)
+            calls.append(index)
+        if cancel.wait(durations[index]):
+            finished.append((index, "cancelled"))
+            return False
+        try:
+            claim()
+        except TaskCancelled:
+            finished.append((index, "lost"))
+            return False
+        stored.append(index)
+        finished.append((index, "stored"))
+        return True
+
+    return attempt, calls, stored, finished
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_hedge_wins_and_cancels_the_straggler():
+    attempt, calls, stored, finished = make_attempt([5, 0.05])
+    assert hedging.run_hedged(TASK, attempt)
+    assert stored == [1]
+    # 落後的一方收到取消後停止，不會寫入
+    assert wait_for(lambda: (0, "cancelled") in finished)
+
+
+def test_hedge_waits_for_a_free_concurrency_slot():
+    limiter = AdaptiveLimiter(min_workers=1, max_workers=2, initial=1)
+    limiter.acquire()  # 主要嘗試所在的任務
+    hedging.set_concurrency_limiter(limiter)
+
+    attempt, calls, stored, _ = make_attempt([0.5, 0.01])
+    assert hedging.run_hedged(TASK, attempt)
+    # 並行數已滿，不會啟動對沖
+    assert calls == [0] and stored == [0]
+
+
+def test_hedge_holds_a_concurrency_slot_until_it_finishes():
+    limiter = AdaptiveLimiter(min_workers=1, max_workers=2, initial=2)
+    limiter.acquire()
+    hedging.set_concurrency_limiter(limiter)
+
+    attempt, calls, stored, finished = make_attempt([5, 0.05])
+    assert hedging.run_hedged(TASK, attempt)
+    assert calls == [0, 1] and stored == [1]
+    assert limiter.active == 1
+    assert wait_for(lambda: len(finished) == 2)
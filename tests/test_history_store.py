@@ -0,0 +1,27 @@
+from history_store import HistoryStore
+
+
+def test_shadow_and_normal_forms_are_tracked_separately(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.record("pvp", "1500", ["七夕青鳥", "七夕青鳥"], [0, 0], ["altaria_shadow", "altaria"],
+                 recorded_at="2026-01-01T00:00:00")
+    store.record("pvp", "1500", ["七夕青鳥", "大舌舔"], [0, 0], ["altaria", "lickitung"],
+                 recorded_at="2026-01-02T00:00:00")
+
+    assert store.rank_history("altaria_shadow", "pvp", "1500") == [
+        ("2026-01-01T00:00:00", 1), ("2026-01-02T00:00:00", None)]
+    assert store.rank_history("Altaria", "pvp", "1500") == [
+        ("2026-01-01T00:00:00", 2), ("2026-01-02T00:00:00", 1)]
+    # 以中文名稱查詢，依型態對應到記錄中的比對鍵
+    assert store.rank_history("七夕青鳥 (暗影)", "pvp", "1500")[0] == ("2026-01-01T00:00:00", 1)
+    assert store.rank_history("七夕青鳥", "pvp", "1500")[0] == ("2026-01-01T00:00:00", 2)
+
+    old_time, new_time, added, removed = store.diff("pvp", "1500")
+    assert added == [("大舌舔", "lickitung")]
+    assert removed == [("七夕青鳥", "altaria_shadow")]
+
+
+def test_duplicate_names_report_the_best_rank_once(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.record("pve", "normal", ["Regigigas", "Y", "Regigigas"], recorded_at="2026-01-01T00:00:00")
+    assert store.rank_history("Regigigas", "pve", "normal") == [("2026-01-01T00:00:00", 1)]
@@ -0,0 +1,59 @@
+import pytest
+
+import name_normalizer
+from name_normalizer import canonical_key, display_name, normalize_column, register_aliases
+
+
+@pytest.fixture
+def aliases():
+    saved = dict(name_normalizer.species_aliases)
+    yield
+    name_normalizer.species_aliases.clear()
+    name_normalizer.species_aliases.update(saved)
+    canonical_key.cache_clear()
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("Altaria (Shadow)", "altaria_shadow"),
+    ("Shadow Altaria", "altaria_shadow"),
+    ("Zacian (Crowned Sword)", "zacian_crowned_sword"),
+    ("Crowned Sword Zacian", "zacian_crowned_sword"),
+    ("Mega Charizard X", "charizard_mega_x"),
+    ("Marowak (Alolan) (Shadow)", "marowak_alolan_shadow"),
+    ("Giratina (Origin Forme)", "giratina_origin"),
+    ("Porygon-Z", "porygon_z"),
+    ("Mr. Mime", "mr_mime"),
+    ("Farfetch'd", "farfetchd"),
+    ("Nidoran♀", "nidoran_female"),
+    ("Nidoran♂", "nidoran_male"),
+    ("Nidoran♂ (Shadow)", "nidoran_male_shadow"),
+    ("Tapu Bulu XL", "tapu_bulu"),
+])
+def test_canonical_key(raw, key):
+    assert canonical_key(raw) == key
+
+
+def test_display_name_keeps_the_original_characters():
+    assert display_name("謎擬Ｑ XL") == "謎擬Ｑ"
+    assert display_name("七夕青鳥 (暗影)") == "七夕青鳥"
+    assert display_name("Nidoran♀") == "Nidoran♀"
+    # 全形與半形的同一個名稱有相同的比對鍵
+    assert canonical_key("謎擬Ｑ") == canonical_key("謎擬Q")
+
+
+def test_chinese_names_use_registered_species_ids(aliases):
+    assert canonical_key("七夕青鳥 (暗影)") == "七夕青鳥_shadow"
+
+    register_aliases({"七夕青鳥": "Altaria", "七夕青鳥 (暗影)": "altaria_shadow", "尼多蘭♀": "nidoran_female"})
+    assert canonical_key("七夕青鳥") == "altaria"
+    assert canonical_key("七夕青鳥 (暗影)") == "altaria_shadow"
+    assert canonical_key("暗影 七夕青鳥") == "altaria_shadow"
+    assert canonical_key("尼多蘭♀ (暗影)") == "nidoran_female_shadow"
+    # PvE 的英文名稱得到相同的比對鍵
+    assert canonical_key("Shadow Altaria") == canonical_key("七夕青鳥 (暗影)")
+
+
+def test_normalize_column():
+    names, keys = normalize_column(["Altaria (Shadow)", "Altaria", "Altaria (Shadow)"])
+    assert names == ["Altaria", "Altaria", "Altaria"]
+    assert keys == ["altaria_shadow", "altaria", "altaria_shadow"]
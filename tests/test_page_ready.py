@@ -0,0 +1,35 @@
+import types
+
+import pytest
+
+from page_ready import wait_until_ready
+
+
+class FakeDriver:
+    def __init__(self, script_timeout=30, error=None):
+        self.timeouts = types.SimpleNamespace(script=script_timeout)
+        self.error = error
+        self.timeout_during_script = None
+
+    def set_script_timeout(self, seconds):
+        self.timeouts.script = seconds
+
+    def execute_async_script(self, script, *args):
+        self.timeout_during_script = self.timeouts.script
+        if self.error:
+            raise self.error
+        return {"ready": True, "reason": "count", "count": args[1]}
+
+
+def test_script_timeout_is_restored_for_the_next_task():
+    driver = FakeDriver(script_timeout=30)
+    assert wait_until_ready(driver, ".name", 5, timeout=60)["ready"]
+    assert driver.timeout_during_script == 65
+    assert driver.timeouts.script == 30
+
+
+def test_script_timeout_is_restored_after_an_error():
+    driver = FakeDriver(script_timeout=12, error=RuntimeError("tab crashed"))
+    with pytest.raises(RuntimeError):
+        wait_until_ready(driver, ".name", 5, timeout=10)
+    assert driver.timeouts.script == 12
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import request_filter
+
+URL = "https://pvpoketw.com/rankings/all/1500/overall/"
+
+
+class FakeDriver:
+    """回傳固定 performance log 的假 driver"""
+
+    def __init__(self, events, load_ms):
+        self.entries = [{"message": json.dumps({"message": {"method": method, "params": params}})}
+                        for method, params in events]
+        self.load_ms = load_ms
+
+    def get_log(self, kind):
+        entries, self.entries = self.entries, []
+        return entries
+
+    def execute_script(self, script):
+        return self.load_ms
+
+
+def page_events(kb, blocked_types=()):
+    events = [("Network.requestWillBeSent", {}), ("Network.loadingFinished", {"encodedDataLength": kb * 1024})]
+    for resource_type in blocked_types:
+        events.append(("Network.requestWillBeSent", {}))
+        events.append(("Network.loadingFailed", {"blockedReason": "inspector", "type": resource_type}))
+    return events
+
+
+@pytest.fixture(autouse=True)
+def baseline_path(tmp_path, monkeypatch):
+    path = tmp_path / "network_baseline.json"
+    monkeypatch.setattr(request_filter, "BASELINE_PATH", str(path))
+    return path
+
+
+def test_blocked_requests_are_counted_by_type():
+    stats = request_filter.collect_network_stats(FakeDriver(page_events(100, ["Image", "Image", "Font"]), 800))
+    assert stats["requests"] == 4
+    assert stats["bytes"] == 100 * 1024
+    assert stats["blocked"] == 3
+    assert stats["blocked_types"] == {"Image": 2, "Font": 1}
+    assert stats["load_ms"] == 800
+
+
+def test_each_task_reports_estimated_savings(monkeypatch, capsys):
+    # 沒有基準時只回報擋下的請求
+    monkeypatch.setattr(request_filter, "FILTER_ENABLED", True)
+    request_filter.report_network_stats(FakeDriver(page_events(100, ["Image", "Font"]), 800), "C1", URL)
+    output = capsys.readouterr().out
+    assert "擋下 2 個請求 (Image 1、Font 1)" in output
+    assert "尚無未過濾的基準" in output
+
+    # 未過濾的執行記錄為基準
+    monkeypatch.setattr(request_filter, "FILTER_ENABLED", False)
+    request_filter.report_network_stats(FakeDriver(page_events(1124), 2300), "C1", URL)
+    assert request_filter.load_baselines()[URL]["bytes"] == 1124 * 1024
+
+    monkeypatch.setattr(request_filter, "FILTER_ENABLED", True)
+    request_filter.report_network_stats(FakeDriver(page_events(100, ["Image"] * 3), 800), "C1", URL)
+    output = capsys.readouterr().out
+    assert "擋下 3 個請求 (Image 3)，估計節省 1024 KB / 1.50 秒" in output
+
+
+def test_sites_without_a_preset_are_not_reported(monkeypatch, capsys, baseline_path):
+    monkeypatch.setattr(request_filter, "FILTER_ENABLED", False)
+    request_filter.report_network_stats(FakeDriver(page_events(10), 100), "C1", "http://127.0.0.1:9/page")
+    assert "請求過濾" not in capsys.readouterr().out
+    assert not baseline_path.exists()
@@ -0,0 +1,68 @@
+import types
+
+import pytest
+
+import scheduler
+from browser_pool import BrowserPool
+from scheduler import AdaptiveLimiter
+from test_browser_pool import FakeDriver
+
+
+@pytest.fixture
+def idle_machine(monkeypatch):
+    """CPU 與記憶體都有餘裕，只剩耗時會限制並行數"""
+    monkeypatch.setattr(scheduler.psutil, "cpu_percent", lambda interval=None: 10.0)
+    monkeypatch.setattr(scheduler.psutil, "virtual_memory",
+                        lambda: types.SimpleNamespace(available=64 * 1024 ** 3))
+
+
+def finish(limiter, kind, durations):
+    for duration in durations:
+        limiter.acquire()
+        limiter.release(duration, kind)
+
+
+def test_fast_tasks_first_do_not_freeze_the_limit(idle_machine):
+    limiter = AdaptiveLimiter(min_workers=1, max_workers=9, initial=2)
+    # 先完成的 PvP 任務很快，之後的 PvE 頁面每個要好幾秒
+    finish(limiter, "crawler", [0.2] * 3)
+    finish(limiter, "pve_crawler", [4.0] * 6)
+
+    limiter.adjust()
+    limiter.adjust()
+    assert limiter.limit == 4
+
+
+def test_slowdown_within_a_task_type_stops_growth(idle_machine):
+    limiter = AdaptiveLimiter(min_workers=1, max_workers=9, initial=2)
+    finish(limiter, "pve_crawler", [4.0] * 3 + [8.0] * 3)
+    limiter.adjust()
+    assert limiter.limit == 2
+
+    # 基準隨滾動視窗更新，耗時穩定後可以再增加
+    finish(limiter, "pve_crawler", [8.0] * scheduler.BASELINE_WINDOW)
+    limiter.adjust()
+    assert limiter.limit == 3
+
+
+def test_only_tasks_that_used_a_browser_are_timed():
+    pool = BrowserPool(lambda browser_id, port: (FakeDriver(), None), lambda *args: None,
+                       size=1, name="Test")
+    limiter = AdaptiveLimiter(min_workers=1, max_workers=2, initial=1)
+
+    def run_crawler(task):
+        if task.get("browser"):
+            with pool.tab(task["crawler_id"]):
+                pass
+        return True
+
+    module = types.SimpleNamespace(__name__="pve_crawler", browser_pool=pool, run_crawler=run_crawler)
+    try:
+        assert scheduler.run_job(limiter, module, {"crawler_id": "direct"})
+        assert scheduler.run_job(limiter, module, {"crawler_id": "page", "browser": True})
+    finally:
+        pool.close(timeout=0)
+
+    assert list(limiter.durations) == ["pve_crawler"]
+    assert len(limiter.durations["pve_crawler"]) == 1
+    assert limiter.active == 0
@@ -0,0 +1,87 @@
+"""
+PvP 前 N 名索引
+網站的主要查詢是「各聯盟前 N 名的聯集，分成需要 / 不需要 XL 糖並去除重複」。
+索引把每個聯盟中每個 (寶可夢, XL) 的最佳排名依排名排序，
+任何 N 的組合都只要對每個聯盟做一次二分搜尋，再走訪前綴即可，不需要解析完整的 CSV
+
+索引格式 (data/shards/pvp/index.json)：
+  {
+    "version": 2,
+    "names": [名稱, ...],                              名稱字典
+    "leagues": {"1500": {"ids": [...], "xl": "0110...", "rank_gaps": [...]}, ...}
+  }
+  ids 為名稱字典的索引，xl 每個字元對應一筆，
+  rank_gaps 為最佳排名（遞增）與前一筆的差值，累加後即為排名；差值多為 1，壓縮後比原始排名小得多
+
+使用方式：python top_n_index.py 50 50 30      依序為 1500 / 2500 / 10000 的 N
+"""
+import bisect
+import itertools
+import json
+import os
+import sys
+
+INDEX_PATH = os.path.join("data", "shards", "pvp", "index.json")
+
+
+def build_top_n_index(league_rows):
+    """
+    league_rows: {聯盟: [[名稱, XL], ...]}（依排名排序）
+    回傳索引內容
+    """
+    best = {}
+    for league, rows in league_rows.items():
+        league_best = best.setdefault(league, {})
+        for rank, (name, xl) in enumerate(rows, start=1):
+            league_best.setdefault((name, xl), rank)
+
+    names = sorted({name for league_best in best.values() for name, _ in league_best})
+    name_ids = {name: i for i, name in enumerate(names)}
+
+    leagues = {}
+    for league, league_best in best.items():
+        entries = sorted(league_best.items(), key=lambda item: item[1])
+        ranks = [rank for _, rank in entries]
+        leagues[league] = {
+            "ids": [name_ids[name] for (name, _), _ in entries],
+            "xl": "".join("1" if xl else "0" for (_, xl), _ in entries),
+            "rank_gaps": [rank - previous for previous, rank in zip([0] + ranks, ranks)],
+        }
+    return {"version": 2, "names": names, "leagues": leagues}
+
+
+def decode_ranks(entry):
+    """把 rank_gaps 還原為遞增的排名"""
+    return list(itertools.accumulate(entry["rank_gaps"]))
+
+
+def query_top_n(index, limits):
+    """
+    limits: {聯盟: N}
+    第一次查詢時會把排名解碼並暫存在 index 中，之後不同的 N 都不需要重新解碼
+    回傳 (需要 XL 的名稱, 不需要 XL 的名稱)，各自排序並去除重複
+    """
+    xl_ids, non_xl_ids = set(), set()
+    for league, limit in limits.items():
+        entry = index["leagues"].get(str(league))
+        if not entry or limit <= 0:
+            continue
+        if "ranks" not in entry:
+            entry["ranks"] = decode_ranks(entry)
+        count = bisect.bisect_right(entry["ranks"], limit)
+        for name_id, xl in zip(entry["ids"][:count], entry["xl"][:count]):
+            (xl_ids if xl == "1" else non_xl_ids).add(name_id)
+    names = index["names"]
+    return sorted(names[i] for i in xl_ids), sorted(names[i] for i in non_xl_ids)
+
+
+def load_index(path=INDEX_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    values = [int(value) for value in sys.argv[1:4]] or [50, 50, 50]
+    xl_names, non_xl_names = query_top_n(load_index(), dict(zip(["1500", "2500", "10000"], values)))
+    print(f"需要 XL 糖 ({len(xl_names)}): {', '.join(xl_names)}")
+    print(f"不需要 XL 糖 ({len(non_xl_names)}): {', '.join(non_xl_names)}")